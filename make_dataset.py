@@ -14,8 +14,9 @@ import numpy as np
 from tqdm import tqdm
 
 from mdtk import degradations, downloaders, fileio
-from mdtk.df_utils import get_random_excerpt
+from mdtk.df_utils import EXCERPT_OVERLAP_POLICIES, is_canonical, mark_canonical
 from mdtk.formatters import FORMATTERS, create_corpus_csvs
+from mdtk.note_array import sample_excerpts
 
 logo_path = Path(__file__, "..", "img", "logo.txt").resolve()
 with open(logo_path, "r") as ff:
@@ -188,6 +189,23 @@ def parse_args(args_input=None):
         "number of ms after the first note.",
         default=5000,
     )
+    parser.add_argument(
+        "--excerpts-per-piece",
+        metavar="N",
+        type=int,
+        default=1,
+        help="The number of excerpts to take from each piece. Fewer are taken "
+        "from pieces which do not contain enough valid excerpts (depending on "
+        "--excerpt-overlap).",
+    )
+    parser.add_argument(
+        "--excerpt-overlap",
+        choices=EXCERPT_OVERLAP_POLICIES,
+        default="disjoint",
+        help="Whether the excerpts taken from a piece may overlap: allow "
+        "draws each excerpt independently, distinct never draws the same "
+        "excerpt twice, and disjoint draws excerpts which share no notes.",
+    )
     parser.add_argument(
         "--min-notes",
         metavar="N",
@@ -266,7 +284,7 @@ if __name__ == "__main__":
         sys.exit(0 if clean_ok else 1)
 
     if ARGS.seed is None:
-        seed = np.random.randint(0, 2 ** 32)
+        seed = np.random.randint(0, 2**32)
         print(f"No random seed supplied. Setting to {seed}.")
     else:
         seed = ARGS.seed
@@ -532,27 +550,18 @@ if __name__ == "__main__":
     meta_file.write("altered_csv_path,degraded,degradation_id,clean_csv_path,split\n")
     for i, data in enumerate(tqdm(input_data, desc="Degrading data")):
         dataset, rel_path, file_path, note_df = data
-        rel_path = f"{rel_path[:-3]}csv"
-        # First, get the degradation order for this iteration.
-        # Get the current distribution of degradations
-        if np.sum(deg_counts) == 0:  # First iteration, set to uniform
-            current_deg_dist = np.ones(nr_degs) / nr_degs
-            current_split_dist = np.ones(nr_splits) / nr_splits
-        else:
-            current_deg_dist = deg_counts / np.sum(deg_counts)
-            current_split_dist = split_counts / np.sum(split_counts)
 
-        # Grab an excerpt from this df
-        excerpt = get_random_excerpt(
+        # Grab excerpts from this df
+        excerpts = sample_excerpts(
             note_df,
-            min_notes=ARGS.min_notes,
+            ARGS.excerpts_per_piece,
             excerpt_length=ARGS.excerpt_length,
-            first_onset_range=(0, 200),
-            iterations=10,
+            min_notes=ARGS.min_notes,
+            overlap_policy=ARGS.excerpt_overlap,
         )
 
         # If no valid excerpt was found, skip this piece
-        if excerpt is None:
+        if len(excerpts) == 0:
             logging.warning(
                 "Unable to find valid excerpt from file "
                 f"{file_path}. Lengthen --excerpt-length or "
@@ -560,70 +569,107 @@ if __name__ == "__main__":
             )
             continue
 
-        # Try degradations in reverse order of the difference between
-        # their current distribution and their desired distribution.
-        diffs = goal_deg_dist - current_deg_dist
-        degs_sorted = sorted(zip(diffs, deg_choices, list(range(len(deg_choices)))))[
-            ::-1
-        ]
-
-        # Calculate split in the same way (but only save the first)
-        split_diffs = split_props - current_split_dist
-        _, split_name, split_num = sorted(
-            zip(split_diffs, split_names, list(range(nr_splits)))
-        )[-1]
-
-        # Make default labels for no degradation
-        clean_path = os.path.join("clean", dataset, rel_path)
-        altered_path = clean_path
-        deg_binary = 0
-
-        # Try to perform a degradation
-        degraded = None
-        for diff, deg_name, deg_num in degs_sorted:
-            # Break for no degradation
-            if deg_name == "none":
-                break
-
-            # Try the degradation
-            deg_fun = degradations.DEGRADATIONS[deg_name]
-            deg_fun_kwargs = degradation_kwargs[deg_name]  # degradation_kwargs
-            # at top of main call
-            logging.disable(logging.WARNING)
-            degraded = deg_fun(excerpt, **deg_fun_kwargs)
-            logging.disable(logging.NOTSET)
-
-            if degraded is not None:
-                # Update labels
-                deg_binary = 1
-                altered_path = os.path.join("altered", dataset, rel_path)
-
-                # Write degraded csv
-                altered_outpath = os.path.join(ARGS.output_dir, altered_path)
-                fileio.df_to_csv(degraded, altered_outpath)
-                break
-
-        # Write data
-        if not (degraded is None and ARGS.clean_prop == 0):
-            # Update counts
-            deg_counts[deg_num] += 1
-            split_counts[split_num] += 1
-
-            # Write clean csv
-            clean_outpath = os.path.join(ARGS.output_dir, clean_path)
-            fileio.df_to_csv(excerpt, clean_outpath)
-
-            # Write metadata
-            meta_file.write(
-                f"{altered_path},{deg_binary},{deg_num}," f"{clean_path},{split_name}\n"
-            )
-        else:
-            logging.warning(
-                "Unable to degrade chosen excerpt from "
-                f"{file_path} and no clean excerpts requested."
-                " Skipping.",
+        for excerpt_num, excerpt in enumerate(excerpts):
+            if ARGS.excerpts_per_piece == 1:
+                excerpt_rel_path = f"{rel_path[:-3]}csv"
+            else:
+                excerpt_rel_path = f"{rel_path[:-4]}_{excerpt_num}.csv"
+
+            # Shift the excerpt so that its first note onsets within 200 ms
+            excerpt = excerpt.copy()
+            excerpt.onset[:] += np.random.randint(0, 200) - excerpt.onset[0]
+            excerpt = excerpt.to_df()
+            if is_canonical(note_df):
+                # A slice of sorted notes is sorted, so needn't be sorted again
+                mark_canonical(excerpt)
+
+            # First, get the degradation order for this iteration.
+            # Get the current distribution of degradations
+            if np.sum(deg_counts) == 0:  # First iteration, set to uniform
+                current_deg_dist = np.ones(nr_degs) / nr_degs
+                current_split_dist = np.ones(nr_splits) / nr_splits
+            else:
+                current_deg_dist = deg_counts / np.sum(deg_counts)
+                current_split_dist = split_counts / np.sum(split_counts)
+
+            # Try degradations in reverse order of the difference between
+            # their current distribution and their desired distribution.
+            diffs = goal_deg_dist - current_deg_dist
+            degs_sorted = sorted(
+                zip(diffs, deg_choices, list(range(len(deg_choices))))
+            )[::-1]
+
+            # Calculate split in the same way (but only save the first)
+            split_diffs = split_props - current_split_dist
+            _, split_name, split_num = sorted(
+                zip(split_diffs, split_names, list(range(nr_splits)))
+            )[-1]
+
+            # Make default labels for no degradation
+            clean_path = os.path.join("clean", dataset, excerpt_rel_path)
+            altered_path = clean_path
+            deg_binary = 0
+
+            # Find the degradations which might succeed on this excerpt, so that
+            # those which are certain to fail are not attempted
+            plan = degradations.DegradationPlan(excerpt, copy=False)
+            feasible = dict(
+                zip(
+                    degradations.DEGRADATIONS,
+                    degradations.feasible_degradations(plan, degradation_kwargs),
+                )
             )
 
+            # Try to perform a degradation
+            degraded = None
+            for diff, deg_name, deg_num in degs_sorted:
+                # Break for no degradation
+                if deg_name == "none":
+                    break
+
+                if not feasible[deg_name]:
+                    continue
+
+                # Try the degradation
+                deg_fun = degradations.DEGRADATIONS[deg_name]
+                deg_fun_kwargs = degradation_kwargs[deg_name]  # degradation_kwargs
+                # at top of main call
+                logging.disable(logging.WARNING)
+                degraded = deg_fun(plan, **deg_fun_kwargs)
+                logging.disable(logging.NOTSET)
+
+                if degraded is not None:
+                    # Update labels
+                    deg_binary = 1
+                    altered_path = os.path.join("altered", dataset, excerpt_rel_path)
+
+                    # Write degraded csv
+                    altered_outpath = os.path.join(ARGS.output_dir, altered_path)
+                    fileio.df_to_csv(degraded, altered_outpath)
+                    break
+
+            # Write data
+            if not (degraded is None and ARGS.clean_prop == 0):
+                # Update counts
+                deg_counts[deg_num] += 1
+                split_counts[split_num] += 1
+
+                # Write clean csv
+                clean_outpath = os.path.join(ARGS.output_dir, clean_path)
+                fileio.df_to_csv(excerpt, clean_outpath)
+
+                # Write metadata
+                meta_file.write(
+                    f"{altered_path},{deg_binary},{deg_num},"
+                    f"{clean_path},{split_name}\n"
+                )
+            else:
+                logging.warning(
+                    "Unable to degrade chosen excerpt from "
+                    f"{file_path} and no clean excerpts requested."
+                    " Skipping.",
+                )
+
     meta_file.close()
 
     for f in formats:
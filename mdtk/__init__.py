@@ -2,7 +2,17 @@
 Tools to generate datasets of Altered and Corrupted MIDI Excerpts -`ACME`
 datasets.
 """
-__all__ = ["df_utils", "degradations", "download", "pytorch_datasets"]
+__all__ = [
+    "accel",
+    "benchmarks",
+    "df_utils",
+    "degradations",
+    "download",
+    "note_array",
+    "pytorch_datasets",
+    "stats",
+    "tempo",
+]
 __author__ = "James Owers"
 __credits__ = ["James Owers", "Andrew McLeod"]
 __email__ = "james.f.owers@gmail.com"
@@ -0,0 +1,394 @@
+"""Kernels for the inner loops of the degradations and formatters.
+
+Each kernel has two implementations with identical outputs: a plain loop over
+notes or frames (`*_loop`), which is compiled in nopython mode if numba is
+installed, and a vectorized NumPy implementation (`*_numpy`). The kernel
+itself (without a suffix) is the compiled loop if numba is available, and the
+NumPy implementation otherwise. To install numba, use:
+    pip install numba
+"""
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+
+def jit(func):
+    """This is a function decorator which compiles the given function with
+    numba in nopython mode, if numba is available.
+
+    Parameters
+    ----------
+    func : function
+        The function to compile. It must only use features supported by
+        numba's nopython mode.
+
+    Returns
+    -------
+    jit_func : function
+        The compiled function, or the original function if numba is not
+        available.
+    """
+    if not NUMBA_AVAILABLE:
+        return func
+    return numba.njit(cache=True)(func)
+
+
+def split_note_times_loop(onset, dur, num_splits):
+    """
+    Get the rounded onsets and durations of the notes created by splitting
+    a note into (num_splits + 1) notes of equal length.
+
+    Parameters
+    ----------
+    onset : int
+        The onset time of the note to split.
+
+    dur : int
+        The duration of the note to split.
+
+    num_splits : int
+        The number of splits to make.
+
+    Returns
+    -------
+    first_dur : int
+        The new (rounded) duration of the original note.
+
+    onsets : np.ndarray(int)
+        The (rounded) onset times of the num_splits new notes.
+
+    durs : np.ndarray(int)
+        The durations of the new notes, such that each ends at the rounded
+        onset of the next (and the last ends at the original offset).
+    """
+    short_duration = dur / (num_splits + 1)
+    onsets = np.zeros(num_splits, dtype=np.int64)
+    durs = np.zeros(num_splits, dtype=np.int64)
+
+    next_onset = onset + short_duration
+    for i in range(num_splits):
+        this_onset = next_onset
+        next_onset += short_duration
+
+        onsets[i] = int(np.rint(this_onset))
+        durs[i] = int(np.rint(next_onset)) - onsets[i]
+
+    return int(np.rint(short_duration)), onsets, durs
+
+
+def split_note_times_numpy(onset, dur, num_splits):
+    """
+    Get the rounded onsets and durations of the notes created by splitting
+    a note into (num_splits + 1) notes of equal length.
+
+    See split_note_times_loop for a description of the parameters and
+    return values.
+    """
+    short_duration = dur / (num_splits + 1)
+    # add.accumulate sums sequentially, exactly as the loop does
+    times = np.cumsum(np.append(float(onset), np.full(num_splits + 1, short_duration)))
+    times = np.rint(times[1:]).astype(np.int64)
+    return int(np.rint(short_duration)), times[:-1], np.diff(times)
+
+
+def pitch_overlap_offsets_loop(onset, offset, groups, num_groups):
+    """
+    Get the offset time of each note after removing overlaps between notes of
+    the same group (track and pitch). Each note's offset is extended to the
+    latest offset of any earlier note of its group, and then cut at the
+    onset of the next note of its group.
+
+    Parameters
+    ----------
+    onset : np.ndarray
+        The onset time of each note. Within each group, notes must be sorted
+        by onset.
+
+    offset : np.ndarray
+        The offset time of each note (of the same dtype as onset).
+
+    groups : np.ndarray(int)
+        The group of each note, from 0 to num_groups - 1.
+
+    num_groups : int
+        The number of groups.
+
+    Returns
+    -------
+    new_offset : np.ndarray
+        The offset time of each note after overlaps have been removed, of
+        the same dtype as offset.
+    """
+    new_offset = np.zeros(len(onset), dtype=offset.dtype)
+    latest_offset = np.zeros(num_groups, dtype=offset.dtype)
+    last_note = np.full(num_groups, -1, dtype=np.int64)
+
+    for i in range(len(onset)):
+        group = groups[i]
+        previous = last_note[group]
+        if previous < 0:
+            latest_offset[group] = offset[i]
+        else:
+            latest_offset[group] = max(latest_offset[group], offset[i])
+            new_offset[previous] = min(new_offset[previous], onset[i])
+        new_offset[i] = latest_offset[group]
+        last_note[group] = i
+
+    return new_offset
+
+
+def pitch_overlap_offsets_numpy(onset, offset, groups, num_groups):
+    """
+    Get the offset time of each note after removing overlaps between notes of
+    the same group (track and pitch), in a single segmented pass: the notes
+    are stably sorted by group, each note's offset is extended with a
+    cumulative max which restarts at each group, and then cut at the onset of
+    the next note of the same group.
+
+    See pitch_overlap_offsets_loop for a description of the parameters and
+    return values.
+    """
+    if len(onset) == 0:
+        return np.array(offset, copy=True)
+
+    # Within each group, notes remain in onset order
+    order = np.argsort(groups.astype(np.int64) * len(groups) + np.arange(len(groups)))
+    groups = groups[order]
+    onset = onset[order]
+    offset = offset[order]
+
+    # Segmented cumulative max: offsetting each group by a multiple of the
+    # range of offsets makes every group's values larger than the previous
+    # group's, so the running max restarts at each group
+    min_offset = offset.min()
+    span = int(offset.max()) - int(min_offset) + 1
+    if span * num_groups >= np.iinfo(np.int64).max // 2:
+        # Too large to offset safely
+        new_offset = pitch_overlap_offsets_loop(onset, offset, groups, num_groups)
+    else:
+        group_base = groups.astype(np.int64) * span - min_offset
+        new_offset = np.maximum.accumulate(offset + group_base) - group_base
+
+        # Cut each note at the onset of the next note of its group
+        same_group = groups[1:] == groups[:-1]
+        new_offset[:-1] = np.where(
+            same_group, np.minimum(new_offset[:-1], onset[1:]), new_offset[:-1]
+        )
+
+    result = np.empty_like(new_offset)
+    result[order] = new_offset
+    return result.astype(offset.dtype, copy=False)
+
+
+def pianoroll_frames_loop(onset, offset, pitch, num_frames, num_pitches):
+    """
+    Create a sustain pianoroll and an onset pianoroll from quantized notes.
+
+    Parameters
+    ----------
+    onset : np.ndarray(int)
+        The onset frame of each note.
+
+    offset : np.ndarray(int)
+        The offset frame of each note (exclusive).
+
+    pitch : np.ndarray(int)
+        The pitch of each note.
+
+    num_frames : int
+        The number of frames of the pianorolls. This must be at least the
+        largest offset.
+
+    num_pitches : int
+        The number of pitches of the pianorolls. This must be greater than
+        the largest pitch.
+
+    Returns
+    -------
+    note_pr : np.ndarray(bool)
+        A (num_frames, num_pitches) pianoroll, True where a note is sounding.
+
+    onset_pr : np.ndarray(bool)
+        A (num_frames, num_pitches) pianoroll, True where a note begins.
+    """
+    note_pr = np.zeros((num_frames, num_pitches), dtype=np.bool_)
+    onset_pr = np.zeros((num_frames, num_pitches), dtype=np.bool_)
+    for i in range(len(onset)):
+        onset_pr[onset[i], pitch[i]] = True
+        for frame in range(onset[i], offset[i]):
+            note_pr[frame, pitch[i]] = True
+    return note_pr, onset_pr
+
+
+def pianoroll_frames_numpy(onset, offset, pitch, num_frames, num_pitches):
+    """
+    Create a sustain pianoroll and an onset pianoroll from quantized notes.
+
+    See pianoroll_frames_loop for a description of the parameters and return
+    values.
+    """
+    onset_pr = np.zeros((num_frames, num_pitches), dtype=bool)
+    onset_pr[onset, pitch] = True
+
+    # Count the notes sounding at each frame with a difference array
+    changes = np.zeros((num_frames + 1, num_pitches), dtype=np.int64)
+    np.add.at(changes, (onset, pitch), 1)
+    np.add.at(changes, (offset, pitch), -1)
+    note_pr = np.cumsum(changes[:-1], axis=0) > 0
+    return note_pr, onset_pr
+
+
+def pianoroll_notes_loop(note_pr, onset_counts, check_sustain, sustain_onsets):
+    """
+    Read the notes from a sustain pianoroll and an onset pianoroll.
+
+    A note begins at every onset, and ends at the next onset of its pitch, or
+    at the first frame (with check_sustain) at which its pitch is not
+    sustained, or at the end of the pianoroll.
+
+    Parameters
+    ----------
+    note_pr : np.ndarray(bool)
+        A (num_frames, num_pitches) pianoroll, True where a note is sounding.
+
+    onset_counts : np.ndarray(int)
+        A (num_frames, num_pitches) array containing the number of onsets of
+        each pitch at each frame. All but the last onset of a pitch in a
+        frame create a note of length 0.
+
+    check_sustain : np.ndarray(bool)
+        True for each frame at which sounding notes which are not sustained
+        in note_pr should end. At other frames, note_pr is ignored.
+
+    sustain_onsets : boolean
+        True to begin a note wherever a pitch is sustained in note_pr without
+        a note sounding (as if there were an onset).
+
+    Returns
+    -------
+    onsets : np.ndarray(int)
+        The onset frame of each note, in no particular order.
+
+    pitches : np.ndarray(int)
+        The pitch of each note.
+
+    offsets : np.ndarray(int)
+        The offset frame of each note.
+    """
+    num_frames, num_pitches = note_pr.shape
+    max_notes = onset_counts.sum() + (note_pr.sum() if sustain_onsets else 0)
+    onsets = np.zeros(max_notes, dtype=np.int64)
+    pitches = np.zeros(max_notes, dtype=np.int64)
+    offsets = np.full(max_notes, num_frames, dtype=np.int64)
+    active = np.full(num_pitches, -1, dtype=np.int64)
+    num_notes = 0
+
+    for frame in range(num_frames):
+        # Check that all pitches continue
+        if check_sustain[frame]:
+            for pitch in range(num_pitches):
+                if active[pitch] >= 0 and not note_pr[frame, pitch]:
+                    offsets[active[pitch]] = frame
+                    active[pitch] = -1
+
+        # Check onsets for new notes/breaks in existing notes
+        for pitch in range(num_pitches):
+            for _ in range(onset_counts[frame, pitch]):
+                if active[pitch] >= 0:
+                    offsets[active[pitch]] = frame
+                active[pitch] = num_notes
+                onsets[num_notes] = frame
+                pitches[num_notes] = pitch
+                num_notes += 1
+
+        # Find pitch presences that should've been onsets but weren't
+        if sustain_onsets:
+            for pitch in range(num_pitches):
+                if note_pr[frame, pitch] and active[pitch] < 0:
+                    active[pitch] = num_notes
+                    onsets[num_notes] = frame
+                    pitches[num_notes] = pitch
+                    num_notes += 1
+
+    return onsets[:num_notes], pitches[:num_notes], offsets[:num_notes]
+
+
+def pianoroll_notes_numpy(note_pr, onset_counts, check_sustain, sustain_onsets):
+    """
+    Read the notes from a sustain pianoroll and an onset pianoroll.
+
+    See pianoroll_notes_loop for a description of the parameters and return
+    values.
+    """
+    # Only pitches with an onset (or a sustain) can contain notes
+    starts = onset_counts > 0
+    used = starts.any(axis=0)
+    if sustain_onsets:
+        used |= note_pr.any(axis=0)
+    used = np.flatnonzero(used)
+    note_pr = note_pr[:, used]
+    onset_counts = onset_counts[:, used]
+    starts = starts[:, used]
+
+    num_frames, num_pitches = note_pr.shape
+    frames = np.arange(num_frames)[:, None]
+    ends = check_sustain[:, None] & ~note_pr
+
+    if sustain_onsets:
+        # A pitch is active after a frame if it was last set (by an onset or
+        # sustain) more recently than it was reset (by a missing sustain)
+        sets = starts | note_pr
+        resets = ends & ~sets
+        last_set = np.maximum.accumulate(np.where(sets, frames, -1), axis=0)
+        last_reset = np.maximum.accumulate(np.where(resets, frames, -1), axis=0)
+        was_active = np.zeros((num_frames, num_pitches), dtype=bool)
+        was_active[1:] = (last_set > last_reset)[:-1]
+        sustain_starts = note_pr & ~starts & ~was_active
+    else:
+        sustain_starts = np.zeros((num_frames, num_pitches), dtype=bool)
+
+    # Each note ends at the next onset or missing sustain of its pitch
+    events = np.where(starts | ends, frames, num_frames)
+    next_event = np.full((num_frames, num_pitches), num_frames, dtype=np.int64)
+    if num_frames > 1:
+        next_event[:-1] = np.minimum.accumulate(events[:0:-1], axis=0)[::-1]
+
+    start_frames, start_pitches = np.nonzero(starts)
+    counts = onset_counts[start_frames, start_pitches]
+    onsets = np.repeat(start_frames, counts)
+    pitches = np.repeat(start_pitches, counts)
+    # Repeated onsets create notes of length 0, except the last
+    offsets = onsets.copy()
+    offsets[np.cumsum(counts) - 1] = next_event[start_frames, start_pitches]
+
+    sustain_frames, sustain_pitches = np.nonzero(sustain_starts)
+    return (
+        np.append(onsets, sustain_frames).astype(np.int64),
+        used[np.append(pitches, sustain_pitches).astype(np.int64)],
+        np.append(offsets, next_event[sustain_frames, sustain_pitches]).astype(
+            np.int64
+        ),
+    )
+
+
+split_note_times_loop = jit(split_note_times_loop)
+pitch_overlap_offsets_loop = jit(pitch_overlap_offsets_loop)
+pianoroll_frames_loop = jit(pianoroll_frames_loop)
+pianoroll_notes_loop = jit(pianoroll_notes_loop)
+
+if NUMBA_AVAILABLE:
+    split_note_times = split_note_times_loop
+    pitch_overlap_offsets = pitch_overlap_offsets_loop
+    pianoroll_frames = pianoroll_frames_loop
+    pianoroll_notes = pianoroll_notes_loop
+else:
+    # For a single note, the loop is faster than NumPy even without numba
+    split_note_times = split_note_times_loop
+    pitch_overlap_offsets = pitch_overlap_offsets_numpy
+    pianoroll_frames = pianoroll_frames_numpy
+    pianoroll_notes = pianoroll_notes_numpy
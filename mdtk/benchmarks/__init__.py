@@ -0,0 +1,9 @@
+"""Benchmarks measuring the throughput of mdtk's degradation engine.
+
+Run all of the benchmarks and write the results to a json file with:
+    python -m mdtk.benchmarks -o results.json
+
+Benchmark the kernels of mdtk.accel on full pieces with:
+    python -m mdtk.benchmarks --accel --midi-dir path/to/midi -o results.json
+"""
+__all__ = ["accel", "degradations"]
@@ -0,0 +1,183 @@
+"""Script to benchmark the degradations and write the results to a json file."""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from mdtk.accel import NUMBA_AVAILABLE
+from mdtk.benchmarks.accel import KERNELS, load_pieces, run_accel_benchmarks
+from mdtk.benchmarks.degradations import run_benchmarks
+from mdtk.degradations import DEGRADATIONS
+
+DESCRIPTION = "Benchmark the throughput of mdtk's degradations."
+
+
+def parse_args(args_input=None):
+    """Convenience function for parsing user supplied command line args"""
+    parser = argparse.ArgumentParser(
+        description=DESCRIPTION, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="benchmark_results.json",
+        help="The json file to write the results to.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="The number of notes in the generated excerpts.",
+    )
+    parser.add_argument(
+        "--polyphonies",
+        type=float,
+        nargs="+",
+        default=[1, 4],
+        help="The average polyphony of the generated excerpts.",
+    )
+    parser.add_argument(
+        "--num-tracks",
+        type=int,
+        default=1,
+        help="The number of tracks in the generated excerpts.",
+    )
+    parser.add_argument(
+        "--num-excerpts",
+        type=int,
+        default=10,
+        help="The number of excerpts to generate for each size and polyphony.",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="The number of times to degrade each excerpt with each degradation.",
+    )
+    parser.add_argument(
+        "--degradations",
+        metavar="deg_name",
+        nargs="*",
+        choices=list(DEGRADATIONS.keys()),
+        default=list(DEGRADATIONS.keys()),
+        help="The degradations to benchmark.",
+    )
+    parser.add_argument(
+        "--no-degrader",
+        action="store_true",
+        help="Don't benchmark Degrader.degrade.",
+    )
+    parser.add_argument(
+        "--note-array",
+        action="store_true",
+        help="Degrade NoteArrays rather than note_dfs.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="The seed to use for the benchmarks."
+    )
+    parser.add_argument(
+        "--accel",
+        action="store_true",
+        help="Benchmark the kernels of mdtk.accel on full pieces instead of "
+        "the degradations.",
+    )
+    parser.add_argument(
+        "--midi-dir",
+        type=str,
+        default=None,
+        help="A directory of MIDI files (e.g. PianoMidi) to load pieces from "
+        "for --accel. By default, synthetic pieces are used.",
+    )
+    parser.add_argument(
+        "--num-pieces",
+        type=int,
+        default=5,
+        help="The number of pieces to benchmark for --accel.",
+    )
+    parser.add_argument(
+        "--kernels",
+        metavar="kernel",
+        nargs="*",
+        choices=KERNELS,
+        default=KERNELS,
+        help="The kernels to benchmark for --accel.",
+    )
+    args = parser.parse_args(args=args_input)
+    return args
+
+
+def main(args_input=None):
+    args = parse_args(args_input)
+
+    if args.accel:
+        main_accel(args)
+        return
+
+    results = run_benchmarks(
+        sizes=args.sizes,
+        polyphonies=args.polyphonies,
+        num_tracks=args.num_tracks,
+        num_excerpts=args.num_excerpts,
+        repeats=args.repeats,
+        degradations=args.degradations,
+        include_degrader=not args.no_degrader,
+        note_array=args.note_array,
+        seed=args.seed,
+    )
+
+    write_results(args, results)
+
+    for result in results:
+        print(
+            f"{result['degradation']:>18} size={result['size']:<6} "
+            f"polyphony={result['polyphony']:<4} "
+            f"{result['ops_per_sec']:10.1f} ops/s  "
+            f"p50={result['p50_ms']:.3f}ms  p99={result['p99_ms']:.3f}ms  "
+            f"failed={result['failure_rate']:.2f}  "
+            f"peak={result['peak_memory_bytes'] / 1024:.1f}KiB"
+        )
+    print(f"Results written to {args.output}")
+
+
+def main_accel(args):
+    pieces = load_pieces(
+        midi_dir=args.midi_dir, num_pieces=args.num_pieces, seed=args.seed
+    )
+    results = run_accel_benchmarks(pieces, repeats=args.repeats, kernels=args.kernels)
+    write_results(args, results)
+
+    for result in results:
+        speedup = f"  speedup={result['speedup']:.1f}x" if "speedup" in result else ""
+        print(
+            f"{result['kernel']:>22} {result['backend']:>5} "
+            f"piece={result['piece']:<3} notes={result['num_notes']:<6} "
+            f"mean={result['mean_ms']:.3f}ms{speedup}"
+        )
+    print(f"Results written to {args.output}")
+
+
+def write_results(args, results):
+    output = {
+        "metadata": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "numba": NUMBA_AVAILABLE,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(output, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Benchmarks comparing the NumPy and numba implementations of the kernels in
+mdtk.accel, on full pieces (such as those of the PianoMidi dataset)."""
+import os
+import time
+from glob import glob
+
+import numpy as np
+
+from mdtk import accel
+from mdtk.benchmarks.degradations import make_excerpt, summarize_times
+from mdtk.fileio import midi_to_df
+
+KERNELS = [
+    "split_note_times",
+    "pitch_overlap_offsets",
+    "pianoroll_frames",
+    "pianoroll_notes",
+]
+
+BACKEND_SUFFIXES = {"numpy": "numpy", "numba": "loop"}
+
+
+def load_pieces(midi_dir=None, num_pieces=5, num_notes=20000, seed=0):
+    """
+    Load full pieces to benchmark the kernels on.
+
+    Parameters
+    ----------
+    midi_dir : string
+        A directory to search (recursively) for MIDI files, for example the
+        PianoMidi data downloaded by mdtk.downloaders.PianoMidi. If None,
+        synthetic pieces are generated instead.
+
+    num_pieces : int
+        The number of pieces to load.
+
+    num_notes : int
+        The number of notes in each synthetic piece (if midi_dir is None).
+
+    seed : int
+        A seed for the synthetic pieces.
+
+    Returns
+    -------
+    pieces : list(pd.DataFrame)
+        The note_df of each piece (with overlaps not removed).
+    """
+    if midi_dir is None:
+        rng = np.random.default_rng(seed)
+        return [
+            make_excerpt(num_notes, polyphony=4, num_tracks=2, seed=rng)
+            for _ in range(num_pieces)
+        ]
+
+    paths = sorted(
+        glob(os.path.join(midi_dir, "**", "*.mid"), recursive=True)
+        + glob(os.path.join(midi_dir, "**", "*.midi"), recursive=True)
+    )
+    pieces = []
+    for path in paths:
+        piece = midi_to_df(path)
+        if piece is not None and len(piece) > 0:
+            pieces.append(piece)
+        if len(pieces) == num_pieces:
+            break
+    return pieces
+
+
+def kernel_inputs(piece, time_increment=40):
+    """
+    Get the arguments with which each kernel is called on a piece (as in the
+    degradations and formatters).
+
+    Parameters
+    ----------
+    piece : pd.DataFrame
+        The note_df of a piece.
+
+    time_increment : int
+        The length of a pianoroll frame, in milliseconds.
+
+    Returns
+    -------
+    inputs : dict(string -> list(tuple))
+        For each kernel in KERNELS, a list of the argument tuples with which
+        to call it. split_note_times is called once for every note.
+    """
+    piece = piece.sort_values(["onset", "track", "pitch", "dur"])
+    onset = piece["onset"].to_numpy()
+    dur = piece["dur"].to_numpy()
+    pitch = piece["pitch"].to_numpy()
+    _, groups = np.unique(
+        piece[["track", "pitch"]].to_numpy(), axis=0, return_inverse=True
+    )
+    groups = groups.reshape(-1)
+
+    quant_onset = np.round(onset / time_increment).astype(np.int64)
+    quant_offset = np.maximum(
+        np.round((onset + dur) / time_increment).astype(np.int64), quant_onset + 1
+    )
+    pr_args = (quant_onset, quant_offset, pitch, quant_offset.max(), pitch.max() + 1)
+    note_pr, onset_pr = accel.pianoroll_frames_numpy(*pr_args)
+
+    return {
+        "split_note_times": [(on, d, 2) for on, d in zip(onset, dur)],
+        "pitch_overlap_offsets": [(onset, onset + dur, groups, groups.max() + 1)],
+        "pianoroll_frames": [pr_args],
+        "pianoroll_notes": [
+            (
+                note_pr,
+                onset_pr.astype(np.int64),
+                np.ones(len(note_pr), dtype=bool),
+                True,
+            )
+        ],
+    }
+
+
+def run_accel_benchmarks(pieces, repeats=3, kernels=KERNELS, backends=None):
+    """
+    Time each kernel's implementations on each of the given pieces.
+
+    Parameters
+    ----------
+    pieces : list(pd.DataFrame)
+        The pieces to benchmark the kernels on (see load_pieces).
+
+    repeats : int
+        The number of times to time each kernel on each piece. Each kernel is
+        also called once beforehand, so that numba compilation is not timed.
+
+    kernels : list(string)
+        The names of the kernels to benchmark, from KERNELS.
+
+    backends : list(string)
+        The implementations to benchmark: "numpy" and/or "numba". By default,
+        "numba" is included only if numba is available.
+
+    Returns
+    -------
+    results : list(dict)
+        A result for each (piece, kernel, backend) triple, containing those
+        values, the number of notes in the piece, the fields returned by
+        summarize_times (where a call is one run over the whole piece), and,
+        for backends other than "numpy", the speedup over "numpy".
+    """
+    if backends is None:
+        backends = ["numpy"] + (["numba"] if accel.NUMBA_AVAILABLE else [])
+    assert "numba" not in backends or accel.NUMBA_AVAILABLE, "numba is not available."
+
+    results = []
+    for piece_index, piece in enumerate(pieces):
+        inputs = kernel_inputs(piece)
+        for kernel in kernels:
+            baseline = None
+            for backend in backends:
+                func = getattr(accel, f"{kernel}_{BACKEND_SUFFIXES[backend]}")
+                func(*inputs[kernel][0])
+
+                times = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    for args in inputs[kernel]:
+                        func(*args)
+                    times.append(time.perf_counter() - start)
+
+                result = {
+                    "kernel": kernel,
+                    "backend": backend,
+                    "piece": piece_index,
+                    "num_notes": len(piece),
+                }
+                result.update(summarize_times(times, 0))
+                if backend == "numpy":
+                    baseline = result["mean_ms"]
+                elif baseline is not None:
+                    result["speedup"] = baseline / max(result["mean_ms"], 1e-12)
+                results.append(result)
+
+    return results
@@ -0,0 +1,260 @@
+"""Benchmarks of the functions in DEGRADATIONS and of Degrader.degrade, on
+synthetic excerpts of controlled size and polyphony."""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from mdtk.degradations import DEGRADATIONS
+from mdtk.degrader import Degrader, suppress_warnings
+from mdtk.df_utils import clean_df
+from mdtk.note_array import NoteArray
+
+DEGRADER_NAME = "Degrader.degrade"
+
+
+def make_excerpt(
+    num_notes,
+    polyphony=1,
+    num_tracks=1,
+    min_pitch=48,
+    max_pitch=84,
+    mean_dur=250,
+    seed=None,
+):
+    """
+    Generate a synthetic (clean) note_df excerpt.
+
+    Parameters
+    ----------
+    num_notes : int
+        The number of notes to generate. The excerpt can contain slightly
+        fewer notes, since overlaps between notes of the same track and
+        pitch are removed.
+
+    polyphony : float
+        The average number of notes sounding at any time. The length of
+        the excerpt is set to achieve this.
+
+    num_tracks : int
+        The number of tracks to assign notes to (uniformly at random).
+
+    min_pitch : int
+        The minimum pitch of any note.
+
+    max_pitch : int
+        The maximum pitch of any note.
+
+    mean_dur : int
+        The mean duration of a note, in ms. Durations are drawn from an
+        exponential distribution (with a minimum of 1 ms).
+
+    seed : int or np.random.Generator
+        A seed for the random numbers used.
+
+    Returns
+    -------
+    excerpt : pd.DataFrame
+        A clean, non-overlapping note_df.
+    """
+    rng = np.random.default_rng(seed)
+    length = max(int(num_notes * mean_dur / polyphony), 1)
+    excerpt = pd.DataFrame(
+        {
+            "onset": rng.integers(0, length, num_notes),
+            "track": rng.integers(0, num_tracks, num_notes),
+            "pitch": rng.integers(min_pitch, max_pitch + 1, num_notes),
+            "dur": np.maximum(rng.exponential(mean_dur, num_notes).astype(int), 1),
+        }
+    )
+    return clean_df(excerpt, non_overlapping=True)
+
+
+def summarize_times(times, failures):
+    """
+    Summarize the latencies and failures of a number of calls.
+
+    Parameters
+    ----------
+    times : list(float)
+        The latency of each call, in seconds.
+
+    failures : int
+        The number of calls which failed.
+
+    Returns
+    -------
+    summary : dict
+        The number of calls, and the ops_per_sec, mean_ms, p50_ms, p99_ms,
+        and failure_rate of the calls.
+    """
+    times = np.array(times)
+    return {
+        "calls": len(times),
+        "ops_per_sec": len(times) / max(times.sum(), 1e-12),
+        "mean_ms": times.mean() * 1000,
+        "p50_ms": np.percentile(times, 50) * 1000,
+        "p99_ms": np.percentile(times, 99) * 1000,
+        "failure_rate": failures / len(times),
+    }
+
+
+def measure_peak_memory(func, excerpts):
+    """
+    Measure the peak memory allocated (by Python and numpy) while calling
+    the given function on each excerpt once.
+
+    Parameters
+    ----------
+    func : function
+        The function to call, with an excerpt as its only argument.
+
+    excerpts : list
+        The excerpts to call func on.
+
+    Returns
+    -------
+    peak_memory : int
+        The peak memory, in bytes, allocated during the calls.
+    """
+    tracemalloc.start()
+    try:
+        for excerpt in excerpts:
+            func(excerpt)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def benchmark_function(func, excerpts, repeats=1):
+    """
+    Time calls of the given degradation function on each excerpt.
+
+    Parameters
+    ----------
+    func : function
+        The function to time. It is called with an excerpt as its only
+        argument, and fails if it returns None.
+
+    excerpts : list
+        The excerpts to call func on.
+
+    repeats : int
+        The number of times to call func on each excerpt.
+
+    Returns
+    -------
+    result : dict
+        The summary of the calls (see summarize_times), with an additional
+        peak_memory_bytes field (see measure_peak_memory).
+    """
+    times = []
+    failures = 0
+    for _ in range(repeats):
+        for excerpt in excerpts:
+            start = time.perf_counter()
+            degraded = func(excerpt)
+            times.append(time.perf_counter() - start)
+            failures += degraded is None
+
+    result = summarize_times(times, failures)
+    result["peak_memory_bytes"] = measure_peak_memory(func, excerpts)
+    return result
+
+
+def run_benchmarks(
+    sizes=(10, 100, 1000),
+    polyphonies=(1, 4),
+    num_tracks=1,
+    num_excerpts=10,
+    repeats=5,
+    degradations=tuple(DEGRADATIONS.keys()),
+    include_degrader=True,
+    note_array=False,
+    seed=0,
+):
+    """
+    Benchmark each degradation (and Degrader.degrade) on synthetic excerpts
+    of each given size and polyphony.
+
+    Parameters
+    ----------
+    sizes : list(int)
+        The number of notes to generate for each excerpt.
+
+    polyphonies : list(float)
+        The average polyphony of the excerpts.
+
+    num_tracks : int
+        The number of tracks in each excerpt.
+
+    num_excerpts : int
+        The number of different excerpts to generate for each
+        (size, polyphony) pair.
+
+    repeats : int
+        The number of times to degrade each excerpt with each degradation.
+
+    degradations : list(string)
+        The names of the degradations to benchmark.
+
+    include_degrader : boolean
+        True to also benchmark Degrader.degrade (with clean_prop=0, so that
+        a call fails only if every degradation fails).
+
+    note_array : boolean
+        True to degrade NoteArrays rather than note_dfs.
+
+    seed : int
+        A seed for the excerpts and the degradations.
+
+    Returns
+    -------
+    results : list(dict)
+        A result for each (degradation, size, polyphony) triple, containing
+        those values, the mean number of notes in the excerpts, and the
+        fields returned by benchmark_function.
+    """
+    names = list(degradations) + ([DEGRADER_NAME] if include_degrader else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes) * len(polyphonies))
+    results = []
+
+    with suppress_warnings():
+        for (size, polyphony), excerpt_seed in zip(
+            [(size, polyphony) for size in sizes for polyphony in polyphonies], seeds
+        ):
+            rng = np.random.default_rng(excerpt_seed)
+            excerpts = [
+                make_excerpt(size, polyphony, num_tracks, seed=rng)
+                for _ in range(num_excerpts)
+            ]
+            if note_array:
+                excerpts = [NoteArray.from_df(excerpt) for excerpt in excerpts]
+
+            for name in names:
+                if name == DEGRADER_NAME:
+                    degrader = Degrader(seed=rng, clean_prop=0)
+
+                    def func(excerpt):
+                        # With clean_prop=0, label 0 means every degradation failed
+                        degraded, label = degrader.degrade(excerpt)
+                        return degraded if label > 0 else None
+
+                else:
+                    deg_fun = DEGRADATIONS[name]
+
+                    def func(excerpt):
+                        return deg_fun(excerpt, seed=rng)
+
+                result = {
+                    "degradation": name,
+                    "size": size,
+                    "polyphony": polyphony,
+                    "mean_notes": float(np.mean([len(e) for e in excerpts])),
+                }
+                result.update(benchmark_function(func, excerpts, repeats=repeats))
+                results.append(result)
+
+    return results
@@ -1,13 +1,28 @@
 """Code to perform the degradations i.e. edits to the midi data"""
+import itertools
 import logging
 import sys
+import time
 from functools import wraps
 
 import numpy as np
 import pandas as pd
-from numpy.random import choice, randint
 
-from mdtk.df_utils import NOTE_DF_SORT_ORDER
+from mdtk.accel import split_note_times
+from mdtk.df_utils import (
+    NOTE_DF_SORT_ORDER,
+    get_random_generator,
+    is_canonical,
+    mark_canonical,
+)
+from mdtk.note_array import (
+    NoteArray,
+    NoteArrayBatch,
+    NoteEdit,
+    PitchIntervalIndex,
+    overlapping_pairs,
+    pitch_occupancy,
+)
 
 MIN_PITCH_DEFAULT = 21
 MAX_PITCH_DEFAULT = 108
@@ -22,25 +37,22 @@ MAX_GAP_DEFAULT = 50
 
 TRIES_DEFAULT = 10
 
-TRIES_WARN_MSG = (
-    "Generated invalid (overlapping) degraded excerpt "
-    "too many times. Try raising tries parameter (default 10). "
-    "Returning None."
-)
-
 
 def set_random_seed(func, seed=None):
     """This is a function decorator which just adds the keyword argument `seed`
-    to the end of the supplied function that it decorates. It seeds numpy's
-    random state with the provided value before the call of the function.
+    to the end of the supplied function that it decorates. It creates a local
+    random Generator from the provided value (see get_random_generator), and
+    passes it to the function as the keyword argument `rng`. numpy's global
+    random state is never reseeded, so seeded calls are thread-safe.
 
     Parameters
     ----------
     func : function
-        function to be decorated
-    seed : int or None
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
+        function to be decorated. It must take a keyword argument `rng`, and
+        draw all of its random numbers from it.
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) to be supplied to get_random_generator(). None
+        draws a seed from numpy's global random state.
 
     Returns
     -------
@@ -51,13 +63,354 @@ def set_random_seed(func, seed=None):
 
     @wraps(func)
     def seeded_func(*args, seed=seed, **kwargs):
-        if seed is not None:
-            np.random.seed(seed)
-        return func(*args, **kwargs)
+        return func(*args, rng=get_random_generator(seed), **kwargs)
 
     return seeded_func
 
 
+def note_array_io(func):
+    """This is a function decorator which allows a degradation written to work
+    on a DegradationPlan to also be called with a note_df or a NoteArray. Such
+    an excerpt is wrapped in a (single-use) DegradationPlan before the call,
+    and the degraded result is materialized from the returned NoteEdit and
+    converted back into a note_df afterwards if the excerpt was a note_df
+    (which is marked as canonical if it was sorted, so that degrading it
+    again skips sorting). A DegradationPlan is passed through as is.
+
+    The decorated function also accepts a return_edit keyword argument. If it
+    is True, the NoteEdit is returned instead, so that callers which only need
+    to know what was changed can skip copying and re-sorting the excerpt.
+    It also accepts a stats keyword argument: if a stats.DegradationStats is
+    given, the attempt (its success and latency) is recorded in it. Finally,
+    it accepts a window keyword argument: if an (start, end) tuple is given,
+    the degradation is performed only on the notes overlapping that time
+    window (see degrade_window), which is much faster on long excerpts.
+
+    Parameters
+    ----------
+    func : function
+        function to be decorated. Its first argument must be the excerpt,
+        which it will receive as a DegradationPlan, and it must return a
+        NoteEdit (or None).
+
+    Returns
+    -------
+    note_array_func : function
+        The originally supplied function, but now returning the same type
+        (note_df or NoteArray) as the given excerpt (or the excerpt from
+        which the given DegradationPlan was built), or a NoteEdit if called
+        with return_edit=True.
+    """
+
+    @wraps(func)
+    def note_array_func(
+        excerpt, *args, return_edit=False, stats=None, window=None, **kwargs
+    ):
+        if stats is not None:
+            start = time.perf_counter()
+
+        if isinstance(excerpt, DegradationPlan):
+            plan = excerpt
+        else:
+            plan = DegradationPlan(excerpt, copy=False)
+        if window is None:
+            degraded = func(plan, *args, **kwargs)
+        else:
+            degraded = degrade_window(func, plan, window, *args, **kwargs)
+        if degraded is not None and not return_edit:
+            if not plan.as_df:
+                degraded = degraded.notes
+            elif degraded.sort:
+                degraded = mark_canonical(degraded.notes.to_df())
+            else:
+                degraded = degraded.notes.to_df()
+
+        if stats is not None:
+            stats.record_attempt(
+                func.__name__, degraded is not None, time.perf_counter() - start
+            )
+        return degraded
+
+    return note_array_func
+
+
+def degrade_window(deg_func, plan, window, *args, **kwargs):
+    """
+    Perform a degradation on only the notes of an excerpt which overlap a
+    given time window, for example to degrade a long piece locally. The
+    degradation is performed on a plan of the notes in the window (see
+    DegradationPlan.window), so that its cost depends only on the number of
+    notes in the window, and no note is moved outside of their time span.
+    Any note it creates or changes is then checked for overlaps with the
+    notes outside of the window using the excerpt's PitchIntervalIndex, and
+    the degradation is retried (up to tries times) if there are any.
+
+    Parameters
+    ----------
+    deg_func : function
+        The (undecorated) degradation function, which takes a
+        DegradationPlan and returns a NoteEdit or None.
+
+    plan : DegradationPlan
+        A plan of the whole excerpt.
+
+    window : tuple(int, int)
+        The (start, end) times of the window. Notes overlapping this range
+        may be changed.
+
+    args, kwargs
+        Arguments for the degradation (including rng, and optionally tries).
+
+    Returns
+    -------
+    edit : NoteEdit
+        The edit of the whole excerpt (whose base is plan.sorted_notes), or
+        None if the degradation cannot be performed within the window.
+    """
+    indices, origin, window_plan = plan.window(*window)
+    if len(indices) == 0:
+        logging.warning("No notes in the given window. Returning None.")
+        return None
+
+    for _ in range(max(kwargs.get("tries", TRIES_DEFAULT), 1)):
+        edit = deg_func(window_plan, *args, **kwargs)
+        if edit is None:
+            return None
+
+        # Overlaps counted over the whole excerpt, minus those counted
+        # within the window, are overlaps with notes outside of the window
+        new_notes = edit.new_notes()
+        keys = list(zip(new_notes.track.tolist(), new_notes.pitch.tolist()))
+        counts = [
+            pitch_index.count_overlaps(
+                np.array([pitch_index.groups.get(key, -1) for key in keys], dtype=int),
+                new_notes.onset + shift,
+                new_notes.offset + shift,
+            )
+            for pitch_index, shift in (
+                (plan.pitch_index, origin),
+                (window_plan.pitch_index, 0),
+            )
+        ]
+        if np.all(counts[0] == counts[1]):
+            break
+    else:
+        logging.warning(
+            "Degradation overlaps notes outside of the window. Returning None."
+        )
+        return None
+
+    # Shift the edit back from the window's times
+    added = edit.added.copy()
+    added.onset[:] += origin
+    modified = {}
+    for field, (field_indices, values) in edit.modified.items():
+        modified[field] = (
+            indices[field_indices],
+            values + origin if field == "onset" else values,
+        )
+
+    return NoteEdit(
+        plan.sorted_notes,
+        removed=indices[edit.removed],
+        added=added,
+        modified=modified,
+        sort=plan.sort_output and edit.sort,
+        base_sorted=True,
+    )
+
+
+class DegradationPlan:
+    """A DegradationPlan holds an excerpt along with lazily computed tables
+    describing the degradations which can be performed on it (its end time,
+    PitchIntervalIndex, sorted notes, the valid shift ranges of each note,
+    the notes which can be split or joined, etc.).
+
+    Every degradation in DEGRADATIONS accepts a DegradationPlan in place of an
+    excerpt. When the same excerpt is degraded many times, building a plan
+    once and passing it to each call computes each table only once, so that
+    subsequent degradations only have to sample from the cached tables."""
+
+    def __init__(self, excerpt, copy=True, sort_output=True):
+        """
+        Create a new plan for the given excerpt.
+
+        Parameters
+        ----------
+        excerpt : pd.DataFrame or NoteArray
+            The excerpt to be degraded. If it is a canonical note_df (see
+            df_utils.mark_canonical), its notes are used without checking
+            their order or converting their values.
+
+        copy : boolean
+            True to copy the excerpt's notes, so that later changes to the
+            given excerpt don't affect the plan. False to share its memory
+            (in which case the excerpt must not be changed while the plan is
+            in use).
+
+        sort_output : boolean
+            True to sort the degraded excerpts. False to leave the notes of
+            degraded excerpts in an arbitrary order (for example, if further
+            edits will be made to them before they are sorted).
+        """
+        self.as_df = not isinstance(excerpt, NoteArray)
+        # The notes of a canonical note_df are known to be sorted, and need no
+        # conversion
+        self.notes_sorted = self.as_df and is_canonical(excerpt)
+        if self.notes_sorted:
+            self.notes = NoteArray(excerpt.to_numpy().T)
+        else:
+            self.notes = NoteArray.from_df(excerpt)
+        if copy:
+            self.notes = self.notes.copy()
+        self.sort_output = sort_output
+        self.tables = {}
+
+    def __len__(self):
+        return len(self.notes)
+
+    def cached(self, key, func, *args, **kwargs):
+        """
+        Get a cached table, computing it the first time it is requested.
+
+        Parameters
+        ----------
+        key : hashable
+            The key of the table. This must identify all of the arguments
+            which the table depends on.
+
+        func : function
+            A function to compute the table if it is not yet cached.
+
+        args, kwargs
+            The arguments to pass to func.
+
+        Returns
+        -------
+        table : object
+            The cached return value of func.
+        """
+        if key not in self.tables:
+            self.tables[key] = func(*args, **kwargs)
+        return self.tables[key]
+
+    @property
+    def end_time(self):
+        """The latest offset time of any note in the excerpt (or 0)."""
+        return self.cached("end_time", self.notes.offset.max, initial=0)
+
+    @property
+    def sorted_notes(self):
+        """The notes of the excerpt, sorted by NOTE_DF_SORT_ORDER."""
+        return self.cached(
+            "sorted_notes",
+            lambda: self.notes
+            if self.notes_sorted or self.notes.is_sorted()
+            else self.notes.sort(),
+        )
+
+    @property
+    def max_dur(self):
+        """The longest duration of any note in the excerpt (or 0)."""
+        return self.cached("max_dur", self.notes.dur.max, initial=0)
+
+    def window(self, start, end):
+        """
+        Get a plan of the notes of the excerpt which overlap a time window.
+        The notes are found with binary searches on the (cached) sorted
+        notes, so this takes time proportional to the number of notes in the
+        window (and those which begin within max_dur before it), rather than
+        to the length of the excerpt.
+
+        Parameters
+        ----------
+        start : int
+            The beginning of the window.
+
+        end : int
+            The end of the window (exclusive).
+
+        Returns
+        -------
+        indices : np.ndarray
+            The index in self.sorted_notes of each note in the window.
+
+        origin : int
+            The earliest onset of any note in the window (or 0).
+
+        window_plan : DegradationPlan
+            A plan of the notes in the window, in sorted order, with origin
+            subtracted from their onsets (so that degradations of it, which
+            never move notes before time 0 or after its end_time, stay within
+            the time span of the window's notes).
+        """
+        notes = self.sorted_notes
+        onset = notes.onset
+        low = np.searchsorted(onset, start - self.max_dur, side="left")
+        high = np.searchsorted(onset, end, side="left")
+        in_window = (notes.offset[low:high] > start) | (onset[low:high] >= start)
+        indices = low + np.flatnonzero(in_window)
+
+        window_notes = notes[indices]
+        origin = int(window_notes.onset[0]) if len(indices) > 0 else 0
+        window_notes.onset[:] -= origin
+        window_plan = DegradationPlan(window_notes, copy=False)
+        window_plan.notes_sorted = True
+        return indices, origin, window_plan
+
+    @property
+    def pitch_index(self):
+        """A PitchIntervalIndex of the notes of the excerpt."""
+        return self.cached("pitch_index", PitchIntervalIndex, self.notes)
+
+    @property
+    def unique_onsets(self):
+        """The unique onset times of the excerpt, in ascending order."""
+        return self.cached("unique_onsets", np.unique, self.notes.onset)
+
+    @property
+    def unique_durs(self):
+        """The unique durations of the excerpt, in ascending order."""
+        return self.cached("unique_durs", np.unique, self.notes.dur)
+
+    def to_excerpt(self):
+        """
+        Get a copy of the excerpt from which this plan was built.
+
+        Returns
+        -------
+        excerpt : pd.DataFrame or NoteArray
+            A copy of the excerpt, of the same type as the given excerpt.
+        """
+        notes = self.notes.copy()
+        return notes.to_df() if self.as_df else notes
+
+    def degrade(self, deg_name, seed=None, **kwargs):
+        """
+        Perform a degradation on the excerpt, using the cached tables.
+
+        Parameters
+        ----------
+        deg_name : string
+            The name of the degradation to perform, from DEGRADATIONS.
+
+        seed : int, np.random.Generator, or None
+            A seed (or Generator) for the random numbers used. None draws a
+            seed from numpy's global random state.
+
+        kwargs
+            Keyword arguments for the degradation (including return_edit,
+            stats, and window, see note_array_io).
+
+        Returns
+        -------
+        degraded : pd.DataFrame, NoteArray, or NoteEdit
+            The degraded excerpt (of the same type as the given excerpt), or
+            None if the degradation cannot be performed.
+        """
+        return DEGRADATIONS[deg_name](self, seed=seed, **kwargs)
+
+
 def overlaps(df, idx):
     """
     Check if the note at the given index in the given dataframe overlaps any
@@ -65,25 +418,28 @@ def overlaps(df, idx):
 
     Parameters
     ----------
-    df : pd.DataFrame
+    df : pd.DataFrame or NoteArray
         The DataFrame to check for overlaps.
 
     idx : int
-        The index of the note within df that might overlap.
+        The index of the note within df that might overlap. For a NoteArray,
+        this is the note's position.
 
     Returns
     -------
     overlap : boolean
         True if the note overlaps some other note. False otherwise.
     """
-    note = df.loc[idx]
-    df = df.loc[
-        (df["pitch"] == note.pitch) & (df["track"] == note.track) & (df.index != idx)
-    ]
-    overlap = any(
-        (note.onset < df["onset"] + df["dur"]) & (note.onset + note.dur > df["onset"])
+    if not isinstance(df, NoteArray):
+        idx = df.index.get_loc(idx)
+        df = NoteArray.from_df(df)
+
+    others = (df.pitch == df.pitch[idx]) & (df.track == df.track[idx])
+    others[idx] = False
+    overlap = np.any(
+        (df.onset[idx] < df.offset[others]) & (df.offset[idx] > df.onset[others])
     )
-    return overlap
+    return bool(overlap)
 
 
 def pre_process(df, sort=False):
@@ -96,7 +452,7 @@ def pre_process(df, sort=False):
 
     Parameters
     ----------
-    df : pd.DataFrame
+    df : pd.DataFrame or NoteArray
         The dataframe to pre-process.
 
     sort : boolean
@@ -104,25 +460,23 @@ def pre_process(df, sort=False):
 
     Returns
     -------
-    df : pd.DataFrame
-        The postprocessed dataframe.
+    df : pd.DataFrame or NoteArray
+        The postprocessed dataframe, of the same type as the given df.
 
     Raises
     ------
     ValueError
         If the given df does not have all of the necessary columns.
     """
-    try:
-        df = df.loc[:, NOTE_DF_SORT_ORDER]
-    except KeyError:  # df has incorrect columns
-        raise ValueError(
-            f"Input note_df must have all of the columns: {NOTE_DF_SORT_ORDER}"
-        )
-    if sort:
-        df = df.sort_values(NOTE_DF_SORT_ORDER)
-    df = df.reset_index(drop=True)
-    df = df.round().astype(int)
-    return df
+    note_array = NoteArray.from_df(df)
+    if sort and not (isinstance(df, pd.DataFrame) and is_canonical(df)):
+        note_array = note_array.sort()
+    if isinstance(df, NoteArray):
+        return note_array
+    if not sort:
+        # Don't return a df which shares memory with the input
+        note_array = note_array.copy()
+    return note_array.to_df()
 
 
 def post_process(df, sort=True):
@@ -130,12 +484,12 @@ def post_process(df, sort=True):
     Function which will post-process a degraded dataframe.
 
     That means optionally sorting it, resetting the indices to be
-    consecutive ints starting from 0. All degradations call this
-    function after their execution.
+    consecutive ints starting from 0. The output of every degradation is
+    post-processed in this way (see NoteEdit.notes).
 
     Parameters
     ----------
-    df : pd.DataFrame
+    df : pd.DataFrame or NoteArray
         The dataframe to post-process.
 
     sort : boolean
@@ -143,16 +497,41 @@ def post_process(df, sort=True):
 
     Returns
     -------
-    df : pd.DataFrame
-        The postprocessed dataframe.
+    df : pd.DataFrame or NoteArray
+        The postprocessed dataframe, of the same type as the given df.
     """
+    if isinstance(df, NoteArray):
+        return df.sort() if sort else df
     if sort:
         df = df.sort_values(NOTE_DF_SORT_ORDER)
     df = df.reset_index(drop=True)
     return df
 
 
-def split_range_sample(split_range, p=None):
+def between(values, low, high):
+    """
+    Vectorised equivalent of pd.Series.between(low, high) for numpy arrays.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The values to check.
+
+    low : number or np.ndarray
+        The inclusive lower bound.
+
+    high : number or np.ndarray
+        The inclusive upper bound.
+
+    Returns
+    -------
+    mask : np.ndarray
+        A boolean array, True where low <= values <= high.
+    """
+    return (values >= low) & (values <= high)
+
+
+def split_range_sample(split_range, p=None, rng=None):
     """
     Return a value sampled randomly from the given list of ranges. It is
     implemented to first sample a range from the list of ranges `split_range`,
@@ -171,6 +550,10 @@ def split_range_sample(split_range, p=None):
         contains the probability of sampling from each range. p will be
         normalized before use.
 
+    rng : np.random.Generator
+        The random Generator to sample with. None creates one with
+        get_random_generator().
+
     Returns
     -------
     samp : int
@@ -182,1004 +565,1433 @@ def split_range_sample(split_range, p=None):
         range_sizes = [rr[1] - rr[0] for rr in split_range]
         total_range = sum(range_sizes)
         p = [range_size / total_range for range_size in range_sizes]
-    index = choice(range(len(split_range)), p=p)
-    samp = randint(split_range[index][0], split_range[index][1])
+    rng = get_random_generator(rng)
+    index = rng.choice(len(split_range), p=p)
+    samp = rng.integers(split_range[index][0], split_range[index][1])
     return samp
 
 
-@set_random_seed
-def pitch_shift(
-    excerpt,
-    min_pitch=MIN_PITCH_DEFAULT,
-    max_pitch=MAX_PITCH_DEFAULT,
-    distribution=None,
-    tries=TRIES_DEFAULT,
-):
+def values_in_ranges(values, low, high):
     """
-    Shift the pitch of one note from the given excerpt.
+    Find every value lying within each of the given [low, high) ranges, by
+    binary searching for the bounds of all of the ranges at once.
 
     Parameters
     ----------
-    excerpt : pd.DataFrame
-        An excerpt from a piece of music.
+    values : np.ndarray
+        The candidate values, sorted in ascending order.
 
-    min_pitch : int
-        The minimum pitch to which a note may be shifted.
+    low : np.ndarray
+        The inclusive lower bound of each range.
 
-    max_pitch : int
-        The maximum pitch to which a note may be shifted.
+    high : np.ndarray
+        The exclusive upper bound of each range.
 
-    distribution : list(float)
-        If given, a list describing the distribution of pitch shifts.
-        Element (len(distribution) // 2) refers to the note's original
-        pitch, and will be set to 0. Additionally, pitches outside of the
-        range [min_pitch, max_pitch] will also be set to 0. The distribution
-        will then be normalized to sum to 1, and used to generate a new
-        pitch. None implies a uniform distribution.
+    Returns
+    -------
+    range_index : np.ndarray
+        The index of the range of each (range, value) pair.
+
+    range_values : np.ndarray
+        The value of each (range, value) pair.
+    """
+    start = np.searchsorted(values, low, side="left")
+    size = np.maximum(np.searchsorted(values, high, side="left") - start, 0)
+    range_index = np.repeat(np.arange(len(size)), size)
+    positions = np.arange(size.sum()) - np.repeat(np.cumsum(size) - size - start, size)
+    return range_index, values[positions]
 
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
 
-    tries : int
-        The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps.
+def sample_values_in_ranges(values, low, high, rng=None):
+    """
+    Sample a (range, value) pair uniformly from all pairs of a range and a
+    value lying within it. The number of values within each range is counted
+    with binary searches, so the pairs themselves are never enumerated.
 
+    Parameters
+    ----------
+    values : np.ndarray
+        The candidate values, sorted in ascending order.
+
+    low : np.ndarray
+        The inclusive lower bound of each range.
+
+    high : np.ndarray
+        The exclusive upper bound of each range.
+
+    rng : np.random.Generator
+        The random Generator to sample with. None creates one with
+        get_random_generator().
 
     Returns
     -------
-    degraded : pd.DataFrame
-        A degradation of the excerpt, with the pitch of one note changed,
-        or None if the degradation cannot be performed.
+    sample : tuple(int, int)
+        The index of the sampled range, and the sampled value. None if no
+        range contains any value.
     """
-    if len(excerpt) == 0:
-        logging.warning("No notes to pitch shift. Returning None.")
+    start = np.searchsorted(values, low, side="left")
+    size = np.maximum(np.searchsorted(values, high, side="left") - start, 0)
+    cumulative = np.cumsum(size)
+    if len(size) == 0 or cumulative[-1] == 0:
         return None
+    pair = get_random_generator(rng).integers(cumulative[-1])
+    range_index = np.searchsorted(cumulative, pair, side="right")
+    return (
+        range_index,
+        values[start[range_index] + pair - cumulative[range_index] + size[range_index]],
+    )
 
-    excerpt = pre_process(excerpt)
-    orig_dist = distribution
 
-    # Assume all notes can be shifted initially
-    valid_notes = list(excerpt.index)
+def sample_gap(gap_index, gap_start, gap_end, rng=None):
+    """
+    Sample a value uniformly from the union of the given [start, end) gaps,
+    each of which belongs to some item (for example, a note). Larger gaps are
+    therefore more likely to be sampled from, such that every (item, value)
+    pair is equally likely.
 
-    # If distribution is being used, some notes may not be possible to pitch
-    # shift. This is because the distribution supplied would only allow them
-    # to be shifted outside of the supplied (min, max) pitch range. For example
-    # A distribution [0, 0, 1] always shifts up one semitone; a note with
-    # pitch equal to max_pitch can't be shifted with this distribution.
-    if distribution is not None:
-        assert all(
-            [dd >= 0 for dd in distribution]
-        ), "A value in supplied distribution is negative."
-        zero_idx = len(distribution) // 2
-        distribution[zero_idx] = 0
+    Parameters
+    ----------
+    gap_index : np.ndarray
+        The item to which each gap belongs.
 
-        if np.sum(distribution) == 0:
-            logging.warning(
-                "distribution contains only 0s after "
-                "setting distribution[zero_idx] value to 0. "
-                "Returning None."
-            )
-            return None
+    gap_start : np.ndarray
+        The first value of each gap.
 
-        nonzero_indices = np.nonzero(distribution)[0]
+    gap_end : np.ndarray
+        One past the last value of each gap.
 
-        lowest_idx = nonzero_indices[0]
-        highest_idx = nonzero_indices[-1]
+    rng : np.random.Generator
+        The random Generator to sample with. None creates one with
+        get_random_generator().
 
-        min_pitch_shift = zero_idx - lowest_idx
-        max_pitch_shift = highest_idx - zero_idx
+    Returns
+    -------
+    index : int
+        The item of the sampled gap.
 
-        max_to_sample = max_pitch + min_pitch_shift
-        min_to_sample = min_pitch - max_pitch_shift
+    samp : int
+        An integer sampled from the sampled gap.
+    """
+    sizes = gap_end - gap_start
+    rng = get_random_generator(rng)
+    gap = rng.choice(len(sizes), p=sizes / np.sum(sizes))
+    return gap_index[gap], rng.integers(int(gap_start[gap]), int(gap_end[gap]))
 
-        valid_notes = excerpt.index[
-            excerpt["pitch"].between(min_to_sample, max_to_sample)
-        ].tolist()
 
-        if not valid_notes:
-            logging.warning(
-                "No valid pitches to shift given "
-                f"min_pitch {min_pitch}, max_pitch {max_pitch}, "
-                f"and distribution {distribution} (after setting "
-                "distribution[zero_idx] to 0). Returning None."
-            )
-            return None
+def pitch_shift_weights(excerpt, groups, min_pitch, max_pitch, distribution=None):
+    """
+    Get the weight of shifting each note of an excerpt to each pitch. Pitches
+    outside of [min_pitch, max_pitch] and pitches at which the note would
+    overlap another note in its group (including the note's current pitch)
+    have weight 0.
 
-    degraded = excerpt.copy()
+    Parameters
+    ----------
+    excerpt : NoteArray
+        The notes to be shifted.
 
-    # Sample a random note
-    note_index = valid_notes[randint(len(valid_notes))]
-    pitch = degraded.loc[note_index, "pitch"]
+    groups : np.ndarray
+        The group of each note (for example, its track). Notes can only overlap
+        notes in the same group.
+
+    min_pitch : int
+        The minimum pitch to which a note may be shifted.
+
+    max_pitch : int
+        The maximum pitch to which a note may be shifted.
+
+    distribution : np.ndarray
+        If given, the distribution of pitch shifts, as in pitch_shift. Its
+        middle element must already be 0. None implies a uniform distribution.
+
+    Returns
+    -------
+    first_pitch : np.ndarray
+        The pitch of the first column of weights for each note.
 
-    # Shift its pitch
+    weights : np.ndarray
+        An array of shape (len(excerpt), num_pitches), where weights[i, j]
+        is the weight of shifting note i to pitch first_pitch[i] + j.
+    """
     if distribution is None:
-        # Uniform distribution
-        if min_pitch != max_pitch or min_pitch != pitch:
-            while degraded.loc[note_index, "pitch"] == pitch:
-                degraded.loc[note_index, "pitch"] = randint(min_pitch, max_pitch + 1)
+        first_pitch = np.full(len(excerpt), min_pitch)
+        weights = np.ones((len(excerpt), max(max_pitch - min_pitch + 1, 0)))
     else:
-        zero_idx = len(distribution) // 2
-        pitches = np.array(
-            range(pitch - zero_idx, pitch - zero_idx + len(distribution))
-        )
-        distribution[zero_idx] = 0
-        distribution = np.where(pitches < min_pitch, 0, distribution)
-        distribution = np.where(pitches > max_pitch, 0, distribution)
-        distribution = distribution / np.sum(distribution)
-        degraded.loc[note_index, "pitch"] = choice(pitches, p=distribution)
-
-    # Check if overlaps
-    if overlaps(degraded, note_index) or degraded.loc[note_index, "pitch"] == pitch:
-        if tries == 1:
-            logging.warning(TRIES_WARN_MSG)
-            return None
-        return pitch_shift(
-            excerpt,
-            min_pitch=min_pitch,
-            max_pitch=max_pitch,
-            distribution=orig_dist,
-            tries=tries - 1,
-        )
+        first_pitch = excerpt.pitch - len(distribution) // 2
+        pitches = first_pitch[:, None] + np.arange(len(distribution))
+        weights = np.where(between(pitches, min_pitch, max_pitch), distribution, 0)
 
-    degraded = post_process(degraded)
-    return degraded
+    # Remove pitches which would overlap (including the note's own pitch)
+    if np.all(excerpt.dur > 0):
+        weights[pitch_occupancy(excerpt, groups, first_pitch, weights.shape[1])] = 0
+    else:
+        # Notes of zero duration don't occupy any time in the occupancy
+        # bitmap, but can still overlap other notes, so check every pair
+        notes, others = overlapping_pairs(excerpt, groups)
+        notes = np.append(notes, np.arange(len(excerpt)))
+        others = np.append(others, np.arange(len(excerpt)))
+        columns = excerpt.pitch[others] - first_pitch[notes]
+        in_range = (columns >= 0) & (columns < weights.shape[1])
+        weights[notes[in_range], columns[in_range]] = 0
 
+    return first_pitch, weights
 
-@set_random_seed
-def time_shift(
-    excerpt,
-    min_shift=MIN_SHIFT_DEFAULT,
-    max_shift=MAX_SHIFT_DEFAULT,
-    align_onset=False,
-    tries=TRIES_DEFAULT,
-):
+
+def pitch_shift_table(excerpt, min_pitch, max_pitch, distribution=None):
     """
-    Shift the onset and offset times of one note from the given excerpt,
-    leaving its duration unchanged.
+    Get the weights of shifting each note of an excerpt to each pitch (see
+    pitch_shift_weights), along with their cumulative distribution.
 
     Parameters
     ----------
-    excerpt : pd.DataFrame
-        An excerpt from a piece of music.
+    excerpt : NoteArray
+        The notes to be shifted.
 
-    min_shift : int
-        The minimum amount by which the note will be shifted.
+    min_pitch : int
+        The minimum pitch to which a note may be shifted.
 
-    max_shift : int
-        The maximum amount by which the note will be shifted.
+    max_pitch : int
+        The maximum pitch to which a note may be shifted.
 
-    align_onset : boolean
-        Align the shifted note to the onset time of an existing note
-        (within the given shift range).
+    distribution : np.ndarray
+        If given, the distribution of pitch shifts, as in pitch_shift_weights.
 
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
+    Returns
+    -------
+    first_pitch : np.ndarray
+        The pitch of the first column of weights for each note.
 
-    tries : int
-        The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps.
+    weights : np.ndarray
+        The weight of each (note, pitch) pair, as in pitch_shift_weights.
 
+    cdf : np.ndarray
+        The normalized cumulative sum of the flattened weights, or None if
+        all of the weights are 0.
+    """
+    first_pitch, weights = pitch_shift_weights(
+        excerpt, excerpt.track, min_pitch, max_pitch, distribution
+    )
+    total = np.sum(weights)
+    if total == 0:
+        return first_pitch, weights, None
+    cdf = np.cumsum(weights.ravel() / total)
+    cdf /= cdf[-1]
+    return first_pitch, weights, cdf
 
-    Returns
-    -------
-    degraded : pd.DataFrame
-        A degradation of the excerpt, with the timing of one note changed,
-        or None if there are no notes that can be changed.
+
+def time_shift_bounds(plan, min_shift, max_shift):
     """
-    excerpt = pre_process(excerpt)
+    Find the onsets to which each note of an excerpt could be time shifted,
+    ignoring any overlaps with other notes, as [low, high) bounds.
 
-    min_shift = max(min_shift, 1)
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_shift : int
+        The minimum amount by which a note may be shifted.
+
+    max_shift : int
+        The maximum amount by which a note may be shifted.
+
+    Returns
+    -------
+    earlier : tuple(np.ndarray, np.ndarray)
+        The low and high bound of each note's onset when shifted earlier.
 
-    onset = excerpt["onset"]
-    offset = onset + excerpt["dur"]
-    end_time = offset.max()
+    later : tuple(np.ndarray, np.ndarray)
+        The low and high bound of each note's onset when shifted later.
+    """
+    onset = plan.notes.onset
+    offset = plan.notes.offset
+    end_time = plan.end_time
 
     # Shift earlier
-    earliest_earlier_onset = (onset - (max_shift - 1)).clip(lower=0)
+    earliest_earlier_onset = np.maximum(onset - (max_shift - 1), 0)
     latest_earlier_onset = onset - (min_shift - 1)
 
     # Shift later
-    latest_later_onset = onset + (((end_time + 1) - offset).clip(upper=max_shift + 1))
+    latest_later_onset = onset + np.minimum((end_time + 1) - offset, max_shift + 1)
     earliest_later_onset = onset + min_shift
 
-    if align_onset:
-        # Find ranges which contain a note to align to
-        # I couldn't think of a better solution than iterating here.
-        # This code checks, for every range, whether at least 1 onset
-        # lies within that range.
-        onset = pd.Series(onset.unique())
-        for i, (eeo, leo, elo, llo) in enumerate(
-            zip(
-                earliest_earlier_onset,
-                latest_earlier_onset,
-                earliest_later_onset,
-                latest_later_onset,
-            )
-        ):
-            # Go through each range to check there is a valid onset
-            earlier_valid = onset.between(eeo, leo - 1).any()
-            later_valid = onset.between(elo, llo - 1).any()
-
-            # Close invalid ranges
-            if not earlier_valid:
-                earliest_earlier_onset.iloc[i] = leo
-            if not later_valid:
-                earliest_later_onset.iloc[i] = llo
-
-    # Find valid notes
-    valid = (earliest_earlier_onset < latest_earlier_onset) | (
-        earliest_later_onset < latest_later_onset
+    return (
+        (earliest_earlier_onset, latest_earlier_onset),
+        (earliest_later_onset, latest_later_onset),
     )
-    valid_notes = list(valid.index[valid])
 
-    if not valid_notes:
-        logging.warning("No valid notes to time shift. Returning None.")
-        return None
 
-    # Sample a random note
-    index = choice(valid_notes)
+def time_shift_ranges(plan, min_shift, max_shift):
+    """
+    Find the onsets to which each note of an excerpt could be time shifted
+    without overlapping any other note, as [start, end) ranges.
 
-    eeo = earliest_earlier_onset[index]
-    leo = max(latest_earlier_onset[index], eeo)
-    elo = earliest_later_onset[index]
-    llo = max(latest_later_onset[index], elo)
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
 
-    if align_onset:
-        valid_onsets = onset.between(eeo, leo - 1) | onset.between(elo, llo - 1)
-        valid_onsets = list(onset[valid_onsets])
-        onset = choice(valid_onsets)
-    else:
-        onset = split_range_sample([(eeo, leo), (elo, llo)])
+    min_shift : int
+        The minimum amount by which a note may be shifted.
+
+    max_shift : int
+        The maximum amount by which a note may be shifted.
 
-    degraded = excerpt.copy()
+    Returns
+    -------
+    notes : np.ndarray
+        The note to which each range belongs.
 
-    degraded.loc[index, "onset"] = onset
+    starts : np.ndarray
+        The first valid onset of each range.
 
-    # Check if overlaps
-    if overlaps(degraded, index):
-        if tries == 1:
-            logging.warning(TRIES_WARN_MSG)
-            return None
-        return time_shift(
-            excerpt,
-            min_shift=min_shift,
-            max_shift=max_shift,
-            align_onset=align_onset,
-            tries=tries - 1,
-        )
+    ends : np.ndarray
+        One past the last valid onset of each range.
+    """
+    dur = plan.notes.dur
+    earlier, later = time_shift_bounds(plan, min_shift, max_shift)
 
-    degraded = post_process(degraded)
-    return degraded
+    # Find the onsets at which each note would not overlap another note
+    pitch_index = plan.pitch_index
+    earlier = pitch_index.move_gaps(dur, *earlier)
+    later = pitch_index.move_gaps(dur, *later)
+    return tuple(np.append(*pair) for pair in zip(earlier, later))
 
 
-@set_random_seed
-def onset_shift(
-    excerpt,
-    min_shift=MIN_SHIFT_DEFAULT,
-    max_shift=MAX_SHIFT_DEFAULT,
-    min_duration=MIN_DURATION_DEFAULT,
-    max_duration=MAX_DURATION_DEFAULT,
-    align_onset=False,
-    align_dur=False,
-    tries=TRIES_DEFAULT,
-):
+def onset_shift_bounds(plan, min_shift, max_shift, min_duration, max_duration):
     """
-    Shift the onset time of one note from the given excerpt.
+    Find the onsets to which the onset of each note of an excerpt could be
+    shifted, ignoring any overlaps with other notes, as [start, end) bounds.
 
     Parameters
     ----------
-    excerpt : df.DataFrame
-        An excerpt from a piece of music.
+    plan : DegradationPlan
+        A plan of the excerpt.
 
     min_shift : int
-        The minimum amount by which the onset time will be changed.
+        The minimum amount by which an onset may be shifted.
 
     max_shift : int
-        The maximum amount by which the onset time will be changed.
+        The maximum amount by which an onset may be shifted.
 
     min_duration : int
         The minimum duration for the resulting note.
 
     max_duration : int
         The maximum duration for the resulting note.
-        (The offset time will never go beyond the current last offset
-        in the excerpt.)
-
-    align_onset : boolean
-        True to force the shifted onset to lie on an existing onset.
-
-    align_dur : boolean
-        True to force the resulting duration to be equal to an existing
-        duration.
-
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
-
-    tries : int
-        The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps.
 
     Returns
     -------
-    degraded : df.DataFrame
-        A degradation of the excerpt, with the onset time of one note
-        changed, or None if the degradation cannot be performed.
-    """
-    excerpt = pre_process(excerpt)
+    notes : np.ndarray
+        The note to which each bound belongs: each note has one bound for
+        lengthening and one for shortening it. Bounds may be empty.
 
-    min_shift = max(min_shift, 1)
+    starts : np.ndarray
+        The first onset of each bound.
+
+    ends : np.ndarray
+        One past the last onset of each bound.
+    """
     min_duration -= 1  # This makes computation below simpler
 
-    onset = excerpt["onset"]
-    offset = onset + excerpt["dur"]
-    unique_durs = excerpt["dur"].unique()
+    onset = plan.notes.onset
+    offset = plan.notes.offset
 
     # Lengthen bounds (decrease onset)
-    earliest_lengthened_onset = (
-        (offset - max_duration).clip(lower=onset - max_shift).clip(lower=0)
-    )
-    latest_lengthened_onset = (onset - (min_shift - 1)).clip(
-        upper=offset - min_duration
+    earliest_lengthened_onset = np.maximum(
+        np.maximum(offset - max_duration, onset - max_shift), 0
     )
+    latest_lengthened_onset = np.minimum(onset - (min_shift - 1), offset - min_duration)
 
     # Shorten bounds (increase onset)
-    latest_shortened_onset = (offset - min_duration).clip(upper=onset + (max_shift + 1))
-    earliest_shortened_onset = (onset + min_shift).clip(lower=offset - max_duration)
-
-    if align_onset:
-        # Find ranges which contain a note to align to
-        # I couldn't think of a better solution than iterating here.
-        # This code checks, for every range, whether at least 1 onset
-        # lies within that range.
-        onset = pd.Series(onset.unique())
-        for i, (elo, llo, eso, lso) in enumerate(
-            zip(
-                earliest_lengthened_onset,
-                latest_lengthened_onset,
-                earliest_shortened_onset,
-                latest_shortened_onset,
-            )
-        ):
-            # Go through each range to check there is a valid onset
-            earlier_valid = onset.between(elo, llo - 1)
-            later_valid = onset.between(eso, lso - 1)
-
-            if align_dur:
-                # Here, align both onset and dur
-                resulting_dur = offset.iloc[i] - onset
-                dur_valid = resulting_dur.isin(unique_durs)
-                earlier_valid = earlier_valid & dur_valid
-                later_valid = later_valid & dur_valid
-
-            # Collapse down
-            earlier_valid = earlier_valid.any()
-            later_valid = later_valid.any()
-
-            # Close invalid ranges
-            if not earlier_valid:
-                earliest_lengthened_onset.iloc[i] = llo
-            if not later_valid:
-                earliest_shortened_onset.iloc[i] = lso
+    latest_shortened_onset = np.minimum(offset - min_duration, onset + (max_shift + 1))
+    earliest_shortened_onset = np.maximum(onset + min_shift, offset - max_duration)
 
-    elif align_dur:
-        # Here, align_onset is False.
-        # Find ranges which contain a duration to align to
-        # I couldn't think of a better solution than iterating here.
-        # This code checks, for every range, whether at least 1 dur
-        # lies within that range.
-        durs = pd.Series(unique_durs)
-        for i, (elo, llo, lso, eso) in enumerate(
-            zip(
-                earliest_lengthened_onset,
-                latest_lengthened_onset,
-                latest_shortened_onset,
-                earliest_shortened_onset,
-            )
-        ):
-            # Go through each range to check there is a valid dur
-            result = offset[i] - durs
-            lengthened_valid = result.between(elo, llo - 1).any()
-            shortened_valid = result.between(eso, lso - 1).any()
-
-            # Close invalid ranges
-            if not lengthened_valid:
-                earliest_lengthened_onset.iloc[i] = llo
-            if not shortened_valid:
-                earliest_shortened_onset.iloc[i] = lso
-
-    # Find valid notes
-    valid = (earliest_lengthened_onset < latest_lengthened_onset) | (
-        earliest_shortened_onset < latest_shortened_onset
-    )
-    valid_notes = list(valid.index[valid])
+    notes = np.tile(np.arange(len(plan)), 2)
+    starts = np.append(earliest_lengthened_onset, earliest_shortened_onset)
+    ends = np.append(latest_lengthened_onset, latest_shortened_onset)
+    return notes, starts, ends
 
-    if not valid_notes:
-        logging.warning("No valid notes to onset shift. Returning None.")
-        return None
 
-    # Sample a random note
-    index = choice(valid_notes)
+def onset_shift_ranges(plan, min_shift, max_shift, min_duration, max_duration):
+    """
+    Find the onsets to which the onset of each note of an excerpt could be
+    shifted without overlapping any other note, as [start, end) ranges.
 
-    elo = earliest_lengthened_onset[index]
-    llo = max(latest_lengthened_onset[index], elo)
-    eso = earliest_shortened_onset[index]
-    lso = max(latest_shortened_onset[index], eso)
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
 
-    # Sample onset
-    if align_onset:
-        valid_onsets = onset.between(elo, llo - 1) | onset.between(eso, lso - 1)
+    min_shift : int
+        The minimum amount by which an onset may be shifted.
 
-        if align_dur:
-            # Here, align both
-            valid_durs = (offset[index] - onset).isin(unique_durs)
-            valid_onsets = valid_onsets & valid_durs
+    max_shift : int
+        The maximum amount by which an onset may be shifted.
 
-        valid_onsets = list(onset[valid_onsets])
-        onset = choice(valid_onsets)
+    min_duration : int
+        The minimum duration for the resulting note.
 
-    elif align_dur:
-        # Align dur but not onset
-        onsets = offset[index] - durs
-        valid_durs = onsets.between(elo, llo - 1) | onsets.between(eso, lso - 1)
-        valid_durs = list(durs[valid_durs])
-        onset = offset[index] - choice(valid_durs)
+    max_duration : int
+        The maximum duration for the resulting note.
 
-    else:
-        # No alignment
-        onset = split_range_sample([(elo, llo), (eso, lso)])
+    Returns
+    -------
+    notes : np.ndarray
+        The note to which each range belongs.
 
-    degraded = excerpt.copy()
+    starts : np.ndarray
+        The first valid onset of each range.
 
-    degraded.loc[index, "onset"] = onset
-    degraded.loc[index, "dur"] = offset[index] - onset
+    ends : np.ndarray
+        One past the last valid onset of each range.
+    """
+    notes, starts, ends = onset_shift_bounds(
+        plan, min_shift, max_shift, min_duration, max_duration
+    )
 
-    # Check if overlaps
-    if overlaps(degraded, index):
-        if tries == 1:
-            logging.warning(TRIES_WARN_MSG)
-            return None
-        return onset_shift(
-            excerpt,
-            min_shift=min_shift,
-            max_shift=max_shift,
-            min_duration=min_duration + 1,  # Changed above
-            max_duration=max_duration,
-            align_onset=align_onset,
-            align_dur=align_dur,
-            tries=tries - 1,
-        )
+    # A note will not overlap another note as long as its onset is no
+    # earlier than the latest offset of any note which begins before it ends
+    starts = np.maximum(starts, plan.pitch_index.earliest_free_onsets()[notes])
 
-    degraded = post_process(degraded)
-    return degraded
+    # Find the valid onset ranges of each note
+    valid = starts < ends
+    return notes[valid], starts[valid], ends[valid]
 
 
-@set_random_seed
-def offset_shift(
-    excerpt,
-    min_shift=MIN_SHIFT_DEFAULT,
-    max_shift=MAX_SHIFT_DEFAULT,
-    min_duration=MIN_DURATION_DEFAULT,
-    max_duration=MAX_DURATION_DEFAULT,
-    align_dur=False,
-    tries=TRIES_DEFAULT,
-):
+def offset_shift_bounds(plan, min_shift, max_shift, min_duration, max_duration):
     """
-    Shift the offset time of one note from the given excerpt.
+    Find the durations to which each note of an excerpt could be changed by
+    shifting its offset, ignoring any overlaps with other notes, as
+    [start, end) bounds.
 
     Parameters
     ----------
-    excerpt : df.DataFrame
-        An excerpt from a piece of music.
+    plan : DegradationPlan
+        A plan of the excerpt.
 
     min_shift : int
-        The minimum amount by which the offset time will be changed.
+        The minimum amount by which an offset may be shifted.
 
     max_shift : int
-        The maximum amount by which the offset time will be changed.
+        The maximum amount by which an offset may be shifted.
 
     min_duration : int
         The minimum duration for the resulting note.
 
     max_duration : int
         The maximum duration for the resulting note.
-        (The offset time will never go beyond the current last offset
-        in the excerpt.)
-
-    align_dur : boolean
-        True to force the resulting duration to be the same as some
-        other duration in the given excerpt.
-
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
-
-    tries : int
-        The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps.
-
 
     Returns
     -------
-    degraded : df.DataFrame
-        A degradation of the excerpt, with the offset time of one note
-        changed, or None if the degradation cannot be performed.
-    """
-    excerpt = pre_process(excerpt)
+    notes : np.ndarray
+        The note to which each bound belongs: each note has one bound for
+        shortening and one for lengthening it. Bounds may be empty.
 
-    min_shift = max(min_shift, 1)
+    starts : np.ndarray
+        The first duration of each bound.
+
+    ends : np.ndarray
+        One past the last duration of each bound.
+    """
     max_duration += 1
 
-    onset = excerpt["onset"]
-    duration = excerpt["dur"]
-    end_time = (onset + duration).max()
+    onset = plan.notes.onset
+    duration = plan.notes.dur
+    end_time = plan.end_time
 
     # Lengthen bounds (increase duration)
-    shortest_lengthened_dur = (duration + min_shift).clip(lower=min_duration)
-    longest_lengthened_dur = (
-        (duration + (max_shift + 1))
-        .clip(upper=(end_time + 1) - onset)
-        .clip(upper=max_duration)
+    shortest_lengthened_dur = np.maximum(duration + min_shift, min_duration)
+    longest_lengthened_dur = np.minimum(
+        np.minimum(duration + (max_shift + 1), (end_time + 1) - onset), max_duration
     )
 
     # Shorten bounds (decrease duration)
-    shortest_shortened_dur = (duration - max_shift).clip(lower=min_duration)
-    longest_shortened_dur = (duration - (min_shift - 1)).clip(upper=max_duration)
-
-    if align_dur:
-        # Find ranges which contain a duration to align to
-        # I couldn't think of a better solution than iterating here.
-        # This code checks, for every range, whether at least 1 duration
-        # lies within that range.
-        durs = pd.Series(duration.unique())
-        for i, (ssd, lsd, sld, lld) in enumerate(
-            zip(
-                shortest_shortened_dur,
-                longest_shortened_dur,
-                shortest_lengthened_dur,
-                longest_lengthened_dur,
-            )
-        ):
-            # Go through each range to check there is a valid duration
-            shortened_valid = durs.between(ssd, lsd - 1).any()
-            lengthened_valid = durs.between(sld, lld - 1).any()
-
-            # Close invalid ranges
-            if not shortened_valid:
-                shortest_shortened_dur.iloc[i] = lsd
-            if not lengthened_valid:
-                shortest_lengthened_dur.iloc[i] = lld
-
-    # Find valid notes
-    valid = (shortest_lengthened_dur < longest_lengthened_dur) | (
-        shortest_shortened_dur < longest_shortened_dur
-    )
-    valid_notes = list(valid.index[valid])
-
-    if not valid_notes:
-        logging.warning("No valid notes to offset shift. Returning None.")
-        return None
-
-    # Sample a random note
-    index = choice(valid_notes)
-
-    ssd = shortest_shortened_dur[index]
-    lsd = max(longest_shortened_dur[index], ssd)
-    sld = shortest_lengthened_dur[index]
-    lld = max(longest_lengthened_dur[index], sld)
-
-    # Sample new duration
-    if align_dur:
-        valid_durs = durs.between(ssd, lsd - 1) | durs.between(sld, lld - 1)
-        valid_durs = list(durs[valid_durs])
-        duration = choice(valid_durs)
-    else:
-        duration = split_range_sample([(ssd, lsd), (sld, lld)])
-
-    degraded = excerpt.copy()
-
-    degraded.loc[index, "dur"] = duration
-
-    # Check if overlaps
-    if overlaps(degraded, index):
-        if tries == 1:
-            logging.warning(TRIES_WARN_MSG)
-            return None
-        return offset_shift(
-            excerpt,
-            min_shift=min_shift,
-            max_shift=max_shift,
-            min_duration=min_duration,
-            max_duration=max_duration - 1,  # Changed above
-            align_dur=align_dur,
-            tries=tries - 1,
-        )
+    shortest_shortened_dur = np.maximum(duration - max_shift, min_duration)
+    longest_shortened_dur = np.minimum(duration - (min_shift - 1), max_duration)
 
-    degraded = post_process(degraded)
-    return degraded
+    notes = np.tile(np.arange(len(plan)), 2)
+    starts = np.append(shortest_shortened_dur, shortest_lengthened_dur)
+    ends = np.append(longest_shortened_dur, longest_lengthened_dur)
+    return notes, starts, ends
 
 
-@set_random_seed
-def remove_note(excerpt, tries=TRIES_DEFAULT):
+def offset_shift_ranges(plan, min_shift, max_shift, min_duration, max_duration):
     """
-    Remove one note from the given excerpt.
+    Find the durations to which each note of an excerpt could be changed by
+    shifting its offset without overlapping any other note, as [start, end)
+    ranges.
 
     Parameters
     ----------
-    excerpt : df.DataFrame
-        An excerpt from a piece of music.
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_shift : int
+        The minimum amount by which an offset may be shifted.
 
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
+    max_shift : int
+        The maximum amount by which an offset may be shifted.
 
-    tries : int
-        The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps. This is not used, but we keep it for
-        consistency.
+    min_duration : int
+        The minimum duration for the resulting note.
+
+    max_duration : int
+        The maximum duration for the resulting note.
 
     Returns
     -------
-    degraded : df.DataFrame
-        A degradation of the excerpt, with one note removed, or None if
-        the degradations cannot be performed.
-    """
-    if excerpt.shape[0] == 0:
-        logging.warning("No notes to remove. Returning None.")
-        return None
+    notes : np.ndarray
+        The note to which each range belongs.
 
-    degraded = pre_process(excerpt)
+    starts : np.ndarray
+        The first valid duration of each range.
 
-    # Sample a random note
-    note_index = choice(list(degraded.index))
+    ends : np.ndarray
+        One past the last valid duration of each range.
+    """
+    notes, starts, ends = offset_shift_bounds(
+        plan, min_shift, max_shift, min_duration, max_duration
+    )
 
-    # Remove that note
-    degraded = degraded.drop(note_index)
+    # A note will not overlap another note as long as it ends no later
+    # than the earliest onset of any note which ends after it begins
+    free_dur = plan.pitch_index.latest_free_offsets() - plan.notes.onset + 1
+    ends = np.minimum(ends, free_dur[notes])
 
-    # No need to check for overlap
-    degraded = post_process(degraded, sort=False)
-    return degraded
+    # Find the valid duration ranges of each note
+    valid = starts < ends
+    return notes[valid], starts[valid], ends[valid]
 
 
-@set_random_seed
-def add_note(
-    excerpt,
-    min_pitch=MIN_PITCH_DEFAULT,
-    max_pitch=MAX_PITCH_DEFAULT,
-    min_duration=MIN_DURATION_DEFAULT,
-    max_duration=MAX_DURATION_DEFAULT,
-    align_pitch=False,
-    align_time=False,
-    tries=TRIES_DEFAULT,
-):
+def add_note_positions(plan, pitches, min_duration, align_time=False):
     """
-    Add one note to the given excerpt.
+    Find every valid (track, pitch, onset) position at which a note of at
+    least the given duration could be added to an excerpt without
+    overlapping any other note.
 
     Parameters
     ----------
-    excerpt : df.DataFrame
-        An excerpt from a piece of music.
-
-    min_pitch : int
-        The minimum pitch at which a note may be added.
+    plan : DegradationPlan
+        A plan of the (non-empty) excerpt.
 
-    max_pitch : int
-        The maximum pitch at which a note may be added.
+    pitches : np.ndarray
+        The pitches at which a note may be added.
 
     min_duration : int
-        The minimum duration for the note to be added.
-
-    max_duration : int
-        The maximum duration for the added note.
-        (The offset time will never go beyond the current last offset
-        in the excerpt.)
-
-    align_pitch : boolean
-        True to force the added note to lie on the same pitch as an
-        existing note (if one exists). This ignores the given min and
-        max pitches. If excerpt contains only 1 note and align_time
-        is True, this is always set to False.
+        The minimum duration of the note to be added.
 
     align_time : boolean
-        True to force the added note to have the same onset time and
-        duration as an existing note (if one exists), though not
-        necessarily the same (onset, duration) pair as an existing
-        note. If True, this ignores the min and max durations.
-
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
-
-    tries : int
-        The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps.
-
+        True to only allow onsets equal to the onset of an existing note.
 
     Returns
     -------
-    degraded : df.DataFrame
-        A degradation of the excerpt, with one note added, or None if
-        the degradations cannot be performed.
-    """
-    excerpt = pre_process(excerpt)
+    track_pitches : list(tuple(int, int))
+        Every (track, pitch) pair at which a note may be added.
 
-    if len(excerpt) == 0:
-        align_pitch = False
-        align_time = False
+    track_pitch_indices : np.ndarray
+        The index into track_pitches of each position.
 
-    if len(excerpt) == 1 and align_pitch and align_time:
-        align_pitch = False
+    starts : np.ndarray
+        If align_time, the onset of each position. Otherwise, the first valid
+        onset of the range of valid onsets of each position.
 
-    end_time = excerpt[["onset", "dur"]].sum(axis=1).max()
+    ends : np.ndarray
+        None if align_time. Otherwise, one past the last valid onset of the
+        range of valid onsets of each position.
+    """
+    excerpt = plan.notes
+    end_time = plan.end_time
 
-    if align_pitch:
-        pitch = excerpt["pitch"].between(min_pitch, max_pitch, inclusive=True)
-        pitch = excerpt["pitch"][pitch].unique()
-        if len(pitch) == 0:
-            logging.warning("No valid aligned pitch in given range.")
-            return None
-        pitch = choice(pitch)
-    else:
-        pitch = randint(min_pitch, max_pitch + 1)
+    # Track is one of the existing tracks
+    pitch_index = plan.pitch_index
+    tracks = pd.unique(excerpt.track)
+    track_pitches = list(itertools.product(tracks.tolist(), pitches.tolist()))
+    groups = np.array([pitch_index.groups.get(key, -1) for key in track_pitches])
 
-    # Find onset and duration
     if align_time:
-        if min_duration > excerpt["dur"].max() or max_duration < excerpt["dur"].min():
-            logging.warning("No valid aligned duration in given range.")
-            return None
+        onsets = between(excerpt.onset, 0, end_time - min_duration)
+        onsets = pd.unique(excerpt.onset[onsets])
+        free = np.ones((len(groups), len(onsets)), dtype=bool)
+        has_notes = groups >= 0
+        free[has_notes] = (
+            pitch_index.count_overlaps(
+                groups[has_notes, None], onsets, onsets + min_duration
+            )
+            == 0
+        )
+        track_pitch_indices, onset_indices = np.nonzero(free)
+        return track_pitches, track_pitch_indices, onsets[onset_indices], None
 
-        durations = excerpt["dur"].between(min_duration, max_duration, inclusive=True)
-        durations = excerpt["dur"][durations]
-        min_dur = durations.min()
-        onset = excerpt["onset"].between(0, end_time - min_dur, inclusive=True)
-        onset = choice(excerpt["onset"][onset].unique())
-        dur_unique = durations[
-            durations.between(min_dur, end_time - onset, inclusive=True)
-        ].unique()
-        duration = choice(dur_unique)
-    elif min_duration >= end_time:
-        onset = 0
-        duration = min_duration
-    elif excerpt.shape[0] == 0:
-        onset = 0
-        duration = randint(min_duration, min(max_duration + 1, sys.maxsize))
+    if min_duration >= end_time:
+        low, high = 0, 1
     else:
-        onset = randint(excerpt["onset"].min(), end_time - min_duration)
-        duration = randint(min_duration, min(end_time - onset, max_duration + 1))
-
-    # Track is random one of existing tracks
-    try:
-        track = choice(excerpt["track"].unique())
-    except KeyError:  # No track col in df
-        track = 0
-    except ValueError:  # Empty dataframe
-        track = 0
-
-    # Create and add note
-    note = {"pitch": pitch, "onset": onset, "dur": duration, "track": track}
-
-    degraded = excerpt.copy()
-    degraded = degraded.append(note, ignore_index=True)
+        low, high = excerpt.onset.min(), end_time - min_duration
 
-    # Check if overlaps
-    if overlaps(degraded, degraded.index[-1]):
-        if tries == 1:
-            logging.warning(TRIES_WARN_MSG)
-            return None
-        return add_note(
-            excerpt,
-            min_pitch=min_pitch,
-            max_pitch=max_pitch,
-            min_duration=min_duration,
-            max_duration=max_duration,
-            align_pitch=align_pitch,
-            align_time=align_time,
-            tries=tries - 1,
-        )
+    # Gaps between notes of existing (track, pitch) groups
+    gap_groups, starts, ends = pitch_index.insert_gaps(min_duration, low, high)
+    track_pitch_of_group = np.full(len(pitch_index.group_starts), -1)
+    track_pitch_of_group[groups[groups >= 0]] = np.flatnonzero(groups >= 0)
+    track_pitch_indices = track_pitch_of_group[gap_groups]
+    valid = track_pitch_indices >= 0
 
-    degraded = post_process(degraded)
-    return degraded
+    # The whole range for (track, pitch) pairs with no notes
+    empty = np.flatnonzero((groups < 0) & (low < high))
+    track_pitch_indices = np.append(track_pitch_indices[valid], empty)
+    starts = np.append(starts[valid], np.full(len(empty), low))
+    ends = np.append(ends[valid], np.full(len(empty), high))
+    return track_pitches, track_pitch_indices, starts, ends
 
 
-@set_random_seed
-def split_note(
-    excerpt, min_duration=MIN_DURATION_DEFAULT, num_splits=1, tries=TRIES_DEFAULT
-):
+def splittable_notes(plan, min_length):
     """
-    Split one note from the excerpt into two or more notes of equal
-    duration.
+    Find the notes of an excerpt which are long enough to be split (this is
+    cached in the plan).
 
     Parameters
     ----------
-    excerpt : df.DataFrame
-        An excerpt from a piece of music.
-
-    min_duration : int
-        The minimum length for any of the resulting notes.
-
-    num_splits : int
-        The number of splits to make in the chosen note. The note will
-        be split into (num_splits+1) shorter notes.
+    plan : DegradationPlan
+        A plan of the excerpt.
 
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
-
-    tries : int
-        The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps. This is not used, but we keep it for
-        consistency.
+    min_length : int
+        The minimum duration of a note which can be split.
 
     Returns
     -------
-    degraded : df.DataFrame
-        A degradation of the excerpt, with one note split, or None if
-        the degradation cannot be performed.
+    notes : np.ndarray
+        The indices of the notes with at least the given duration.
     """
-    if excerpt.shape[0] == 0:
-        logging.warning("No notes to split. Returning None.")
-        return None
+    return plan.cached(
+        ("split_note", min_length),
+        lambda: np.flatnonzero(plan.notes.dur >= min_length),
+    )
 
-    excerpt = pre_process(excerpt)
 
-    # Find all splitable notes
-    long_enough = excerpt["dur"] >= min_duration * (num_splits + 1)
-    valid_notes = list(long_enough.index[long_enough])
+def joinable_chains(excerpt, max_gap, max_notes, only_first=False):
+    """
+    Find every chain of notes which could be joined into a single note, in a
+    single pass over the excerpt sorted by (track, pitch, onset). Each pair of
+    consecutive notes in this order with the same track and pitch and a gap of
+    at most max_gap is a link, and a chain from some note follows the run of
+    links after it, up to max_notes notes.
 
-    if not valid_notes:
-        logging.warning("No valid notes to split. Returning None.")
-        return None
+    Parameters
+    ----------
+    excerpt : NoteArray
+        An excerpt, sorted by onset.
+
+    max_gap : int
+        The maximum gap length, in ms, for 2 notes to be able to be joined.
 
-    note_index = choice(valid_notes)
+    max_notes : int
+        The maximum number of notes in a chain.
 
-    short_duration_float = excerpt.loc[note_index, "dur"] / (num_splits + 1)
-    pitch = excerpt.loc[note_index, "pitch"]
-    track = excerpt.loc[note_index, "track"]
-    this_onset = excerpt.loc[note_index, "onset"]
-    next_onset = this_onset + short_duration_float
+    only_first : boolean
+        True to only return chains beginning with the first note of a run of
+        linked notes. False to return a chain from every linked note.
 
-    # Add next notes (taking care to round correctly)
-    pitches = [pitch] * num_splits
-    onsets = [0] * num_splits
-    durs = [0] * num_splits
-    tracks = [track] * num_splits
-    for i in range(num_splits):
-        this_onset = next_onset
-        next_onset += short_duration_float
+    Returns
+    -------
+    order : np.ndarray
+        The positions of the excerpt's notes, sorted by (track, pitch, onset).
+
+    chain_starts : np.ndarray
+        The index into order of the first note of each chain.
 
-        onsets[i] = int(round(this_onset))
-        durs[i] = int(round(next_onset)) - int(round(this_onset))
+    chain_lengths : np.ndarray
+        The number of notes in each chain. Chain i contains the notes
+        order[chain_starts[i] : chain_starts[i] + chain_lengths[i]].
+    """
+    # The sort is stable, so notes remain in onset order within each group
+    order = np.lexsort((excerpt.pitch, excerpt.track))
+    track = excerpt.track[order]
+    pitch = excerpt.pitch[order]
+    link = (
+        (np.diff(track) == 0)
+        & (np.diff(pitch) == 0)
+        & (excerpt.onset[order[1:]] - excerpt.offset[order[:-1]] <= max_gap)
+    )
 
-    degraded = excerpt.copy()
-    degraded.loc[note_index, "dur"] = int(round(short_duration_float))
-    new_df = pd.DataFrame(
-        {"onset": onsets, "track": tracks, "pitch": pitches, "dur": durs}
+    # Run-length segmentation: each note's chain continues until the next
+    # missing link (or the last note)
+    breaks = np.append(np.flatnonzero(~link), len(link))
+    run_length = breaks[np.searchsorted(breaks, np.arange(len(link)))] - np.arange(
+        len(link)
     )
-    degraded = degraded.append(new_df, ignore_index=True)
 
-    # No need to check for overlap
-    degraded = post_process(degraded)
-    return degraded
+    valid = link.copy()
+    if only_first:
+        valid[1:] &= ~link[:-1]
+    chain_starts = np.flatnonzero(valid)
+    chain_lengths = np.minimum(run_length[chain_starts], max_notes - 1) + 1
+    keep = chain_lengths >= 2
+    return order, chain_starts[keep], chain_lengths[keep]
 
 
 @set_random_seed
-def join_notes(
+@note_array_io
+def pitch_shift(
     excerpt,
-    max_gap=MAX_GAP_DEFAULT,
-    max_notes=20,
-    only_first=False,
+    min_pitch=MIN_PITCH_DEFAULT,
+    max_pitch=MAX_PITCH_DEFAULT,
+    distribution=None,
     tries=TRIES_DEFAULT,
+    rng=None,
 ):
     """
-    Combine two notes of the same pitch and track into one.
+    Shift the pitch of one note from the given excerpt.
 
     Parameters
     ----------
-    excerpt : df.DataFrame
-        An excerpt from a piece of music.
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
 
-    max_gap : int
-        The maximum gap length, in ms, for 2 notes to be able to be joined.
-        (They must always share the same pitch and track).
+    min_pitch : int
+        The minimum pitch to which a note may be shifted.
 
-    max_notes : int
-        The maximum number of notes to join together. This degradation will
-        greedily join as many notes together as possible up to this value,
-        starting from a randomly chosen note (which may or may not be the
-        first note in a sequence, depending on only_first).
+    max_pitch : int
+        The maximum pitch to which a note may be shifted.
 
-    only_first : boolean
-        True to always begin joining notes from the first note of a
-        sequence of consecutive notes. False will choose a note randomly
-        up to the 2nd-to-last note from all valid sequences.
+    distribution : list(float)
+        If given, a list describing the distribution of pitch shifts.
+        Element (len(distribution) // 2) refers to the note's original
+        pitch, and will be set to 0. Additionally, pitches outside of the
+        range [min_pitch, max_pitch] will also be set to 0. The distribution
+        will then be normalized to sum to 1, and used to generate a new
+        pitch. None implies a uniform distribution.
 
-    seed : int
-        A seed to be supplied to np.random.seed(). None leaves numpy's
-        random state unchanged.
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
 
     tries : int
         The number of times to try the degradation before giving up, in the case
-        that the degraded excerpt overlaps. This is not used, but we keep it for
-        consistency.
+        that the degraded excerpt overlaps. Without a window, only valid
+        degradations are sampled, so one try is always enough. With a window
+        (see degrade_window), the degradation is retried up to this many times
+        while it overlaps a note outside of the window.
+
 
     Returns
     -------
-    degraded : df.DataFrame
-        A degradation of the excerpt, with one note split, or None if
-        the degradation cannot be performed.
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with the pitch of one note changed,
+        or None if the degradation cannot be performed.
     """
-    if excerpt.shape[0] < 2:
-        logging.warning("No notes to join. Returning None.")
+    if len(excerpt) == 0:
+        logging.warning("No notes to pitch shift. Returning None.")
         return None
 
-    excerpt = pre_process(excerpt, sort=True)
+    plan = excerpt
+    excerpt = plan.notes
 
-    valid_starts = []
-    valid_nexts = []
+    if distribution is not None:
+        assert all(
+            [dd >= 0 for dd in distribution]
+        ), "A value in supplied distribution is negative."
+        distribution = np.array(distribution, dtype=float)
+        distribution[len(distribution) // 2] = 0
 
-    for _, track_df in excerpt.groupby("track"):
-        for _, pitch_df in track_df.groupby("pitch"):
-            if len(pitch_df) < 2:
-                continue
+        if np.sum(distribution) == 0:
+            logging.warning(
+                "distribution contains only 0s after "
+                "setting distribution[zero_idx] value to 0. "
+                "Returning None."
+            )
+            return None
 
-            # Get note gaps
-            onset = pitch_df["onset"]
-            offset = onset + pitch_df["dur"]
-            gap_after = onset.shift(-1) - offset
-            gap_after.iloc[-1] = np.inf
-            gap_before = gap_after.shift(1)
-            gap_before.iloc[0] = np.inf
+    first_pitch, weights, cdf = plan.cached(
+        (
+            "pitch_shift",
+            min_pitch,
+            max_pitch,
+            None if distribution is None else tuple(distribution),
+        ),
+        pitch_shift_table,
+        excerpt,
+        min_pitch,
+        max_pitch,
+        distribution,
+    )
 
-            # Get valid notes to start joining from
-            if only_first:
-                valid = (gap_after <= max_gap) & (gap_before > max_gap)
-            else:
-                valid = gap_after <= max_gap
-            valid_starts_this = list(valid.index[valid])
-            valid_next_bool = gap_before <= max_gap
-
-            # Get notes to join for each valid start
-            for start in valid_starts_this:
-                iloc = pitch_df.index.get_loc(start)
-                valid_next = []
-                for i, v in enumerate(valid_next_bool[iloc + 1 :]):
-                    if i + 2 > max_notes or not v:
-                        break
-                    valid_next.append(valid_next_bool.index[iloc + 1 + i])
-                valid_nexts.append(valid_next)
-            valid_starts.extend(valid_starts_this)
-
-    if not valid_starts:
-        logging.warning("No valid notes to join. Returning None.")
+    if cdf is None:
+        if distribution is not None:
+            logging.warning(
+                "No valid pitches to shift given "
+                f"min_pitch {min_pitch}, max_pitch {max_pitch}, "
+                f"and distribution {distribution} (after setting "
+                "distribution[zero_idx] to 0). Returning None."
+            )
+        else:
+            logging.warning("No valid notes to pitch shift. Returning None.")
         return None
 
-    index = randint(len(valid_starts))
+    # Sample a (note, pitch) pair (exactly as rng.choice would with p)
+    pair = np.searchsorted(cdf, rng.random(), side="right")
+    note_index, pitch_index = divmod(pair, weights.shape[1])
 
-    start = valid_starts[index]
-    nexts = valid_nexts[index]
-
-    degraded = excerpt.copy()
-
-    # Extend first note
-    degraded.loc[start]["dur"] = (
-        degraded.loc[nexts[-1]]["onset"]
-        + degraded.loc[nexts[-1]]["dur"]
-        - degraded.loc[start]["onset"]
+    return NoteEdit(
+        excerpt,
+        modified={"pitch": ([note_index], [first_pitch[note_index] + pitch_index])},
+        sort=plan.sort_output,
+        base_sorted=plan.notes_sorted,
     )
 
-    # Drop all following notes note
-    degraded = degraded.drop(nexts)
-
-    # No need to check for overlap
-    degraded = post_process(degraded)
-    return degraded
-
 
-DEGRADATIONS = {
-    "pitch_shift": pitch_shift,
-    "time_shift": time_shift,
+@set_random_seed
+@note_array_io
+def time_shift(
+    excerpt,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    align_onset=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Shift the onset and offset times of one note from the given excerpt,
+    leaving its duration unchanged.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    min_shift : int
+        The minimum amount by which the note will be shifted.
+
+    max_shift : int
+        The maximum amount by which the note will be shifted.
+
+    align_onset : boolean
+        Align the shifted note to the onset time of an existing note
+        (within the given shift range).
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    tries : int
+        The number of times to try the degradation before giving up, in the case
+        that the degraded excerpt overlaps. Without a window, only valid
+        degradations are sampled, so one try is always enough. With a window
+        (see degrade_window), the degradation is retried up to this many times
+        while it overlaps a note outside of the window.
+
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with the timing of one note changed,
+        or None if there are no notes that can be changed.
+    """
+    plan = excerpt
+    excerpt = plan.notes
+
+    min_shift = max(min_shift, 1)
+    notes, starts, ends = plan.cached(
+        ("time_shift", min_shift, max_shift),
+        time_shift_ranges,
+        plan,
+        min_shift,
+        max_shift,
+    )
+
+    # Sample a (note, onset) pair
+    if align_onset:
+        sample = sample_values_in_ranges(plan.unique_onsets, starts, ends, rng=rng)
+    elif len(notes) > 0:
+        sample = sample_gap(np.arange(len(notes)), starts, ends, rng=rng)
+    else:
+        sample = None
+
+    if sample is None:
+        logging.warning("No valid notes to time shift. Returning None.")
+        return None
+    index, onset = notes[sample[0]], sample[1]
+
+    return NoteEdit(
+        excerpt,
+        modified={"onset": ([index], [onset])},
+        sort=plan.sort_output,
+        base_sorted=plan.notes_sorted,
+    )
+
+
+@set_random_seed
+@note_array_io
+def onset_shift(
+    excerpt,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_onset=False,
+    align_dur=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Shift the onset time of one note from the given excerpt.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    min_shift : int
+        The minimum amount by which the onset time will be changed.
+
+    max_shift : int
+        The maximum amount by which the onset time will be changed.
+
+    min_duration : int
+        The minimum duration for the resulting note.
+
+    max_duration : int
+        The maximum duration for the resulting note.
+        (The offset time will never go beyond the current last offset
+        in the excerpt.)
+
+    align_onset : boolean
+        True to force the shifted onset to lie on an existing onset.
+
+    align_dur : boolean
+        True to force the resulting duration to be equal to an existing
+        duration.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    tries : int
+        The number of times to try the degradation before giving up, in the case
+        that the degraded excerpt overlaps. Without a window, only valid
+        degradations are sampled, so one try is always enough. With a window
+        (see degrade_window), the degradation is retried up to this many times
+        while it overlaps a note outside of the window.
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with the onset time of one note
+        changed, or None if the degradation cannot be performed.
+    """
+    plan = excerpt
+    excerpt = plan.notes
+
+    min_shift = max(min_shift, 1)
+    offset = excerpt.offset
+    notes, starts, ends = plan.cached(
+        ("onset_shift", min_shift, max_shift, min_duration, max_duration),
+        onset_shift_ranges,
+        plan,
+        min_shift,
+        max_shift,
+        min_duration,
+        max_duration,
+    )
+
+    # Sample a (note, onset) pair
+    if align_onset and align_dur:
+        # Here, align both onset and dur
+        ranges, onsets = values_in_ranges(plan.unique_onsets, starts, ends)
+        valid = np.isin(offset[notes[ranges]] - onsets, plan.unique_durs)
+        ranges, onsets = ranges[valid], onsets[valid]
+        if len(ranges) == 0:
+            sample = None
+        else:
+            pair = rng.integers(len(ranges))
+            sample = ranges[pair], onsets[pair]
+    elif align_onset:
+        sample = sample_values_in_ranges(plan.unique_onsets, starts, ends, rng=rng)
+    elif align_dur:
+        # onset = offset - dur lies in [start, end) exactly when
+        # dur lies in [offset - end + 1, offset - start + 1)
+        sample = sample_values_in_ranges(
+            plan.unique_durs,
+            offset[notes] - ends + 1,
+            offset[notes] - starts + 1,
+            rng=rng,
+        )
+        if sample is not None:
+            sample = sample[0], offset[notes[sample[0]]] - sample[1]
+    elif len(notes) > 0:
+        sample = sample_gap(np.arange(len(notes)), starts, ends, rng=rng)
+    else:
+        sample = None
+
+    if sample is None:
+        logging.warning("No valid notes to onset shift. Returning None.")
+        return None
+    index, onset = notes[sample[0]], sample[1]
+
+    return NoteEdit(
+        excerpt,
+        modified={
+            "onset": ([index], [onset]),
+            "dur": ([index], [offset[index] - onset]),
+        },
+        sort=plan.sort_output,
+        base_sorted=plan.notes_sorted,
+    )
+
+
+@set_random_seed
+@note_array_io
+def offset_shift(
+    excerpt,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_dur=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Shift the offset time of one note from the given excerpt.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    min_shift : int
+        The minimum amount by which the offset time will be changed.
+
+    max_shift : int
+        The maximum amount by which the offset time will be changed.
+
+    min_duration : int
+        The minimum duration for the resulting note.
+
+    max_duration : int
+        The maximum duration for the resulting note.
+        (The offset time will never go beyond the current last offset
+        in the excerpt.)
+
+    align_dur : boolean
+        True to force the resulting duration to be the same as some
+        other duration in the given excerpt.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    tries : int
+        The number of times to try the degradation before giving up, in the case
+        that the degraded excerpt overlaps. Without a window, only valid
+        degradations are sampled, so one try is always enough. With a window
+        (see degrade_window), the degradation is retried up to this many times
+        while it overlaps a note outside of the window.
+
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with the offset time of one note
+        changed, or None if the degradation cannot be performed.
+    """
+    plan = excerpt
+    excerpt = plan.notes
+
+    min_shift = max(min_shift, 1)
+    notes, starts, ends = plan.cached(
+        ("offset_shift", min_shift, max_shift, min_duration, max_duration),
+        offset_shift_ranges,
+        plan,
+        min_shift,
+        max_shift,
+        min_duration,
+        max_duration,
+    )
+
+    # Sample a (note, duration) pair
+    if align_dur:
+        sample = sample_values_in_ranges(plan.unique_durs, starts, ends, rng=rng)
+    elif len(notes) > 0:
+        sample = sample_gap(np.arange(len(notes)), starts, ends, rng=rng)
+    else:
+        sample = None
+
+    if sample is None:
+        logging.warning("No valid notes to offset shift. Returning None.")
+        return None
+    index, duration = notes[sample[0]], sample[1]
+
+    return NoteEdit(
+        excerpt,
+        modified={"dur": ([index], [duration])},
+        sort=plan.sort_output,
+        base_sorted=plan.notes_sorted,
+    )
+
+
+@set_random_seed
+@note_array_io
+def remove_note(excerpt, tries=TRIES_DEFAULT, rng=None):
+    """
+    Remove one note from the given excerpt.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    tries : int
+        The number of times to try the degradation before giving up, in the case
+        that the degraded excerpt overlaps. With a window (see degrade_window),
+        the degradation is retried up to this many times while it overlaps a
+        note outside of the window, but removing a note never creates an overlap, so
+        one try is always enough.
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with one note removed, or None if
+        the degradations cannot be performed.
+    """
+    if len(excerpt) == 0:
+        logging.warning("No notes to remove. Returning None.")
+        return None
+
+    # Sample a random note
+    note_index = rng.choice(len(excerpt))
+
+    # Remove that note (no need to check for overlap or re-sort)
+    return NoteEdit(excerpt.notes, removed=[note_index], sort=False)
+
+
+@set_random_seed
+@note_array_io
+def add_note(
+    excerpt,
+    min_pitch=MIN_PITCH_DEFAULT,
+    max_pitch=MAX_PITCH_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_pitch=False,
+    align_time=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Add one note to the given excerpt.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    min_pitch : int
+        The minimum pitch at which a note may be added.
+
+    max_pitch : int
+        The maximum pitch at which a note may be added.
+
+    min_duration : int
+        The minimum duration for the note to be added.
+
+    max_duration : int
+        The maximum duration for the added note.
+        (The offset time will never go beyond the current last offset
+        in the excerpt.)
+
+    align_pitch : boolean
+        True to force the added note to lie on the same pitch as an
+        existing note (if one exists). This ignores the given min and
+        max pitches. If excerpt contains only 1 note and align_time
+        is True, this is always set to False.
+
+    align_time : boolean
+        True to force the added note to have the same onset time and
+        duration as an existing note (if one exists), though not
+        necessarily the same (onset, duration) pair as an existing
+        note. If True, this ignores the min and max durations.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    tries : int
+        The number of times to try the degradation before giving up, in the case
+        that the degraded excerpt overlaps. Without a window, only valid
+        degradations are sampled, so one try is always enough. With a window
+        (see degrade_window), the degradation is retried up to this many times
+        while it overlaps a note outside of the window.
+
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with one note added, or None if
+        the degradations cannot be performed.
+    """
+    plan = excerpt
+    excerpt = plan.notes
+
+    if len(excerpt) == 0:
+        align_pitch = False
+        align_time = False
+
+    if len(excerpt) == 1 and align_pitch and align_time:
+        align_pitch = False
+
+    end_time = plan.end_time
+
+    if align_pitch:
+        pitches = between(excerpt.pitch, min_pitch, max_pitch)
+        pitches = pd.unique(excerpt.pitch[pitches])
+        if len(pitches) == 0:
+            logging.warning("No valid aligned pitch in given range.")
+            return None
+    else:
+        pitches = np.arange(min_pitch, max_pitch + 1)
+
+    if len(excerpt) == 0:
+        # Nothing to overlap with
+        note = NoteArray.from_columns(
+            [0],
+            [0],
+            [rng.choice(pitches)],
+            [rng.integers(min_duration, min(max_duration + 1, sys.maxsize))],
+        )
+        return NoteEdit(
+            excerpt, added=note, sort=plan.sort_output, base_sorted=plan.notes_sorted
+        )
+
+    # Find all valid (track, pitch, onset) triples
+    if align_time:
+        if min_duration > excerpt.dur.max() or max_duration < excerpt.dur.min():
+            logging.warning("No valid aligned duration in given range.")
+            return None
+
+        durations = between(excerpt.dur, min_duration, max_duration)
+        durations = excerpt.dur[durations]
+        min_dur = durations.min()
+    else:
+        min_dur = min_duration
+
+    track_pitches, track_pitch_indices, starts, ends = plan.cached(
+        ("add_note", min_pitch, max_pitch, align_pitch, min_dur, align_time),
+        add_note_positions,
+        plan,
+        pitches,
+        min_dur,
+        align_time=align_time,
+    )
+    pitch_index = plan.pitch_index
+
+    if len(track_pitch_indices) == 0:
+        logging.warning("No valid position to add a note. Returning None.")
+        return None
+
+    # Sample a (track, pitch, onset) triple, and then a duration
+    if align_time:
+        triple = rng.integers(len(track_pitch_indices))
+        track, pitch = track_pitches[track_pitch_indices[triple]]
+        onset = starts[triple]
+        longest_dur = min(
+            end_time - onset,
+            pitch_index.min_onset_after(track, pitch, onset) - onset,
+        )
+        dur_unique = pd.unique(durations[between(durations, min_dur, longest_dur)])
+        duration = rng.choice(dur_unique)
+    else:
+        track_pitch_index, onset = sample_gap(
+            track_pitch_indices, starts, ends, rng=rng
+        )
+        track, pitch = track_pitches[track_pitch_index]
+        if min_duration >= end_time:
+            duration = min_duration
+        else:
+            duration = rng.integers(
+                min_duration,
+                min(
+                    end_time - onset,
+                    max_duration + 1,
+                    pitch_index.min_onset_after(track, pitch, onset) - onset + 1,
+                ),
+            )
+
+    # Create and add note
+    note = NoteArray.from_columns([onset], [track], [pitch], [duration])
+
+    return NoteEdit(
+        excerpt, added=note, sort=plan.sort_output, base_sorted=plan.notes_sorted
+    )
+
+
+@set_random_seed
+@note_array_io
+def split_note(
+    excerpt,
+    min_duration=MIN_DURATION_DEFAULT,
+    num_splits=1,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Split one note from the excerpt into two or more notes of equal
+    duration.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    min_duration : int
+        The minimum length for any of the resulting notes.
+
+    num_splits : int
+        The number of splits to make in the chosen note. The note will
+        be split into (num_splits+1) shorter notes.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    tries : int
+        The number of times to try the degradation before giving up, in the case
+        that the degraded excerpt overlaps. With a window (see degrade_window),
+        the degradation is retried up to this many times while it overlaps a
+        note outside of the window, but splitting a note never creates an overlap, so
+        one try is always enough.
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with one note split, or None if
+        the degradation cannot be performed.
+    """
+    if len(excerpt) == 0:
+        logging.warning("No notes to split. Returning None.")
+        return None
+
+    plan = excerpt
+    excerpt = plan.notes
+
+    # Find all splitable notes
+    min_length = min_duration * (num_splits + 1)
+    valid_notes = splittable_notes(plan, min_length)
+
+    if len(valid_notes) == 0:
+        logging.warning("No valid notes to split. Returning None.")
+        return None
+
+    note_index = rng.choice(valid_notes)
+
+    # Add next notes (taking care to round correctly)
+    first_dur, onsets, durs = split_note_times(
+        excerpt.onset[note_index], excerpt.dur[note_index], num_splits
+    )
+    pitches = np.full(num_splits, excerpt.pitch[note_index])
+    tracks = np.full(num_splits, excerpt.track[note_index])
+
+    # No need to check for overlap
+    return NoteEdit(
+        excerpt,
+        added=NoteArray.from_columns(onsets, tracks, pitches, durs),
+        modified={"dur": ([note_index], [first_dur])},
+        sort=plan.sort_output,
+        base_sorted=plan.notes_sorted,
+    )
+
+
+@set_random_seed
+@note_array_io
+def join_notes(
+    excerpt,
+    max_gap=MAX_GAP_DEFAULT,
+    max_notes=20,
+    only_first=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Combine two notes of the same pitch and track into one.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    max_gap : int
+        The maximum gap length, in ms, for 2 notes to be able to be joined.
+        (They must always share the same pitch and track).
+
+    max_notes : int
+        The maximum number of notes to join together. This degradation will
+        greedily join as many notes together as possible up to this value,
+        starting from a randomly chosen note (which may or may not be the
+        first note in a sequence, depending on only_first).
+
+    only_first : boolean
+        True to always begin joining notes from the first note of a
+        sequence of consecutive notes. False will choose a note randomly
+        up to the 2nd-to-last note from all valid sequences.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    tries : int
+        The number of times to try the degradation before giving up, in the case
+        that the degraded excerpt overlaps. With a window (see degrade_window),
+        the degradation is retried up to this many times while it overlaps a
+        note outside of the window, but joining notes never creates an overlap, so
+        one try is always enough.
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        A degradation of the excerpt, with one note split, or None if
+        the degradation cannot be performed.
+    """
+    if len(excerpt) < 2:
+        logging.warning("No notes to join. Returning None.")
+        return None
+
+    plan = excerpt
+    excerpt = plan.sorted_notes
+
+    order, chain_starts, chain_lengths = plan.cached(
+        ("join_notes", max_gap, max_notes, only_first),
+        joinable_chains,
+        excerpt,
+        max_gap,
+        max_notes,
+        only_first=only_first,
+    )
+
+    if len(chain_starts) == 0:
+        logging.warning("No valid notes to join. Returning None.")
+        return None
+
+    index = rng.integers(len(chain_starts))
+
+    chain = order[chain_starts[index] : chain_starts[index] + chain_lengths[index]]
+    start = chain[0]
+    nexts = chain[1:]
+
+    # Extend first note and drop all following notes (no need to check for overlap)
+    return NoteEdit(
+        excerpt,
+        removed=nexts,
+        modified={"dur": ([start], [excerpt.offset[nexts[-1]] - excerpt.onset[start]])},
+        sort=plan.sort_output,
+        base_sorted=True,
+    )
+
+
+DEGRADATIONS = {
+    "pitch_shift": pitch_shift,
+    "time_shift": time_shift,
     "onset_shift": onset_shift,
     "offset_shift": offset_shift,
     "remove_note": remove_note,
@@ -1189,20 +2001,1397 @@ DEGRADATIONS = {
 }
 
 
-def get_degradations(degradation_list=DEGRADATIONS):
+def get_degradations(degradation_list=DEGRADATIONS):
+    """
+    A convenience function to get degradation functions from strings.
+
+    Parameters
+    ----------
+    degradation_list : list of strings
+        list containing the names of the degradation functions to get
+
+    Returns
+    -------
+    degradations : dict(string -> func)
+        A dict containing the name of each degradation mapped to a pointer to
+        the method which performs that degradation.
+    """
+    deg_funcs = [DEGRADATIONS[deg_str] for deg_str in degradation_list]
+    return deg_funcs
+
+
+def any_values_in_ranges(values, low, high):
+    """
+    Check whether any of the given [low, high) ranges contains a value.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The candidate values, sorted in ascending order.
+
+    low : np.ndarray
+        The inclusive lower bound of each range.
+
+    high : np.ndarray
+        The exclusive upper bound of each range.
+
+    Returns
+    -------
+    any_values : boolean
+        True if some value lies within some range.
+    """
+    return bool(
+        np.any(
+            np.searchsorted(values, low, side="left")
+            < np.searchsorted(values, high, side="left")
+        )
+    )
+
+
+def pitch_shift_feasible(
+    plan,
+    min_pitch=MIN_PITCH_DEFAULT,
+    max_pitch=MAX_PITCH_DEFAULT,
+    distribution=None,
+    **kwargs,
+):
+    """
+    Check whether pitch_shift may succeed on an excerpt, ignoring overlaps.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_pitch, max_pitch, distribution
+        The arguments of pitch_shift.
+
+    kwargs
+        Any other arguments of pitch_shift, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if pitch_shift is certain to return None.
+    """
+    pitch = plan.notes.pitch
+    if distribution is None:
+        shifts = np.arange(min_pitch, max_pitch + 1)[:, None] - pitch
+    else:
+        distribution = np.array(distribution, dtype=float)
+        distribution[len(distribution) // 2] = 0
+        shifts = np.flatnonzero(distribution)[:, None] - len(distribution) // 2
+        shifts = np.where(between(pitch + shifts, min_pitch, max_pitch), shifts, 0)
+    return bool(np.any(shifts != 0))
+
+
+def time_shift_feasible(
+    plan,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    align_onset=False,
+    **kwargs,
+):
+    """
+    Check whether time_shift may succeed on an excerpt, ignoring overlaps.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_shift, max_shift, align_onset
+        The arguments of time_shift.
+
+    kwargs
+        Any other arguments of time_shift, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if time_shift is certain to return None.
+    """
+    earlier, later = time_shift_bounds(plan, max(min_shift, 1), max_shift)
+    starts, ends = np.append(earlier[0], later[0]), np.append(earlier[1], later[1])
+    if align_onset:
+        return any_values_in_ranges(plan.unique_onsets, starts, ends)
+    return bool(np.any(starts < ends))
+
+
+def onset_shift_feasible(
+    plan,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_onset=False,
+    align_dur=False,
+    **kwargs,
+):
+    """
+    Check whether onset_shift may succeed on an excerpt, ignoring overlaps.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_shift, max_shift, min_duration, max_duration, align_onset, align_dur
+        The arguments of onset_shift.
+
+    kwargs
+        Any other arguments of onset_shift, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if onset_shift is certain to return None.
+    """
+    notes, starts, ends = onset_shift_bounds(
+        plan, max(min_shift, 1), max_shift, min_duration, max_duration
+    )
+    if align_onset:
+        return any_values_in_ranges(plan.unique_onsets, starts, ends)
+    if align_dur:
+        offset = plan.notes.offset[notes]
+        return any_values_in_ranges(
+            plan.unique_durs, offset - ends + 1, offset - starts + 1
+        )
+    return bool(np.any(starts < ends))
+
+
+def offset_shift_feasible(
+    plan,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_dur=False,
+    **kwargs,
+):
+    """
+    Check whether offset_shift may succeed on an excerpt, ignoring overlaps.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_shift, max_shift, min_duration, max_duration, align_dur
+        The arguments of offset_shift.
+
+    kwargs
+        Any other arguments of offset_shift, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if offset_shift is certain to return None.
+    """
+    _, starts, ends = offset_shift_bounds(
+        plan, max(min_shift, 1), max_shift, min_duration, max_duration
+    )
+    if align_dur:
+        return any_values_in_ranges(plan.unique_durs, starts, ends)
+    return bool(np.any(starts < ends))
+
+
+def remove_note_feasible(plan, **kwargs):
+    """
+    Check whether remove_note will succeed on an excerpt.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    kwargs
+        The arguments of remove_note, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if remove_note will return None.
+    """
+    return len(plan) > 0
+
+
+def add_note_feasible(
+    plan,
+    min_pitch=MIN_PITCH_DEFAULT,
+    max_pitch=MAX_PITCH_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_pitch=False,
+    align_time=False,
+    **kwargs,
+):
+    """
+    Check whether add_note may succeed on an excerpt, ignoring overlaps.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_pitch, max_pitch, min_duration, max_duration, align_pitch, align_time
+        The arguments of add_note.
+
+    kwargs
+        Any other arguments of add_note, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if add_note is certain to return None.
+    """
+    excerpt = plan.notes
+    if len(excerpt) == 0:
+        return True
+
+    if align_pitch and not (len(excerpt) == 1 and align_time):
+        if not np.any(between(excerpt.pitch, min_pitch, max_pitch)):
+            return False
+
+    if align_time:
+        durations = excerpt.dur[between(excerpt.dur, min_duration, max_duration)]
+        return len(durations) > 0 and bool(
+            np.any(between(excerpt.onset, 0, plan.end_time - durations.min()))
+        )
+    return True
+
+
+def split_note_feasible(
+    plan, min_duration=MIN_DURATION_DEFAULT, num_splits=1, **kwargs
+):
+    """
+    Check whether split_note will succeed on an excerpt.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    min_duration, num_splits
+        The arguments of split_note.
+
+    kwargs
+        Any other arguments of split_note, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if split_note will return None.
+    """
+    return len(splittable_notes(plan, min_duration * (num_splits + 1))) > 0
+
+
+def join_notes_feasible(
+    plan, max_gap=MAX_GAP_DEFAULT, max_notes=20, only_first=False, **kwargs
+):
+    """
+    Check whether join_notes will succeed on an excerpt.
+
+    Parameters
+    ----------
+    plan : DegradationPlan
+        A plan of the excerpt.
+
+    max_gap, max_notes, only_first
+        The arguments of join_notes.
+
+    kwargs
+        Any other arguments of join_notes, which don't affect feasibility.
+
+    Returns
+    -------
+    feasible : boolean
+        False if join_notes will return None.
+    """
+    if len(plan) < 2:
+        return False
+    _, chain_starts, _ = plan.cached(
+        ("join_notes", max_gap, max_notes, only_first),
+        joinable_chains,
+        plan.sorted_notes,
+        max_gap,
+        max_notes,
+        only_first=only_first,
+    )
+    return len(chain_starts) > 0
+
+
+FEASIBILITY_CHECKS = {
+    "pitch_shift": pitch_shift_feasible,
+    "time_shift": time_shift_feasible,
+    "onset_shift": onset_shift_feasible,
+    "offset_shift": offset_shift_feasible,
+    "remove_note": remove_note_feasible,
+    "add_note": add_note_feasible,
+    "split_note": split_note_feasible,
+    "join_notes": join_notes_feasible,
+}
+
+
+def feasible_degradations(excerpt, deg_kwargs=None, degradations=tuple(DEGRADATIONS)):
+    """
+    Check which degradations may succeed on an excerpt, without performing
+    any of them. The checks only use cheap, vectorized bounds (ignoring
+    overlaps between notes where finding them would require the full
+    degradation), so a degradation marked feasible may still fail, but one
+    marked infeasible is certain to return None. The checks for remove_note,
+    split_note, and join_notes are exact.
+
+    If a DegradationPlan is given, the tables computed for the checks are
+    cached in it and reused by later degradations of the plan.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame, NoteArray, or DegradationPlan
+        An excerpt from a piece of music, or a DegradationPlan of one.
+
+    deg_kwargs : dict(string -> dict)
+        Keyword arguments of each degradation, keyed by degradation name.
+
+    degradations : list(string)
+        The names of the degradations to check, from DEGRADATIONS.
+
+    Returns
+    -------
+    feasible : np.ndarray
+        A boolean array, False for each degradation (in the given order)
+        which is certain to fail on the excerpt.
+    """
+    if deg_kwargs is None:
+        deg_kwargs = {}
+    if isinstance(excerpt, DegradationPlan):
+        plan = excerpt
+    else:
+        plan = DegradationPlan(excerpt, copy=False)
+
+    return np.array(
+        [
+            FEASIBILITY_CHECKS[name](plan, **deg_kwargs.get(name, {}))
+            for name in degradations
+        ],
+        dtype=bool,
+    )
+
+
+def compose(excerpt, deg_names, seed=None, deg_kwargs=None):
+    """
+    Apply a sequence of degradations to an excerpt in a single pass.
+
+    Each degradation edits the (unsorted) output of the previous one
+    directly: no intermediate note_df is created or sorted, and each edit's
+    tables (such as the PitchIntervalIndex) are built lazily from the current
+    notes only if that degradation needs them. The notes are sorted once at
+    the end.
+
+    The tables are rebuilt from scratch for each edit, rather than updated
+    incrementally with the notes that the previous edit inserted and removed,
+    so each edit which needs the PitchIntervalIndex still pays for an
+    O(n log n) build over all n notes of the excerpt.
+
+    Parameters
+    ----------
+    excerpt : pd.DataFrame or NoteArray
+        The excerpt to degrade.
+
+    deg_names : list(string)
+        The names of the degradations to apply, in order.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    deg_kwargs : dict(string -> dict)
+        Keyword arguments to pass to each degradation, keyed by degradation
+        name.
+
+    Returns
+    -------
+    degraded : pd.DataFrame or NoteArray
+        The degraded excerpt, of the same type as the given excerpt.
+
+    applied : np.ndarray
+        A boolean array, True for each degradation which was applied. A
+        degradation which cannot be performed on the excerpt (as edited so
+        far) is skipped.
+    """
+    rng = get_random_generator(seed)
+    if deg_kwargs is None:
+        deg_kwargs = {}
+
+    notes = NoteArray.from_df(excerpt)
+    applied = np.zeros(len(deg_names), dtype=bool)
+    for index, name in enumerate(deg_names):
+        plan = DegradationPlan(notes, copy=False, sort_output=False)
+        degraded = DEGRADATIONS[name](plan, seed=rng, **deg_kwargs.get(name, {}))
+        if degraded is not None:
+            notes = degraded
+            applied[index] = True
+
+    notes = notes.sort()
+    if isinstance(excerpt, NoteArray):
+        return notes, applied
+    return notes.to_df(), applied
+
+
+def sample_batch_notes(batch, valid=None, rng=None):
+    """
+    Sample one note uniformly at random from each excerpt of a batch.
+
+    Parameters
+    ----------
+    batch : NoteArrayBatch
+        The batch of excerpts to sample from.
+
+    valid : np.ndarray
+        A boolean array with an entry for each note in batch.notes. If given,
+        only notes which are True may be sampled.
+
+    rng : np.random.Generator
+        The random Generator to sample with. None creates one with
+        get_random_generator().
+
+    Returns
+    -------
+    note_index : np.ndarray
+        The position in batch.notes of the note sampled from each excerpt,
+        or -1 for excerpts without any valid notes.
+    """
+    if valid is None:
+        valid = np.ones(len(batch.notes), dtype=bool)
+    counts = np.bincount(batch.excerpt_ids[valid], minlength=len(batch))
+    ranks = (get_random_generator(rng).random(len(batch)) * counts).astype(int)
+
+    # Valid positions are in excerpt order, so each excerpt's valid notes
+    # are contiguous within them
+    valid_positions = np.flatnonzero(valid)
+    first_valid = np.cumsum(counts) - counts
+    note_index = np.full(len(batch), -1)
+    has_valid = counts > 0
+    note_index[has_valid] = valid_positions[(first_valid + ranks)[has_valid]]
+    return note_index
+
+
+def batch_plan(batch):
+    """
+    Create a DegradationPlan of every note of a batch, so that the tables of
+    the single-excerpt degradations (such as time_shift_ranges) can be
+    computed for the whole batch with one call.
+
+    The tracks of the plan's notes are renumbered so that notes of different
+    excerpts are never in the same (track, pitch) group, and the plan's
+    end_time is an array containing the end time of each note's excerpt.
+
+    Parameters
+    ----------
+    batch : NoteArrayBatch
+        The batch of excerpts to plan.
+
+    Returns
+    -------
+    plan : DegradationPlan
+        A plan of batch.notes (in the same order, with renumbered tracks).
+    """
+    notes = batch.notes.copy()
+    excerpt_ids = batch.excerpt_ids
+    if len(notes) > 0:
+        low = notes.track.min()
+        notes.track[:] = excerpt_ids * (notes.track.max() - low + 1) + (
+            notes.track - low
+        )
+    plan = DegradationPlan(notes, copy=False)
+    plan.cached("end_time", lambda: batch_end_times(batch)[excerpt_ids])
+    return plan
+
+
+def batch_end_times(batch):
+    """
+    Get the end time of each excerpt of a batch.
+
+    Parameters
+    ----------
+    batch : NoteArrayBatch
+        The batch of excerpts.
+
+    Returns
+    -------
+    end_times : np.ndarray
+        The latest offset time of any note in each excerpt (or 0).
+    """
+    end_times = np.zeros(len(batch), dtype=np.int64)
+    np.maximum.at(end_times, batch.excerpt_ids, batch.notes.offset)
+    return end_times
+
+
+def sample_batch_ranges(range_excerpts, sizes, num_excerpts, rng=None):
+    """
+    Sample a (range, unit) pair uniformly from each excerpt of a batch, from
+    all pairs of a range belonging to the excerpt and one of the units of the
+    range (for example, a gap of valid onsets and an onset within it). As in
+    sample_gap, larger ranges are therefore more likely to be sampled.
+
+    Parameters
+    ----------
+    range_excerpts : np.ndarray
+        The excerpt to which each range belongs.
+
+    sizes : np.ndarray
+        The number of units in each range. Ranges with no units are never
+        sampled.
+
+    num_excerpts : int
+        The number of excerpts in the batch.
+
+    rng : np.random.Generator
+        The random Generator to sample with. None creates one with
+        get_random_generator().
+
+    Returns
+    -------
+    range_index : np.ndarray
+        The index of the range sampled for each excerpt, or -1 for excerpts
+        without any units.
+
+    unit : np.ndarray
+        The index of the sampled unit within each sampled range (or 0).
+    """
+    sizes = np.maximum(sizes, 0).astype(np.int64)
+    order = np.argsort(range_excerpts, kind="stable")
+    cumulative = np.cumsum(sizes[order])
+    totals = np.zeros(num_excerpts, dtype=np.int64)
+    np.add.at(totals, range_excerpts, sizes)
+
+    has_units = totals > 0
+    targets = (np.cumsum(totals) - totals)[has_units] + get_random_generator(
+        rng
+    ).integers(totals[has_units])
+    positions = np.searchsorted(cumulative, targets, "right")
+
+    range_index = np.full(num_excerpts, -1)
+    range_index[has_units] = order[positions]
+    unit = np.zeros(num_excerpts, dtype=np.int64)
+    unit[has_units] = targets - (cumulative[positions] - sizes[order][positions])
+    return range_index, unit
+
+
+def sample_batch_gaps(gap_excerpts, gap_start, gap_end, num_excerpts, rng=None):
+    """
+    Sample a (gap, value) pair uniformly from each excerpt of a batch, from
+    all pairs of a [start, end) gap belonging to the excerpt and a value
+    within it (the batch version of sample_gap).
+
+    Parameters
+    ----------
+    gap_excerpts : np.ndarray
+        The excerpt to which each gap belongs.
+
+    gap_start : np.ndarray
+        The first value of each gap.
+
+    gap_end : np.ndarray
+        One past the last value of each gap.
+
+    num_excerpts : int
+        The number of excerpts in the batch.
+
+    rng : np.random.Generator
+        The random Generator to sample with. None creates one with
+        get_random_generator().
+
+    Returns
+    -------
+    gap_index : np.ndarray
+        The index of the gap sampled for each excerpt, or -1 for excerpts
+        without any non-empty gap.
+
+    values : np.ndarray
+        The value sampled for each excerpt (undefined where gap_index is -1).
+    """
+    valid = gap_start < gap_end
+    gap_index, unit = sample_batch_ranges(
+        gap_excerpts, np.where(valid, gap_end - gap_start, 0), num_excerpts, rng
+    )
+    values = np.zeros(num_excerpts, dtype=np.int64)
+    sampled = gap_index >= 0
+    values[sampled] = gap_start[gap_index[sampled]] + unit[sampled]
+    return gap_index, values
+
+
+def batch_value_keys(values, excerpt_ids):
+    """
+    Get keys for the values of each excerpt of a batch, such that the keys
+    of each excerpt are ordered like its values, and lie after all of the
+    keys of the excerpts before it.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        An int value for each note of the batch.
+
+    excerpt_ids : np.ndarray
+        The excerpt of each value.
+
+    Returns
+    -------
+    keys : np.ndarray
+        The sorted, unique keys of the (excerpt, value) pairs.
+
+    to_keys : function
+        A function taking an array of values and an array of the excerpts
+        they belong to, and returning their keys. Values outside of the
+        range of the given values are clipped to just outside of it.
+
+    from_keys : function
+        A function taking an array of keys and an array of their excerpts,
+        and returning their values.
+    """
+    base = int(values.min()) - 1 if len(values) > 0 else 0
+    span = int(values.max()) - base + 2 if len(values) > 0 else 1
+
+    def to_keys(key_values, key_excerpts):
+        clipped = np.clip(key_values, base, base + span - 1)
+        return key_excerpts * span + (clipped - base).astype(np.int64)
+
+    def from_keys(keys, key_excerpts):
+        return keys - key_excerpts * span + base
+
+    return np.unique(to_keys(values, excerpt_ids)), to_keys, from_keys
+
+
+def sample_batch_values_in_ranges(
+    values, excerpt_ids, low, high, range_excerpts, num_excerpts, rng=None
+):
+    """
+    Sample a (range, value) pair uniformly from each excerpt of a batch, from
+    all pairs of a [low, high) range belonging to the excerpt and one of the
+    excerpt's values lying within it (the batch version of
+    sample_values_in_ranges).
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The candidate values of every excerpt (for example, the onset of each
+        note of the batch). Duplicates within an excerpt count once.
+
+    excerpt_ids : np.ndarray
+        The excerpt of each value.
+
+    low : np.ndarray
+        The inclusive lower bound of each range.
+
+    high : np.ndarray
+        The exclusive upper bound of each range.
+
+    range_excerpts : np.ndarray
+        The excerpt to which each range belongs.
+
+    num_excerpts : int
+        The number of excerpts in the batch.
+
+    rng : np.random.Generator
+        The random Generator to sample with. None creates one with
+        get_random_generator().
+
+    Returns
+    -------
+    range_index : np.ndarray
+        The index of the range sampled for each excerpt, or -1 for excerpts
+        with no value in any of their ranges.
+
+    values : np.ndarray
+        The value sampled for each excerpt (undefined where range_index is -1).
+    """
+    keys, to_keys, from_keys = batch_value_keys(values, excerpt_ids)
+    start = np.searchsorted(keys, to_keys(low, range_excerpts), "left")
+    size = np.searchsorted(keys, to_keys(high, range_excerpts), "left") - start
+    range_index, unit = sample_batch_ranges(range_excerpts, size, num_excerpts, rng)
+    sampled_values = np.zeros(num_excerpts, dtype=np.int64)
+    sampled = range_index >= 0
+    ranges = range_index[sampled]
+    sampled_values[sampled] = from_keys(
+        keys[start[ranges] + unit[sampled]], range_excerpts[ranges]
+    )
+    return range_index, sampled_values
+
+
+@set_random_seed
+def pitch_shift_batch(
+    batch,
+    min_pitch=MIN_PITCH_DEFAULT,
+    max_pitch=MAX_PITCH_DEFAULT,
+    distribution=None,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Shift the pitch of one note from each excerpt of the given batch. See
+    pitch_shift for details of the parameters.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    notes = batch.notes
+    excerpt_ids = batch.excerpt_ids
+
+    if distribution is not None:
+        assert all(
+            [dd >= 0 for dd in distribution]
+        ), "A value in supplied distribution is negative."
+        distribution = np.array(distribution, dtype=float)
+        distribution[len(distribution) // 2] = 0
+
+    # Notes can only overlap notes of the same excerpt and track
+    groups = excerpt_ids * (notes.track.max(initial=0) + 1) + notes.track
+    first_pitch, weights = pitch_shift_weights(
+        notes, groups, min_pitch, max_pitch, distribution
+    )
+
+    # Sample a (note, pitch) pair from each excerpt
+    note_totals = np.sum(weights, axis=1)
+    excerpt_totals = np.bincount(excerpt_ids, weights=note_totals, minlength=len(batch))
+    failed = excerpt_totals == 0
+    cumulative = np.cumsum(note_totals)
+    targets = np.append(0, cumulative)[batch.offsets[:-1]][~failed]
+    targets += rng.random(len(targets)) * excerpt_totals[~failed]
+    note_index = np.minimum(
+        np.searchsorted(cumulative, targets, "right"), batch.offsets[1:][~failed] - 1
+    )
+    targets -= cumulative[note_index] - note_totals[note_index]
+    pitch_index = np.argmax(
+        np.cumsum(weights[note_index], axis=1) > targets[:, None], axis=1
+    )
+
+    degraded = notes.copy()
+    degraded.pitch[note_index] = first_pitch[note_index] + pitch_index
+    return NoteArrayBatch(degraded, batch.offsets).sort(), failed
+
+
+@set_random_seed
+def time_shift_batch(
+    batch,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    align_onset=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Shift the onset and offset times of one note from each excerpt of the
+    given batch. See time_shift for details of the parameters.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    excerpt_ids = batch.excerpt_ids
+    notes, starts, ends = time_shift_ranges(
+        batch_plan(batch), max(min_shift, 1), max_shift
+    )
+    range_excerpts = excerpt_ids[notes]
+
+    # Sample a (note, onset) pair from each excerpt
+    if align_onset:
+        range_index, onsets = sample_batch_values_in_ranges(
+            batch.notes.onset,
+            excerpt_ids,
+            starts,
+            ends,
+            range_excerpts,
+            len(batch),
+            rng,
+        )
+    else:
+        range_index, onsets = sample_batch_gaps(
+            range_excerpts, starts, ends, len(batch), rng=rng
+        )
+    failed = range_index < 0
+    note_index = notes[range_index[~failed]]
+
+    degraded = batch.notes.copy()
+    degraded.onset[note_index] = onsets[~failed]
+    return NoteArrayBatch(degraded, batch.offsets).sort(), failed
+
+
+@set_random_seed
+def onset_shift_batch(
+    batch,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_onset=False,
+    align_dur=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Shift the onset time of one note from each excerpt of the given batch.
+    See onset_shift for details of the parameters.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    excerpt_ids = batch.excerpt_ids
+    offset = batch.notes.offset
+    notes, starts, ends = onset_shift_ranges(
+        batch_plan(batch), max(min_shift, 1), max_shift, min_duration, max_duration
+    )
+    range_excerpts = excerpt_ids[notes]
+
+    # Sample a (note, onset) pair from each excerpt
+    if align_onset and align_dur:
+        # Here, align both onset and dur
+        keys, to_keys, from_keys = batch_value_keys(batch.notes.onset, excerpt_ids)
+        ranges, pair_keys = values_in_ranges(
+            keys, to_keys(starts, range_excerpts), to_keys(ends, range_excerpts)
+        )
+        pair_excerpts = range_excerpts[ranges]
+        pair_onsets = from_keys(pair_keys, pair_excerpts)
+        dur_keys, to_dur_keys, _ = batch_value_keys(batch.notes.dur, excerpt_ids)
+        valid = np.isin(
+            to_dur_keys(offset[notes[ranges]] - pair_onsets, pair_excerpts), dur_keys
+        )
+        pair_index, _ = sample_batch_ranges(
+            pair_excerpts[valid], np.ones(np.sum(valid), dtype=int), len(batch), rng
+        )
+        range_index = np.full(len(batch), -1)
+        onsets = np.zeros(len(batch), dtype=np.int64)
+        sampled = pair_index >= 0
+        range_index[sampled] = ranges[valid][pair_index[sampled]]
+        onsets[sampled] = pair_onsets[valid][pair_index[sampled]]
+    elif align_onset:
+        range_index, onsets = sample_batch_values_in_ranges(
+            batch.notes.onset,
+            excerpt_ids,
+            starts,
+            ends,
+            range_excerpts,
+            len(batch),
+            rng,
+        )
+    elif align_dur:
+        # onset = offset - dur lies in [start, end) exactly when
+        # dur lies in [offset - end + 1, offset - start + 1)
+        range_index, durs = sample_batch_values_in_ranges(
+            batch.notes.dur,
+            excerpt_ids,
+            offset[notes] - ends + 1,
+            offset[notes] - starts + 1,
+            range_excerpts,
+            len(batch),
+            rng,
+        )
+        sampled = range_index >= 0
+        onsets = np.zeros(len(batch), dtype=np.int64)
+        onsets[sampled] = offset[notes[range_index[sampled]]] - durs[sampled]
+    else:
+        range_index, onsets = sample_batch_gaps(
+            range_excerpts, starts, ends, len(batch), rng=rng
+        )
+    failed = range_index < 0
+    note_index = notes[range_index[~failed]]
+
+    degraded = batch.notes.copy()
+    degraded.onset[note_index] = onsets[~failed]
+    degraded.dur[note_index] = offset[note_index] - onsets[~failed]
+    return NoteArrayBatch(degraded, batch.offsets).sort(), failed
+
+
+@set_random_seed
+def offset_shift_batch(
+    batch,
+    min_shift=MIN_SHIFT_DEFAULT,
+    max_shift=MAX_SHIFT_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_dur=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Shift the offset time of one note from each excerpt of the given batch.
+    See offset_shift for details of the parameters.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    excerpt_ids = batch.excerpt_ids
+    notes, starts, ends = offset_shift_ranges(
+        batch_plan(batch), max(min_shift, 1), max_shift, min_duration, max_duration
+    )
+    range_excerpts = excerpt_ids[notes]
+
+    # Sample a (note, duration) pair from each excerpt
+    if align_dur:
+        range_index, durs = sample_batch_values_in_ranges(
+            batch.notes.dur, excerpt_ids, starts, ends, range_excerpts, len(batch), rng
+        )
+    else:
+        range_index, durs = sample_batch_gaps(
+            range_excerpts, starts, ends, len(batch), rng=rng
+        )
+    failed = range_index < 0
+    note_index = notes[range_index[~failed]]
+
+    degraded = batch.notes.copy()
+    degraded.dur[note_index] = durs[~failed]
+    return NoteArrayBatch(degraded, batch.offsets).sort(), failed
+
+
+@set_random_seed
+def remove_note_batch(batch, rng=None):
+    """
+    Remove one note from each excerpt of the given batch.
+
+    Parameters
+    ----------
+    batch : NoteArrayBatch
+        The batch of excerpts to degrade.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) for the random numbers used. None draws a seed
+        from numpy's global random state.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    note_index = sample_batch_notes(batch, rng=rng)
+    failed = note_index < 0
+
+    keep = np.ones(len(batch.notes), dtype=bool)
+    keep[note_index[~failed]] = False
+    offsets = batch.offsets - np.append(0, np.cumsum(~failed))
+    return NoteArrayBatch(batch.notes[keep], offsets), failed
+
+
+@set_random_seed
+def add_note_batch(
+    batch,
+    min_pitch=MIN_PITCH_DEFAULT,
+    max_pitch=MAX_PITCH_DEFAULT,
+    min_duration=MIN_DURATION_DEFAULT,
+    max_duration=MAX_DURATION_DEFAULT,
+    align_pitch=False,
+    align_time=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Add one note to each excerpt of the given batch. See add_note for details
+    of the parameters.
+
+    With align_pitch or align_time, the valid positions depend on the
+    pitches or durations of each excerpt, and each excerpt is instead
+    degraded separately by add_note.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    if align_pitch or align_time:
+        degraded = [
+            add_note(
+                excerpt,
+                min_pitch=min_pitch,
+                max_pitch=max_pitch,
+                min_duration=min_duration,
+                max_duration=max_duration,
+                align_pitch=align_pitch,
+                align_time=align_time,
+                seed=rng,
+            )
+            for excerpt in batch
+        ]
+        failed = np.array([res is None for res in degraded], dtype=bool)
+        return (
+            NoteArrayBatch.from_excerpts(
+                [
+                    excerpt if res is None else res
+                    for excerpt, res in zip(batch, degraded)
+                ]
+            ),
+            failed,
+        )
+
+    notes = batch.notes
+    excerpt_ids = batch.excerpt_ids
+    plan = batch_plan(batch)
+    pitch_index = plan.pitch_index
+    pitches = np.arange(min_pitch, max_pitch + 1)
+
+    # Track is one of the existing tracks of the excerpt
+    tracks, first_notes = np.unique(plan.notes.track, return_index=True)
+    track_pitch_excerpts = np.repeat(excerpt_ids[first_notes], len(pitches))
+    track_pitch_tracks = np.repeat(notes.track[first_notes], len(pitches))
+    track_pitch_pitches = np.tile(pitches, len(tracks))
+
+    # Groups are sorted by (track, pitch), so their keys can be searched
+    group_notes = pitch_index.order[pitch_index.group_starts]
+    pitch_base = min(min_pitch, notes.pitch.min(initial=min_pitch))
+    pitch_span = max(max_pitch, notes.pitch.max(initial=max_pitch)) - pitch_base + 1
+    group_keys = (
+        plan.notes.track[group_notes] * pitch_span
+        + plan.notes.pitch[group_notes]
+        - pitch_base
+    )
+    track_pitch_keys = (
+        np.repeat(tracks, len(pitches)) * pitch_span + track_pitch_pitches - pitch_base
+    )
+    position = np.minimum(
+        np.searchsorted(group_keys, track_pitch_keys), max(len(group_keys) - 1, 0)
+    )
+    groups = np.full(len(track_pitch_keys), -1)
+    found = np.flatnonzero(group_keys[position] == track_pitch_keys)
+    groups[found] = position[found]
+
+    # The range of valid onsets of each excerpt
+    end_times = batch_end_times(batch)
+    short = min_duration >= end_times
+    first_onsets = np.full(len(batch), np.iinfo(np.int64).max)
+    np.minimum.at(first_onsets, excerpt_ids, notes.onset)
+    low = np.where(short, 0, first_onsets)
+    high = np.where(short, 1, end_times - min_duration)
+
+    # Gaps between notes of existing (track, pitch) groups
+    gap_groups, starts, ends = pitch_index.insert_gaps(min_duration, -np.inf, np.inf)
+    track_pitch_of_group = np.full(len(pitch_index.group_starts), -1)
+    track_pitch_of_group[groups[groups >= 0]] = np.flatnonzero(groups >= 0)
+    track_pitch_indices = track_pitch_of_group[gap_groups]
+    valid = track_pitch_indices >= 0
+    track_pitch_indices = track_pitch_indices[valid]
+    gap_excerpts = track_pitch_excerpts[track_pitch_indices]
+    starts = np.maximum(starts[valid], low[gap_excerpts])
+    ends = np.minimum(ends[valid], high[gap_excerpts])
+
+    # The whole range for (track, pitch) pairs with no notes
+    empty = np.flatnonzero(groups < 0)
+    track_pitch_indices = np.append(track_pitch_indices, empty)
+    starts = np.append(starts, low[track_pitch_excerpts[empty]])
+    ends = np.append(ends, high[track_pitch_excerpts[empty]])
+
+    # Sample a (track, pitch, onset) triple from each excerpt
+    gap_index, onsets = sample_batch_gaps(
+        track_pitch_excerpts[track_pitch_indices], starts, ends, len(batch), rng=rng
+    )
+    sampled = gap_index >= 0
+    track_pitch = track_pitch_indices[gap_index[sampled]]
+    onsets = onsets[sampled]
+    new_excerpts = np.flatnonzero(sampled)
+
+    # Then a duration, up to the onset of the next note of its group (as in
+    # min_onset_after, searching the running max offsets of every group)
+    group = groups[track_pitch]
+    has_group = group >= 0
+    group = np.maximum(group, 0)
+    max_offset_keys = (
+        pitch_index.max_offset
+        - pitch_index.base
+        + pitch_index.note_group * pitch_index.span
+    )
+    first = np.searchsorted(
+        max_offset_keys,
+        group * pitch_index.span
+        + np.clip(onsets - pitch_index.base, -1, pitch_index.span - 1),
+        "right",
+    )
+    has_after = has_group & (first < pitch_index.group_ends[group])
+    onset_after = np.full(len(onsets), np.inf)
+    onset_after[has_after] = pitch_index.onset[first[has_after]]
+    durations = np.full(len(onsets), min_duration, dtype=np.int64)
+    long = ~short[new_excerpts]
+    durations[long] = rng.integers(
+        min_duration,
+        np.minimum(
+            np.minimum(end_times[new_excerpts] - onsets, max_duration + 1),
+            onset_after - onsets + 1,
+        )[long].astype(np.int64),
+    )
+    added = NoteArray.from_columns(
+        onsets,
+        track_pitch_tracks[track_pitch],
+        track_pitch_pitches[track_pitch],
+        durations,
+    )
+
+    # Empty excerpts have nothing to overlap with
+    empty_excerpts = np.flatnonzero(batch.lengths == 0)
+    if len(pitches) > 0:
+        num_empty = len(empty_excerpts)
+        added = added.append(
+            NoteArray.from_columns(
+                np.zeros(num_empty),
+                np.zeros(num_empty),
+                pitches[rng.integers(len(pitches), size=num_empty)],
+                rng.integers(
+                    min_duration, min(max_duration + 1, sys.maxsize), size=num_empty
+                ),
+            )
+        )
+        new_excerpts = np.append(new_excerpts, empty_excerpts)
+    failed = np.ones(len(batch), dtype=bool)
+    failed[new_excerpts] = False
+
+    # Move new notes into their excerpts, and sort each excerpt
+    degraded = notes.append(added)
+    order = np.lexsort(
+        np.vstack((degraded.data[::-1], np.append(excerpt_ids, new_excerpts)))
+    )
+    offsets = batch.offsets + np.append(0, np.cumsum(~failed))
+    return NoteArrayBatch(degraded[order], offsets), failed
+
+
+@set_random_seed
+def split_note_batch(batch, min_duration=MIN_DURATION_DEFAULT, num_splits=1, rng=None):
+    """
+    Split one note from each excerpt of the given batch into two or more
+    notes of equal duration. See split_note for details of the parameters.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    notes = batch.notes
+    excerpt_ids = batch.excerpt_ids
+    note_index = sample_batch_notes(
+        batch, notes.dur >= min_duration * (num_splits + 1), rng=rng
+    )
+    failed = note_index < 0
+    note_index = note_index[~failed]
+
+    # Add next notes (taking care to round exactly as split_note does)
+    short_duration_float = notes.dur[note_index] / (num_splits + 1)
+    next_onset = notes.onset[note_index] + short_duration_float
+    new_notes = []
+    for _ in range(num_splits):
+        this_onset = next_onset
+        next_onset = next_onset + short_duration_float
+        new_notes.append(
+            NoteArray.from_columns(
+                np.round(this_onset),
+                notes.track[note_index],
+                notes.pitch[note_index],
+                np.round(next_onset) - np.round(this_onset),
+            )
+        )
+
+    degraded = notes.copy()
+    degraded.dur[note_index] = np.round(short_duration_float)
+    for new in new_notes:
+        degraded = degraded.append(new)
+
+    # Move new notes into their excerpts, and sort each excerpt
+    new_ids = np.tile(excerpt_ids[note_index], num_splits)
+    order = np.lexsort(
+        np.vstack((degraded.data[::-1], np.append(excerpt_ids, new_ids)))
+    )
+    offsets = batch.offsets + num_splits * np.append(0, np.cumsum(~failed))
+    return NoteArrayBatch(degraded[order], offsets), failed
+
+
+@set_random_seed
+def join_notes_batch(
+    batch,
+    max_gap=MAX_GAP_DEFAULT,
+    max_notes=20,
+    only_first=False,
+    tries=TRIES_DEFAULT,
+    rng=None,
+):
+    """
+    Combine two or more notes of the same pitch and track into one, in each
+    excerpt of the given batch. See join_notes for details of the parameters.
+
+    Returns
+    -------
+    degraded : NoteArrayBatch
+        The degraded batch. Excerpts which could not be degraded are left
+        unchanged.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
+    """
+    batch = batch.sort()
+    notes = batch.notes
+    excerpt_ids = batch.excerpt_ids
+
+    # Renumbered tracks keep chains within a single excerpt
+    order, chain_starts, chain_lengths = joinable_chains(
+        batch_plan(batch).notes, max_gap, max_notes, only_first=only_first
+    )
+    chain_index, _ = sample_batch_ranges(
+        excerpt_ids[order[chain_starts]],
+        np.ones(len(chain_starts), dtype=np.int64),
+        len(batch),
+        rng,
+    )
+    failed = chain_index < 0
+    starts = chain_starts[chain_index[~failed]]
+    lengths = chain_lengths[chain_index[~failed]]
+
+    # Extend first notes and drop all following notes
+    num_nexts = lengths - 1
+    nexts = order[
+        np.repeat(starts + 1, num_nexts)
+        + np.arange(num_nexts.sum())
+        - np.repeat(np.cumsum(num_nexts) - num_nexts, num_nexts)
+    ]
+    first = order[starts]
+    degraded = notes.copy()
+    degraded.dur[first] = notes.offset[order[starts + num_nexts]] - notes.onset[first]
+    keep = np.ones(len(notes), dtype=bool)
+    keep[nexts] = False
+
+    removed = np.zeros(len(batch), dtype=np.int64)
+    removed[~failed] = num_nexts
+    offsets = batch.offsets - np.append(0, np.cumsum(removed))
+    return NoteArrayBatch(degraded[keep], offsets).sort(), failed
+
+
+BATCH_DEGRADATIONS = {
+    "pitch_shift": pitch_shift_batch,
+    "time_shift": time_shift_batch,
+    "onset_shift": onset_shift_batch,
+    "offset_shift": offset_shift_batch,
+    "remove_note": remove_note_batch,
+    "add_note": add_note_batch,
+    "split_note": split_note_batch,
+    "join_notes": join_notes_batch,
+}
+
+
+def degrade_batch(excerpts, deg_names, seeds=None, deg_kwargs=None):
     """
-    A convenience function to get degradation functions from strings.
+    Degrade a batch of excerpts at once.
+
+    The excerpts are stored in a single NoteArrayBatch, and each excerpt
+    to be degraded by a degradation in BATCH_DEGRADATIONS (which contains
+    every degradation in DEGRADATIONS) is degraded by one vectorized call for
+    that degradation. The exceptions are add_note with align_pitch or
+    align_time, and degradations with per-excerpt seeds, which are run on each
+    excerpt separately (as NoteArrays).
 
     Parameters
     ----------
-    degradation_list : list of strings
-        list containing the names of the degradation functions to get
+    excerpts : list(pd.DataFrame or NoteArray) or NoteArrayBatch
+        The excerpts to degrade.
+
+    deg_names : string or list(string)
+        The name of the degradation to perform on every excerpt, or a list
+        containing the name of the degradation to perform on each excerpt.
+
+    seeds : int, np.random.Generator, or list
+        If an int or Generator, a seed for the random numbers used for the
+        whole batch. If a list, a seed (or Generator) for each excerpt. In
+        that case, each excerpt is degraded separately, exactly as the
+        corresponding function in DEGRADATIONS would with the given seed.
+        None draws a seed from numpy's global random state.
+
+    deg_kwargs : dict(string -> dict)
+        Keyword arguments to pass to each degradation, keyed by degradation
+        name.
 
     Returns
     -------
-    degradations : dict(string -> func)
-        A dict containing the name of each degradation mapped to a pointer to
-        the method which performs that degradation.
+    degraded : list(pd.DataFrame or NoteArray)
+        The degraded version of each excerpt, of the same type as the given
+        excerpts (NoteArray for a NoteArrayBatch), or None where the
+        degradation failed.
+
+    failed : np.ndarray
+        A boolean array, True for each excerpt which could not be degraded.
     """
-    deg_funcs = [DEGRADATIONS[deg_str] for deg_str in degradation_list]
-    return deg_funcs
+    if isinstance(excerpts, NoteArrayBatch):
+        batch = excerpts
+        as_df = False
+    else:
+        excerpts = list(excerpts)
+        batch = NoteArrayBatch.from_excerpts(excerpts)
+        as_df = len(excerpts) > 0 and not isinstance(excerpts[0], NoteArray)
+
+    if isinstance(deg_names, str):
+        deg_names = [deg_names] * len(batch)
+    assert len(deg_names) == len(
+        batch
+    ), "deg_names must be a single name or one name per excerpt."
+    deg_names = np.array(deg_names)
+    if deg_kwargs is None:
+        deg_kwargs = {}
+
+    per_excerpt_seeds = isinstance(seeds, (list, tuple, np.ndarray))
+    if per_excerpt_seeds:
+        assert len(seeds) == len(batch), "seeds must be an int or one per excerpt."
+    else:
+        rng = get_random_generator(seeds)
+
+    degraded = [None] * len(batch)
+    failed = np.zeros(len(batch), dtype=bool)
+    for name in pd.unique(deg_names):
+        kwargs = deg_kwargs.get(name, {})
+        indices = np.flatnonzero(deg_names == name)
+
+        if name in BATCH_DEGRADATIONS and not per_excerpt_seeds:
+            if len(indices) == len(batch):
+                sub_batch = batch
+            else:
+                sub_batch = NoteArrayBatch.from_excerpts([batch[i] for i in indices])
+            sub_degraded, sub_failed = BATCH_DEGRADATIONS[name](
+                sub_batch, seed=rng, **kwargs
+            )
+            for sub_index, index in enumerate(indices):
+                if not sub_failed[sub_index]:
+                    degraded[index] = sub_degraded[sub_index]
+            failed[indices] = sub_failed
+            continue
+
+        deg_fun = DEGRADATIONS[name]
+        for index in indices:
+            seed = seeds[index] if per_excerpt_seeds else rng
+            degraded[index] = deg_fun(batch[index], seed=seed, **kwargs)
+            failed[index] = degraded[index] is None
+
+    if as_df:
+        degraded = [None if res is None else res.to_df() for res in degraded]
+    return degraded, failed
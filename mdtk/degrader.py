@@ -1,11 +1,116 @@
 """A degrader object can be used to easily degrade data points on the fly
 according to some given parameters."""
+import copy
+import itertools
 import json
 import logging
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import numpy as np
 
 import mdtk.degradations as degs
+from mdtk.df_utils import get_random_excerpt
+from mdtk.formatters import FORMATTERS
+from mdtk.note_array import NoteArray
+from mdtk.stats import DegradationStats
+
+# How often (in seconds) blocked stream stages check whether to stop
+STREAM_POLL_INTERVAL = 0.1
+
+
+# The number of active suppress_warnings contexts, and the logging level to
+# restore when the last one exits
+SUPPRESS_LOCK = threading.Lock()
+SUPPRESS_STATE = {"depth": 0, "level": logging.NOTSET}
+
+
+class suppress_warnings:
+    """A context manager which disables logging of warnings (and below) while
+    it is active. It may be nested and used from multiple threads at once:
+    logging is only restored (to its level before the first context was
+    entered) once every active context has exited. Entering a nested context
+    is cheap, so callers degrading many excerpts can wrap the whole loop."""
+
+    def __enter__(self):
+        with SUPPRESS_LOCK:
+            if SUPPRESS_STATE["depth"] == 0:
+                SUPPRESS_STATE["level"] = logging.root.manager.disable
+                logging.disable(max(logging.WARNING, SUPPRESS_STATE["level"]))
+            SUPPRESS_STATE["depth"] += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with SUPPRESS_LOCK:
+            SUPPRESS_STATE["depth"] -= 1
+            if SUPPRESS_STATE["depth"] == 0:
+                logging.disable(SUPPRESS_STATE["level"])
+        return False
+
+
+class AliasSampler:
+    """An AliasSampler draws indices from a fixed discrete distribution in
+    constant time (and with a single random number), using Vose's alias
+    method."""
+
+    def __init__(self, weights):
+        """
+        Build the alias table for the given weights.
+
+        Parameters
+        ----------
+        weights : list(float)
+            The (unnormalized) weight of each index. Indices with weight 0
+            are never sampled.
+        """
+        weights = np.asarray(weights, dtype=float)
+        assert len(weights) > 0, "weights must not be empty."
+        assert np.all(weights >= 0), "weights must not be negative."
+        assert np.sum(weights) > 0, "Some weight must be positive."
+
+        num = len(weights)
+        scaled = list(weights * num / np.sum(weights))
+        prob = [1.0] * num
+        alias = list(range(num))
+        small = [index for index in range(num) if scaled[index] < 1]
+        large = [index for index in range(num) if scaled[index] >= 1]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+        # Entries left over due to rounding error keep prob 1, unless their
+        # weight is 0, in which case they always go to the heaviest index
+        for index in small:
+            if weights[index] == 0:
+                prob[index] = 0.0
+                alias[index] = int(np.argmax(weights))
+
+        self.prob = prob
+        self.alias = alias
+
+    def sample(self, rng):
+        """
+        Draw an index.
+
+        Parameters
+        ----------
+        rng : np.random.Generator
+            The Generator to draw a random number from.
+
+        Returns
+        -------
+        index : int
+            An index drawn with probability proportional to its weight.
+        """
+        value = rng.random() * len(self.prob)
+        index = int(value)
+        return index if value - index < self.prob[index] else self.alias[index]
 
 
 class Degrader:
@@ -19,14 +124,17 @@ class Degrader:
         degradation_dist=np.ones(len(degs.DEGRADATIONS)),
         clean_prop=1 / (len(degs.DEGRADATIONS) + 1),
         config=None,
+        stats=None,
     ):
         """
         Create a new degrader with the given parameters.
 
         Parameters
         ----------
-        seed : int
-            A random seed for numpy.
+        seed : int, np.random.Generator, or None
+            A random seed (or Generator) for this degrader's random numbers,
+            which are drawn from its own Generator rather than numpy's global
+            random state. None draws a seed from numpy's global random state.
 
         degradations : list(string)
             A list of the names of the degradations to use (and in what order
@@ -43,10 +151,11 @@ class Degrader:
             The path of a json config file (created by measure_errors.py).
             If given, degradations, degradation_dist, and clean_prop will
             all be overwritten by the values in the json file.
-        """
-        if seed is not None:
-            np.random.seed(seed)
 
+        stats : stats.DegradationStats
+            If given, a collector in which to record every degradation
+            attempt, and the outcome of every degrade call.
+        """
         # Load config
         if config is not None:
             with open(config, "r") as file:
@@ -75,6 +184,9 @@ class Degrader:
         self.degradation_dist = np.array(degradation_dist)
         self.clean_prop = clean_prop
         self.failed = np.zeros(len(degradations))
+        self.rng = degs.get_random_generator(seed)
+        self.samplers = {}
+        self.stats = stats
 
     def degrade(self, note_df):
         """
@@ -82,8 +194,9 @@ class Degrader:
 
         Parameters
         ----------
-        note_df : pd.DataFrame
-            A note_df to degrade.
+        note_df : pd.DataFrame or degradations.DegradationPlan
+            A note_df to degrade, or a DegradationPlan of one (to reuse its
+            cached tables across calls).
 
         Returns
         -------
@@ -96,58 +209,613 @@ class Degrader:
             and larger numbers mean the degradation
             "self.degradations[deg_label-1]" was performed.
         """
-        if self.clean_prop > 0 and np.random.rand() <= self.clean_prop:
-            return note_df.copy(), 0
-
-        degraded_df = None
-        this_deg_dist = self.degradation_dist.copy()
-        this_failed = self.failed.copy()
-
-        # First, sample from failed degradations
-        while np.any(this_failed > 0):
-            # Select a degradation proportional to how many have failed
-            deg_index = np.random.choice(
-                len(self.degradations), p=this_failed / np.sum(this_failed)
-            )
-            deg_fun = degs.DEGRADATIONS[self.degradations[deg_index]]
-
-            # Try to degrade
-            logging.disable(logging.WARNING)
-            degraded_df = deg_fun(note_df)
-            logging.disable(logging.NOTSET)
-
-            # Check for success!
-            if degraded_df is not None:
-                self.failed[deg_index] -= 1
-                return degraded_df, deg_index + 1
-
-            # Degradation failed -- 0 out this deg and continue
-            this_failed[deg_index] = 0
-
-        # No degradations have remaining failures. Draw from standard dist
-        while np.any(this_deg_dist > 0):
-            # Select a degradation proportional to the distribution
-            deg_index = np.random.choice(
-                len(self.degradations), p=this_deg_dist / np.sum(this_deg_dist)
-            )
-            # This deg would have already failed in the above loop.
-            # But we want to sample it and count it as another failure.
-            if self.failed[deg_index] > 0:
-                self.failed[deg_index] += 1
-                continue
-            deg_fun = degs.DEGRADATIONS[self.degradations[deg_index]]
-
-            # Try to degrade
-            logging.disable(logging.WARNING)
-            degraded_df = deg_fun(note_df)
-            logging.disable(logging.NOTSET)
-
-            # Check for success!
-            if degraded_df is not None:
-                return degraded_df, deg_index + 1
-
-            # Degradation failed -- add 1 to failure and continue
-            self.failed[deg_index] += 1
+        if isinstance(note_df, degs.DegradationPlan):
+            plan = note_df
+            clean = plan.to_excerpt
+        else:
+            # Share tables between the degradations attempted on this call
+            plan = degs.DegradationPlan(note_df, copy=False)
+            clean = note_df.copy
+
+        if self.clean_prop > 0 and self.rng.random() <= self.clean_prop:
+            if self.stats is not None:
+                self.stats.record_degrade(None, 0)
+            return clean(), 0
+
+        degraded_df, deg_label = self.apply_degradation(plan)
+        if degraded_df is None:
+            return clean(), 0
+        return degraded_df, deg_label
+
+    def apply_degradation(self, plan):
+        """
+        Perform one degradation on the excerpt of the given plan, chosen
+        according to self.degradation_dist and self.failed (which is updated).
+        A chosen degradation which is certain to fail on the excerpt (see
+        degradations.FEASIBILITY_CHECKS) is counted as failed without being
+        attempted.
+
+        Parameters
+        ----------
+        plan : degradations.DegradationPlan
+            A plan of the excerpt to degrade.
+
+        Returns
+        -------
+        degraded : pd.DataFrame or NoteArray
+            The degraded excerpt (see degradations.DegradationPlan.degrade), or
+            None if every degradation failed.
+
+        deg_label : int
+            The label of the degradation that was performed (as in degrade),
+            or 0 if every degradation failed.
+        """
+        retry_depth = 0
+        feasible = {}
+        with suppress_warnings():
+            # First, sample from failed degradations
+            if self.failed.any() and self.failed.max() > 0:
+                # Select a degradation proportional to how many have failed,
+                # skipping those which have failed on this plan
+                sampler = self.get_sampler("failed", np.maximum(self.failed, 0))
+                tried = set()
+                while True:
+                    deg_index = sampler.sample(self.rng)
+                    if deg_index in tried:
+                        continue
+
+                    degraded_df = self.try_degradation(plan, deg_index, feasible)
+                    if degraded_df is not None:
+                        self.failed[deg_index] -= 1
+                        self.record_degrade(deg_index, retry_depth)
+                        return degraded_df, deg_index + 1
+
+                    # Degradation failed -- skip this deg and continue
+                    tried.add(deg_index)
+                    retry_depth += 1
+                    if all(
+                        self.failed[index] <= 0 or index in tried
+                        for index in range(len(self.degradations))
+                    ):
+                        break
+
+            # No degradations have remaining failures. Draw from standard dist
+            sampler = self.get_sampler("dist", self.degradation_dist)
+            tried = set()
+            while True:
+                deg_index = sampler.sample(self.rng)
+                if deg_index in tried:
+                    continue
+
+                if self.failed[deg_index] > 0:
+                    # This deg would have already failed in the above loop.
+                    # But we want to sample it and count it as another failure.
+                    self.failed[deg_index] += 1
+                else:
+                    degraded_df = self.try_degradation(plan, deg_index, feasible)
+                    if degraded_df is not None:
+                        self.record_degrade(deg_index, retry_depth)
+                        return degraded_df, deg_index + 1
+
+                    # Degradation failed -- add 1 to failure and continue
+                    self.failed[deg_index] += 1
+                    tried.add(deg_index)
+                    retry_depth += 1
+
+                # Stop once every degradation (with dist > 0) has failed
+                if all(
+                    self.degradation_dist[index] <= 0
+                    or self.failed[index] > 0
+                    or index in tried
+                    for index in range(len(self.degradations))
+                ):
+                    break
 
         # Here, all degradations (with dist > 0) failed
-        return note_df.copy(), 0
+        self.record_degrade(None, retry_depth)
+        return None, 0
+
+    def try_degradation(self, plan, deg_index, feasible=None):
+        """
+        Try to perform the given degradation on the excerpt of the given plan.
+
+        Parameters
+        ----------
+        plan : degradations.DegradationPlan
+            A plan of the excerpt to degrade.
+
+        deg_index : int
+            The index of the degradation to perform in self.degradations.
+
+        feasible : dict(int -> boolean)
+            If given, the degradation is first checked with
+            degradations.FEASIBILITY_CHECKS (the result being cached in this
+            dict), and is not attempted (nor recorded in self.stats) if it is
+            certain to fail.
+
+        Returns
+        -------
+        degraded : pd.DataFrame or NoteArray
+            The degraded excerpt, or None if the degradation failed.
+        """
+        name = self.degradations[deg_index]
+        if feasible is not None:
+            if deg_index not in feasible:
+                feasible[deg_index] = degs.FEASIBILITY_CHECKS[name](plan)
+            if not feasible[deg_index]:
+                return None
+
+        deg_fun = degs.DEGRADATIONS[name]
+        if self.stats is None:
+            return deg_fun(plan, seed=self.rng)
+        return deg_fun(plan, seed=self.rng, stats=self.stats)
+
+    def record_degrade(self, deg_index, retry_depth):
+        """
+        Record the outcome of a degradation in self.stats, if it is not None.
+
+        Parameters
+        ----------
+        deg_index : int
+            The index of the degradation that was performed in
+            self.degradations, or None if every degradation failed.
+
+        retry_depth : int
+            The number of failed attempts before the degradation was performed
+            (or before giving up).
+        """
+        if self.stats is not None:
+            name = None if deg_index is None else self.degradations[deg_index]
+            self.stats.record_degrade(name, retry_depth)
+
+    def get_sampler(self, name, weights):
+        """
+        Get an AliasSampler for the given weights, which is cached (by name)
+        and rebuilt only when the weights change.
+
+        Parameters
+        ----------
+        name : string
+            The name under which to cache the sampler.
+
+        weights : np.ndarray
+            The weights to sample from.
+
+        Returns
+        -------
+        sampler : AliasSampler
+            A sampler for the given weights.
+        """
+        key = weights.tobytes()
+        cached = self.samplers.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, AliasSampler(weights))
+            self.samplers[name] = cached
+        return cached[1]
+
+    def degrade_n(self, note_df, num_edits):
+        """
+        Apply a number of degradations to the given note_df in a single pass
+        (see degradations.compose). Each degradation is chosen as in degrade,
+        and is applied to the (unsorted) result of the previous one. The
+        result is sorted once at the end. clean_prop is not used.
+
+        As in compose, each edit builds a new DegradationPlan of the current
+        notes, so its tables (such as the PitchIntervalIndex) are rebuilt
+        from scratch rather than updated incrementally with the notes that
+        the previous edit inserted and removed.
+
+        Parameters
+        ----------
+        note_df : pd.DataFrame or NoteArray
+            A note_df (or NoteArray) to degrade.
+
+        num_edits : int
+            The number of degradations to apply.
+
+        Returns
+        -------
+        degraded_df : pd.DataFrame or NoteArray
+            A degraded version of the given note_df, of the same type.
+
+        deg_labels : list(int)
+            The label of each degradation that was performed, in order (as
+            in degrade). A label of 0 means that every degradation failed for
+            that edit, which left the excerpt unchanged.
+        """
+        notes = NoteArray.from_df(note_df)
+        deg_labels = []
+        for _ in range(num_edits):
+            plan = degs.DegradationPlan(notes, copy=False, sort_output=False)
+            degraded, deg_label = self.apply_degradation(plan)
+            if degraded is not None:
+                notes = degraded
+            deg_labels.append(deg_label)
+
+        notes = notes.sort()
+        if isinstance(note_df, NoteArray):
+            return notes, deg_labels
+        return notes.to_df(), deg_labels
+
+    def stream(
+        self, excerpt_iter, batch_size, prefetch=2, excerpt_kwargs=None, formatter=None
+    ):
+        """
+        Degrade a stream of excerpts in background threads, yielding batches.
+
+        Excerpt sampling runs in one thread, and degradation and formatting in
+        another, connected by bounded queues, so that up to prefetch batches
+        are prepared while the caller is busy (for example, with model
+        compute). Excerpts are degraded in order by this Degrader, so the
+        results are the same as calling degrade on each excerpt in turn.
+
+        Parameters
+        ----------
+        excerpt_iter : iterable(pd.DataFrame)
+            The note_dfs to degrade (or to sample excerpts from, if
+            excerpt_kwargs is given). It is read lazily in a background
+            thread.
+
+        batch_size : int
+            The number of excerpts in each batch. The last batch may be
+            smaller.
+
+        prefetch : int
+            The number of batches to prepare ahead of the caller.
+
+        excerpt_kwargs : dict
+            If given, a random excerpt is taken from each note_df with
+            df_utils.get_random_excerpt, called with these keyword arguments.
+            Note_dfs with no valid excerpt are skipped.
+
+        formatter : string
+            If given, the name of a formatter from formatters.FORMATTERS with
+            which to convert each degraded and clean excerpt into a string.
+
+        Yields
+        ------
+        batch : list(tuple)
+            A (degraded, clean, deg_label) triple for each excerpt of the
+            batch, where degraded and clean are note_dfs (or strings, if
+            formatter is given), and deg_label is as in degrade.
+        """
+        assert batch_size > 0, "batch_size must be positive."
+        assert prefetch > 0, "prefetch must be positive."
+        assert (
+            formatter is None or formatter in FORMATTERS
+        ), f"formatter must be one of {list(FORMATTERS.keys())}."
+
+        def sample(note_df):
+            if excerpt_kwargs is None:
+                return note_df
+            return get_random_excerpt(note_df, **excerpt_kwargs)
+
+        def degrade_batch(excerpts):
+            batch = []
+            for excerpt in excerpts:
+                with suppress_warnings():
+                    degraded, deg_label = self.degrade(excerpt)
+                if formatter is not None:
+                    df_to_str = FORMATTERS[formatter]["df_to_str"]
+                    degraded, excerpt = df_to_str(degraded), df_to_str(excerpt)
+                batch.append((degraded, excerpt, deg_label))
+            return batch
+
+        stop = threading.Event()
+        excerpt_queue = queue.Queue(prefetch * batch_size)
+        batch_queue = queue.Queue(prefetch)
+        excerpt_batches = iterate_batches(
+            iterate_queue(excerpt_queue, stop), batch_size
+        )
+        threads = [
+            threading.Thread(
+                target=run_stage,
+                args=(sample, excerpt_iter, excerpt_queue, stop),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=run_stage,
+                args=(degrade_batch, excerpt_batches, batch_queue, stop),
+                daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            yield from iterate_queue(batch_queue, stop)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+
+def iterate_batches(items, batch_size):
+    """
+    Group the items of an iterable into lists of the given size.
+
+    Parameters
+    ----------
+    items : iterable
+        The items to group.
+
+    batch_size : int
+        The number of items in each list. The last list may be shorter.
+
+    Yields
+    ------
+    batch : list
+        The next batch_size items.
+    """
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def put_until_stopped(item_queue, item, stop):
+    """
+    Put an item into a bounded queue, waiting until there is space or until
+    the given event is set.
+
+    Parameters
+    ----------
+    item_queue : queue.Queue
+        The queue to put the item into.
+
+    item : object
+        The item to put.
+
+    stop : threading.Event
+        An event which is set when the stream is closed.
+
+    Returns
+    -------
+    put : boolean
+        True if the item was put into the queue. False if stop was set first.
+    """
+    while not stop.is_set():
+        try:
+            item_queue.put(item, timeout=STREAM_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def iterate_queue(item_queue, stop):
+    """
+    Iterate over the items that a stage (see run_stage) puts into a queue.
+
+    Parameters
+    ----------
+    item_queue : queue.Queue
+        The queue to read from.
+
+    stop : threading.Event
+        An event which is set when the stream is closed. Iteration stops
+        once it is set.
+
+    Yields
+    ------
+    item : object
+        Each item put into the queue, in order.
+
+    Raises
+    ------
+    Exception
+        Any exception raised by the stage which fills the queue.
+    """
+    while not stop.is_set():
+        try:
+            kind, item = item_queue.get(timeout=STREAM_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+        if kind == "end":
+            return
+        if kind == "error":
+            raise item
+        yield item
+
+
+def run_stage(func, items, out_queue, stop):
+    """
+    Run one stage of a stream: apply a function to each item of an iterable,
+    and put each result which is not None into a queue (for iterate_queue).
+
+    Parameters
+    ----------
+    func : function
+        The function to apply to each item.
+
+    items : iterable
+        The input items.
+
+    out_queue : queue.Queue
+        The queue to put the results into. After the last result, an end
+        marker (or any exception raised) is put into the queue.
+
+    stop : threading.Event
+        An event which is set when the stream is closed. The stage stops
+        once it is set.
+    """
+    try:
+        for item in items:
+            result = func(item)
+            if result is not None and not put_until_stopped(
+                out_queue, ("item", result), stop
+            ):
+                return
+    except Exception as error:
+        put_until_stopped(out_queue, ("error", error), stop)
+        return
+    put_until_stopped(out_queue, ("end", None), stop)
+
+
+def degrade_chunk(degrader, excerpts, seed, failed):
+    """
+    Degrade a chunk of excerpts with a copy of the given Degrader. This is
+    run by the workers of a ParallelDegrader.
+
+    Parameters
+    ----------
+    degrader : Degrader
+        The Degrader to copy. It is not modified.
+
+    excerpts : list(pd.DataFrame)
+        The note_dfs to degrade.
+
+    seed : np.random.SeedSequence
+        The seed of this chunk's random stream.
+
+    failed : np.ndarray
+        The failed counts to start the copied Degrader with.
+
+    Returns
+    -------
+    results : list(tuple(pd.DataFrame, int))
+        The (degraded_df, deg_label) pair returned by Degrader.degrade for
+        each excerpt, in order.
+
+    failed : np.ndarray
+        The failed counts of the copied Degrader after degrading the chunk.
+
+    stats : stats.DegradationStats
+        The statistics collected while degrading the chunk, or None if the
+        given Degrader does not collect statistics.
+    """
+    degrader = copy.copy(degrader)
+    degrader.rng = degs.get_random_generator(seed)
+    degrader.failed = failed.copy()
+    if degrader.stats is not None:
+        degrader.stats = DegradationStats()
+    with suppress_warnings():
+        results = [degrader.degrade(excerpt) for excerpt in excerpts]
+    return results, degrader.failed, degrader.stats
+
+
+class ParallelDegrader(Degrader):
+    """A ParallelDegrader degrades a stream of musical excerpts with a pool
+    of worker processes (or threads), returning results in input order.
+
+    The excerpts are split into chunks, each of which is degraded by a copy
+    of this Degrader with its own random stream (spawned from this degrader's
+    Generator) and its own shard of the failed counts. The shards are merged
+    back into self.failed after every round of chunks_per_merge chunks. The
+    output therefore depends only on the seed, chunk_size, and
+    chunks_per_merge, and not on num_workers or on scheduling."""
+
+    def __init__(
+        self,
+        num_workers=None,
+        chunk_size=16,
+        chunks_per_merge=8,
+        use_threads=False,
+        **kwargs,
+    ):
+        """
+        Create a new parallel degrader with the given parameters.
+
+        Parameters
+        ----------
+        num_workers : int
+            The number of worker processes (or threads) to use. None uses
+            the executor's default (based on the number of cpus).
+
+        chunk_size : int
+            The number of excerpts degraded by each task.
+
+        chunks_per_merge : int
+            The number of chunks degraded between merges of the workers'
+            failed counts.
+
+        use_threads : boolean
+            True to degrade with a pool of threads rather than processes.
+
+        kwargs
+            Keyword arguments for Degrader (seed, degradations,
+            degradation_dist, clean_prop, config).
+        """
+        super().__init__(**kwargs)
+
+        assert chunk_size > 0, "chunk_size must be positive."
+        assert chunks_per_merge > 0, "chunks_per_merge must be positive."
+
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.chunks_per_merge = chunks_per_merge
+        self.use_threads = use_threads
+
+    def imap(self, excerpts):
+        """
+        Degrade every excerpt of the given iterable in parallel.
+
+        Parameters
+        ----------
+        excerpts : iterable(pd.DataFrame)
+            The note_dfs to degrade. They are read lazily, one round of
+            chunks at a time.
+
+        Yields
+        ------
+        degraded_df : pd.DataFrame
+            A degraded version of each note_df, as in Degrader.degrade, in
+            the order of the given excerpts.
+
+        deg_label : int
+            The label of the degradation that was performed, as in
+            Degrader.degrade.
+        """
+        excerpts = iter(excerpts)
+        seed_seq = np.random.SeedSequence(
+            self.rng.integers(np.iinfo(np.int64).max, dtype=np.int64)
+        )
+        executor_class = ThreadPoolExecutor if self.use_threads else ProcessPoolExecutor
+
+        with executor_class(self.num_workers) as executor:
+            while True:
+                chunks = [
+                    list(itertools.islice(excerpts, self.chunk_size))
+                    for _ in range(self.chunks_per_merge)
+                ]
+                chunks = [chunk for chunk in chunks if chunk]
+                if not chunks:
+                    return
+
+                # Each chunk starts from a snapshot of the merged failed counts
+                start_failed = self.failed.copy()
+                futures = [
+                    executor.submit(degrade_chunk, self, chunk, seed, start_failed)
+                    for chunk, seed in zip(chunks, seed_seq.spawn(len(chunks)))
+                ]
+
+                # Merge each shard's change in failed counts
+                for future in futures:
+                    results, failed, stats = future.result()
+                    self.failed += failed - start_failed
+                    if self.stats is not None:
+                        self.stats.merge(stats)
+                    yield from results
+                self.failed = np.maximum(self.failed, 0)
+
+    def degrade_all(self, excerpts):
+        """
+        Degrade every excerpt of the given iterable in parallel.
+
+        Parameters
+        ----------
+        excerpts : iterable(pd.DataFrame)
+            The note_dfs to degrade.
+
+        Returns
+        -------
+        degraded_dfs : list(pd.DataFrame)
+            A degraded version of each note_df, in order.
+
+        deg_labels : list(int)
+            The label of the degradation performed on each note_df, in order.
+        """
+        results = list(self.imap(excerpts))
+        return [result[0] for result in results], [result[1] for result in results]
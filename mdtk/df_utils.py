@@ -1,9 +1,47 @@
 """Utility functions and fields for dealing with note_dfs in mdtk format."""
+from bisect import bisect_right
+
 import numpy as np
 import pandas as pd
 
+from mdtk.accel import pitch_overlap_offsets
+
 NOTE_DF_SORT_ORDER = ["onset", "track", "pitch", "dur"]
 
+# The key in df.attrs under which clean_df marks a note_df as canonical
+CANONICAL_ATTR = "mdtk_canonical"
+
+# How the windows drawn by ExcerptSampler.sample_windows may overlap: "allow"
+# draws each window independently, "distinct" draws different windows (which
+# may share notes), and "disjoint" draws windows which share no notes.
+EXCERPT_OVERLAP_POLICIES = ["allow", "distinct", "disjoint"]
+
+
+def get_random_generator(seed=None):
+    """
+    Get a numpy random Generator to draw random numbers from.
+
+    Parameters
+    ----------
+    seed : int, np.random.SeedSequence, np.random.BitGenerator, \
+np.random.Generator, or None
+        A seed for a new Generator (for example, an int, or a spawned
+        SeedSequence for independent parallel streams). A Generator is
+        returned as is. None creates a new Generator seeded from numpy's
+        global random state, so that seeding it with np.random.seed() keeps
+        results reproducible.
+
+    Returns
+    -------
+    rng : np.random.Generator
+        The random Generator.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    if seed is None:
+        seed = np.random.randint(np.iinfo(np.int64).max, dtype=np.int64)
+    return np.random.default_rng(seed)
+
 
 def clean_df(df, single_track=False, non_overlapping=False):
     """
@@ -31,19 +69,84 @@ def clean_df(df, single_track=False, non_overlapping=False):
     Returns
     -------
     df : pd.DataFrame
-        A cleaned version of the given df, as described.
+        A cleaned version of the given df, as described. If all of its columns
+        are ints, it is stored as a single int64 array, and marked as
+        canonical (see mark_canonical).
     """
+    columns = [df[column].to_numpy() for column in NOTE_DF_SORT_ORDER]
     if single_track:
-        df = df.assign(track=0)  # Assign creates a copy so input is not changed
+        columns[1] = np.zeros_like(columns[1])
+    columns = clean_note_columns(columns, non_overlapping=non_overlapping)
+
+    if any(values.dtype.kind not in "iu" for values in columns):
+        return pd.DataFrame(dict(zip(NOTE_DF_SORT_ORDER, columns)))
+
+    # A single int64 block, which NoteArray.from_df can use without copying
+    data = np.array(columns, dtype=np.int64)
+    return mark_canonical(pd.DataFrame(data.T, columns=NOTE_DF_SORT_ORDER))
+
+
+def mark_canonical(df):
+    """
+    Mark a note_df as canonical: sorted by NOTE_DF_SORT_ORDER, with exactly
+    those columns, all stored in a single int64 array. The degradations can
+    then use it as is, without checking its order or converting its values.
+
+    The mark records where the df's values are stored, so that any copy or
+    reordering of the df (which pandas may give the same attrs) is not
+    considered canonical. Since the values may still be edited in place,
+    is_canonical also checks the order of the notes before trusting the mark.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A note_df which is canonical, as described above.
 
-    if non_overlapping:
-        df = remove_pitch_overlaps(df)
-    else:
-        # Remove_pitch_overlaps already sorts
-        df = df.sort_values(by=NOTE_DF_SORT_ORDER).reset_index(drop=True)
+    Returns
+    -------
+    df : pd.DataFrame
+        The given df, marked in place.
+    """
+    values = df.to_numpy()
+    df.attrs[CANONICAL_ATTR] = (
+        values.__array_interface__["data"][0],
+        values.shape,
+        values.strides,
+    )
+    return df
 
-    # Return with correct column ordering
-    return df.loc[:, NOTE_DF_SORT_ORDER]
+
+def is_canonical(df):
+    """
+    Check whether a note_df was marked as canonical by mark_canonical (for
+    example, by clean_df), and has not been copied or reordered since. In case
+    it was edited in place, its index and the order of its notes are also
+    checked, which takes linear time (but is much faster than sorting).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The note_df to check.
+
+    Returns
+    -------
+    is_canonical : boolean
+        True if the df is canonical. False otherwise (although it may still
+        be sorted).
+    """
+    mark = df.attrs.get(CANONICAL_ATTR)
+    if mark is None or list(df.columns) != NOTE_DF_SORT_ORDER:
+        return False
+    values = df.to_numpy()
+    location = (values.__array_interface__["data"][0], values.shape, values.strides)
+    return (
+        values.dtype == np.int64
+        and mark == location
+        and isinstance(df.index, pd.RangeIndex)
+        and df.index.start == 0
+        and df.index.step == 1
+        and is_sorted_columns(values.T)
+    )
 
 
 def remove_pitch_overlaps(df):
@@ -69,29 +172,271 @@ def remove_pitch_overlaps(df):
     if len(df) < 2:
         return df
 
-    df = df.sort_values(by=NOTE_DF_SORT_ORDER).reset_index(drop=True)
+    columns = [df[column].to_numpy() for column in NOTE_DF_SORT_ORDER]
+    columns = clean_note_columns(columns, non_overlapping=True)
+    return pd.DataFrame(dict(zip(NOTE_DF_SORT_ORDER, columns)))
+
+
+def clean_note_columns(columns, non_overlapping=False):
+    """
+    Sort the columns of a note_df by NOTE_DF_SORT_ORDER, and optionally remove
+    all same-pitch overlaps (as in remove_pitch_overlaps).
+
+    Parameters
+    ----------
+    columns : list(np.ndarray)
+        The onset, track, pitch, and dur of each note.
+
+    non_overlapping : boolean
+        True to remove overlaps between the notes.
+
+    Returns
+    -------
+    columns : list(np.ndarray)
+        New onset, track, pitch, and dur columns, sorted (and non-overlapping,
+        if requested).
+    """
+    order = sort_order(columns)
+    onset, track, pitch, dur = [values[order] for values in columns]
+    if not non_overlapping or len(onset) < 2:
+        return [onset, track, pitch, dur]
 
     # We'll work with offsets here, and fix dur at the end
-    df["offset"] = df["onset"] + df["dur"]
-    offset = df["offset"].copy()
-
-    for _, pitch_df in df.groupby(["track", "pitch"]):
-        if len(pitch_df) < 2:
-            continue
-
-        # Each note's offset will go to the latest offset so far,
-        # or be cut at the next note's onset
-        cum_max = pitch_df["offset"].cummax()
-        offset.loc[pitch_df.index] = cum_max.clip(
-            upper=pitch_df["onset"].shift(-1, fill_value=cum_max.iloc[-1])
-        )
+    offset = onset + dur
 
-    # Fix dur based on offsets and remove offset column
-    df["dur"] = offset - df["onset"]
-    df = df.loc[df["dur"] != 0, ["onset", "track", "pitch", "dur"]]
-    df = df.reset_index(drop=True)
+    # Number each (track, pitch) pair (the ids need not be contiguous)
+    num_pitches = int(pitch.max()) - int(pitch.min()) + 1
+    groups = (track - track.min()).astype(np.int64) * num_pitches + (
+        pitch - pitch.min()
+    ).astype(np.int64)
+    offset = pitch_overlap_offsets(onset, offset, groups, int(groups.max()) + 1)
 
-    return df
+    # Fix dur based on offsets, and remove notes which are now empty
+    dur = (offset - onset).astype(dur.dtype, copy=False)
+    keep = dur != 0
+    return [values[keep] for values in (onset, track, pitch, dur)]
+
+
+def sort_order(columns):
+    """
+    Get the stable order which sorts the given columns lexicographically (as
+    np.lexsort(columns[::-1]) would). If every column is an integer column
+    and their combined ranges fit, they are packed into a single int64 key,
+    so that only one sort is needed rather than one per column.
+
+    Parameters
+    ----------
+    columns : list(np.ndarray)
+        Equal length columns to sort by, the first being the most significant.
+
+    Returns
+    -------
+    order : np.ndarray
+        The indices which sort the rows of the columns.
+    """
+    if len(columns[0]) == 0 or any(values.dtype.kind not in "iu" for values in columns):
+        return np.lexsort(columns[::-1])
+
+    lows = [int(values.min()) for values in columns]
+    spans = [int(values.max()) - low + 1 for values, low in zip(columns, lows)]
+    if np.prod([float(span) for span in spans]) * len(columns[0]) >= 2.0**62:
+        return np.lexsort(columns[::-1])
+
+    # Appending each row's index makes every key unique, so any sort is stable
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for values, low, span in zip(columns, lows, spans):
+        key = key * span + (values - low)
+    key = key * len(key) + np.arange(len(key))
+    return np.argsort(key)
+
+
+def is_sorted_columns(columns):
+    """
+    Check whether the given columns are sorted lexicographically, in a single
+    linear pass (without sorting them).
+
+    Parameters
+    ----------
+    columns : list(np.ndarray) or np.ndarray
+        Equal length columns, the first being the most significant.
+
+    Returns
+    -------
+    is_sorted : boolean
+        True if the rows of the columns are in lexicographic order.
+    """
+    diffs = [np.diff(values) for values in columns]
+    in_order = diffs[-1] >= 0
+    for diff in diffs[-2::-1]:
+        in_order = (diff > 0) | ((diff == 0) & in_order)
+    return bool(np.all(in_order))
+
+
+class ExcerptSampler:
+    """An ExcerptSampler draws random excerpts from a note_df. The onsets are
+    held as a sorted array, so that each excerpt is sliced out with a binary
+    search, and the notes which begin a valid excerpt (one with at least
+    min_notes notes) are found up front, so that every draw succeeds."""
+
+    def __init__(
+        self, note_df, min_notes=10, excerpt_length=5000, first_onset_range=(0, 200)
+    ):
+        """
+        Create a new sampler for the given note_df.
+
+        Parameters
+        ----------
+        note_df : pd.DataFrame
+            The input note_df, from which to draw excerpts. If it is not
+            sorted by onset, it is (stably) sorted first. It must not be
+            changed while the sampler is in use.
+
+        min_notes : int
+            The minimum number of notes that must be contained in an excerpt.
+
+        excerpt_length : int
+            The length of each excerpt, in ms. All notes which onset within
+            this amount of time after a randomly chosen note are included in
+            the excerpt.
+
+        first_onset_range : tuple(int, int)
+            The range from which to draw a random number to add to the first
+            note's onset (in ms), rather than having each excerpt begin at
+            time 0.
+        """
+        self.canonical = is_canonical(note_df)
+        onsets = note_df["onset"].to_numpy()
+        if np.any(onsets[1:] < onsets[:-1]):
+            order = np.argsort(onsets, kind="stable")
+            note_df = note_df.iloc[order]
+            onsets = onsets[order]
+
+        self.note_df = note_df
+        self.onsets = onsets
+        self.first_onset_range = first_onset_range
+        self.starts = np.searchsorted(onsets, onsets, side="left")
+        self.ends = np.searchsorted(onsets, onsets + excerpt_length, side="right")
+        self.valid_notes = np.flatnonzero(self.ends - self.starts >= max(min_notes, 1))
+
+    def __len__(self):
+        """
+        Get the number of notes from which a valid excerpt begins.
+
+        Returns
+        -------
+        num_valid : int
+            The number of notes which can be drawn as the first note of an
+            excerpt. If 0, sample always returns None.
+        """
+        return len(self.valid_notes)
+
+    def sample_windows(self, n, overlap_policy="allow", seed=None):
+        """
+        Draw the positions of n random excerpts at once. Each window begins
+        at a note which begins a valid excerpt, as in sample.
+
+        Parameters
+        ----------
+        n : int
+            The number of windows to draw.
+
+        overlap_policy : string
+            One of EXCERPT_OVERLAP_POLICIES. With "allow", each window is drawn
+            independently (so the same window may be drawn more than once).
+            With "distinct", no window is drawn twice. With "disjoint", no two
+            windows contain the same note, and windows are drawn greedily in a
+            random order until n have been found.
+
+        seed : int, np.random.Generator, or None
+            A seed (or Generator) to be supplied to get_random_generator().
+
+        Returns
+        -------
+        starts : np.ndarray
+            The position (in self.note_df) of the first note of each window,
+            in ascending order. With "distinct" or "disjoint", fewer than n
+            windows are returned if there are not enough to draw from.
+
+        ends : np.ndarray
+            The position (in self.note_df) after the last note of each window.
+        """
+        assert n >= 0, "n must not be negative."
+        assert (
+            overlap_policy in EXCERPT_OVERLAP_POLICIES
+        ), f"overlap_policy must be one of {EXCERPT_OVERLAP_POLICIES}."
+        rng = get_random_generator(seed)
+
+        if overlap_policy == "allow":
+            if len(self.valid_notes) == 0:
+                notes = self.valid_notes
+            else:
+                notes = np.sort(
+                    self.valid_notes[rng.integers(len(self.valid_notes), size=n)]
+                )
+            return self.starts[notes], self.ends[notes]
+
+        # Notes with equal onsets begin the same window
+        candidates = np.unique(self.starts[self.valid_notes])
+        candidates = candidates[rng.permutation(len(candidates))]
+        if overlap_policy == "distinct":
+            starts = np.sort(candidates[:n])
+            return starts, self.ends[starts]
+
+        starts = []
+        ends = []
+        for start in candidates:
+            if len(starts) == n:
+                break
+            end = self.ends[start]
+            index = bisect_right(starts, start)
+            if (index > 0 and ends[index - 1] > start) or (
+                index < len(starts) and starts[index] < end
+            ):
+                continue
+            starts.insert(index, start)
+            ends.insert(index, end)
+        return (
+            np.array(starts, dtype=self.starts.dtype),
+            np.array(ends, dtype=self.ends.dtype),
+        )
+
+    def sample(self, seed=None):
+        """
+        Draw a random excerpt. A note which begins a valid excerpt is chosen
+        uniformly at random, and all notes which onset within excerpt_length
+        ms of it are taken. These are shifted so that the first note's onset
+        is at time 0, then a random number within first_onset_range is added
+        to each onset.
+
+        Parameters
+        ----------
+        seed : int, np.random.Generator, or None
+            A seed (or Generator) to be supplied to get_random_generator().
+
+        Returns
+        -------
+        excerpt : pd.DataFrame
+            A random excerpt, with a new index. None if the note_df contains
+            no valid excerpt. If the note_df is canonical (see
+            mark_canonical), so is the excerpt.
+        """
+        if len(self.valid_notes) == 0:
+            return None
+
+        rng = get_random_generator(seed)
+        note = self.valid_notes[rng.integers(len(self.valid_notes))]
+        onset_shift = rng.integers(*self.first_onset_range) - self.onsets[note]
+
+        # An excerpt of a canonical df is also canonical
+        if self.canonical:
+            data = self.note_df.to_numpy()[self.starts[note] : self.ends[note]]
+            data = data.T.copy()
+            data[0] += onset_shift
+            return mark_canonical(pd.DataFrame(data.T, columns=NOTE_DF_SORT_ORDER))
+
+        excerpt = self.note_df.iloc[self.starts[note] : self.ends[note]].copy()
+        excerpt["onset"] += onset_shift
+        return excerpt.reset_index(drop=True)
 
 
 def get_random_excerpt(
@@ -100,21 +445,21 @@ def get_random_excerpt(
     excerpt_length=5000,
     first_onset_range=(0, 200),
     iterations=10,
+    seed=None,
 ):
     """
-    Take a random excerpt from the given note_df, using np.random. The excerpt
-    is created as follows:
+    Take a random excerpt from the given note_df, with an ExcerptSampler. The
+    excerpt is created as follows:
 
-    1. Pick a note at random from the input df, excluding the last `min_notes`
-       notes.
+    1. Pick a note at random from the input df, out of those for which step 2
+       gives at least `min_notes` notes. If there are none, return None.
     2. Take all notes which onset within `excerpt_length` ms of that note.
-    3. If the excerpt does not contain at least `min_notes` notes, repeat steps
-       1 and 2 until you have drawn `iterations` invalid excerpts. In that
-       case, return None.
-    4. If you have a valid excerpt, shift its notes so that the first note's
-       onset is at time 0, then add a random number within `first_onset_range`
-       to each onset.
-    5. Return the resulting excerpt.
+    3. Shift the excerpt's notes so that the first note's onset is at time 0,
+       then add a random number within `first_onset_range` to each onset.
+    4. Return the resulting excerpt.
+
+    To draw many excerpts from the same note_df, create an ExcerptSampler
+    once and call its sample method instead.
 
     Parameters
     ----------
@@ -134,37 +479,25 @@ def get_random_excerpt(
         onset (in ms), rather than having the chosen excerpt begin at time 0.
 
     iterations : int
-        How many times to try to obtain a valid excerpt before giving up and
-        returning None.
+        Kept for backwards compatibility. Every draw is valid, so a single
+        attempt is made, unless this is 0, in which case None is returned.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) to be supplied to get_random_generator().
 
     Returns
     -------
     excerpt : pd.DataFrame
-        A random excerpt from the given note_df. None if no valid excerpt was
-        found within `iterations` attempts.
+        A random excerpt from the given note_df. None if the note_df contains
+        no valid excerpt (or iterations is 0).
     """
     if len(note_df) < min_notes or iterations == 0:
         return None
 
-    for _ in range(iterations):
-        note_index = np.random.choice(list(note_df.index.values)[:-min_notes])
-        first_onset = note_df.loc[note_index]["onset"]
-        excerpt = pd.DataFrame(
-            note_df.loc[
-                note_df["onset"].between(first_onset, first_onset + excerpt_length)
-            ]
-        )
-
-        # Check for validity of excerpt
-        if len(excerpt) < min_notes:
-            excerpt = None
-        else:
-            break
-
-    if excerpt is None:
-        return None
-
-    onset_shift = np.random.randint(first_onset_range[0], first_onset_range[1])
-    excerpt["onset"] += onset_shift - first_onset
-    excerpt = excerpt.reset_index(drop=True)
-    return excerpt
+    sampler = ExcerptSampler(
+        note_df,
+        min_notes=min_notes,
+        excerpt_length=excerpt_length,
+        first_onset_range=first_onset_range,
+    )
+    return sampler.sample(seed)
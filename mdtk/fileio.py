@@ -1,16 +1,34 @@
 """Code to read/write note_dfs from/to midi and csv files."""
 import logging
 import os
+import struct
 from glob import glob
 
+import numpy as np
 import pandas as pd
 import pretty_midi
 from tqdm import tqdm
 
 from mdtk.df_utils import NOTE_DF_SORT_ORDER, clean_df
+from mdtk.tempo import TempoMap
 
 COLNAMES = NOTE_DF_SORT_ORDER
 
+# The parsers which midi_to_df can use: "native" parses the file directly with
+# parse_midi_notes (falling back to pretty_midi for files it doesn't support),
+# and "pretty_midi" always uses pretty_midi.
+MIDI_PARSERS = ["native", "pretty_midi"]
+
+# The largest meta or sysex message length which mido (and so pretty_midi) reads
+MAX_MESSAGE_LENGTH = 1000000
+
+# The meta message types which mido decodes. mido drops the delta time of any
+# other (unknown) meta message, so files containing one are left to pretty_midi.
+KNOWN_META_TYPES = frozenset(
+    [0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x09, 0x20, 0x21, 0x2F]
+    + [0x51, 0x54, 0x58, 0x59, 0x7F]
+)
+
 
 def midi_dir_to_csv(
     midi_dir_path,
@@ -110,7 +128,13 @@ def midi_to_csv(midi_path, csv_path, single_track=False, non_overlapping=False):
     )
 
 
-def midi_to_df(midi_path, single_track=False, non_overlapping=False):
+def midi_to_df(
+    midi_path,
+    single_track=False,
+    non_overlapping=False,
+    resolution=None,
+    parser="native",
+):
     """
     Get the data from a MIDI file and load it into a pandas DataFrame.
 
@@ -130,49 +154,392 @@ def midi_to_df(midi_path, single_track=False, non_overlapping=False):
         sustained note present in the input, there will be a sustained note
         in the returned df. Likewise for any point with a note onset.
 
+    resolution : int
+        If given, times are returned in symbolic units of 1/resolution of a
+        quarter note (for example, the MIDI file's own resolution gives MIDI
+        ticks) rather than in milliseconds. Each time is rounded to the
+        nearest unit. See midi_to_tempo_map to convert them to milliseconds.
+
+    parser : string
+        One of MIDI_PARSERS. "native" (the default) parses the file with
+        parse_midi_notes, which gives the same result as pretty_midi with far
+        less overhead. Files which it does not support (for example, those
+        with SMPTE timing or malformed events) are parsed with pretty_midi.
+        "pretty_midi" always uses pretty_midi.
+
     Returns
     -------
     df : DataFrame
         A pandas DataFrame containing the notes parsed from the given MIDI
         file. There will be 4 columns:
-            onset: Onset time of the note, in milliseconds.
+            onset: Onset time of the note, in milliseconds (or units).
             track: The track number of the instrument the note is from.
             pitch: The MIDI pitch number for the note.
-            dur: The duration of the note (offset - onset), in milliseconds.
+            dur: The duration of the note (offset - onset), in milliseconds
+                (or units).
         Sorting will be first by onset, then track, then pitch, then duration.
     """
-    try:
-        midi = pretty_midi.PrettyMIDI(midi_path)
-    except Exception:
-        logging.warning(f"Error parsing midi file {midi_path}. Skipping.")
-        return None
-
-    notes = []
-    for index, instrument in enumerate(midi.instruments):
-        for note in instrument.notes:
-            notes.append(
-                {
-                    "onset": int(round(note.start * 1000)),
-                    "track": index,
-                    "pitch": note.pitch,
-                    "dur": int(round(note.end * 1000) - round(note.start * 1000)),
-                }
+    assert parser in MIDI_PARSERS, f"parser must be one of {MIDI_PARSERS}."
+
+    parsed = None
+    if parser == "native":
+        try:
+            with open(midi_path, "rb") as file:
+                parsed = parse_midi_notes(file.read())
+        except Exception:
+            # Leave unsupported (or invalid) files to pretty_midi
+            parsed = None
+
+    if parsed is not None:
+        ticks_per_beat, tempo_ticks, tick_scales, notes = parsed
+        starts = ticks_to_seconds(notes[0], tempo_ticks, tick_scales)
+        ends = ticks_to_seconds(notes[1], tempo_ticks, tick_scales)
+        tracks, pitches = notes[2], notes[3]
+        if resolution is not None:
+            # Exactly as TempoMap.from_pretty_midi
+            tempo_map = TempoMap(
+                tempo_ticks.astype(float) * resolution / ticks_per_beat,
+                60.0 / (tick_scales * ticks_per_beat),
+                resolution,
             )
-
-    if len(notes) == 0:
+    else:
+        try:
+            midi = pretty_midi.PrettyMIDI(midi_path)
+        except Exception:
+            logging.warning(f"Error parsing midi file {midi_path}. Skipping.")
+            return None
+
+        starts, ends, tracks, pitches = [], [], [], []
+        for index, instrument in enumerate(midi.instruments):
+            for note in instrument.notes:
+                starts.append(note.start)
+                ends.append(note.end)
+                tracks.append(index)
+                pitches.append(note.pitch)
+        if resolution is not None:
+            tempo_map = TempoMap.from_pretty_midi(midi, resolution=resolution)
+
+    if len(starts) == 0:
         logging.warning(
             f"WARNING: the midi file located at {midi_path} is empty. "
             "Returning None.",
         )
         return None
 
+    onsets = np.array(starts) * 1000
+    offsets = np.array(ends) * 1000
+    if resolution is not None:
+        onsets = tempo_map.ms_to_units(onsets)
+        offsets = tempo_map.ms_to_units(offsets)
+    onsets = np.round(onsets).astype("int64")
+    offsets = np.round(offsets).astype("int64")
+
     df = clean_df(
-        pd.DataFrame(notes), single_track=single_track, non_overlapping=non_overlapping
+        pd.DataFrame(
+            {
+                "onset": onsets,
+                "track": tracks,
+                "pitch": pitches,
+                "dur": offsets - onsets,
+            }
+        ),
+        single_track=single_track,
+        non_overlapping=non_overlapping,
     )
 
     return df
 
 
+def midi_to_tempo_map(midi_path, resolution=None):
+    """
+    Get the tempo map of a MIDI file, to convert the times of a note_df read
+    with midi_to_df(midi_path, resolution=resolution) to milliseconds.
+
+    Parameters
+    ----------
+    midi_path : string
+        The filename of the MIDI file to parse.
+
+    resolution : int
+        The number of units per quarter note. None uses the resolution of the
+        MIDI file, so that units are MIDI ticks.
+
+    Returns
+    -------
+    tempo_map : tempo.TempoMap
+        The tempo map of the MIDI file, or None if it could not be parsed.
+    """
+    try:
+        midi = pretty_midi.PrettyMIDI(midi_path)
+    except Exception:
+        logging.warning(f"Error parsing midi file {midi_path}. Returning None.")
+        return None
+    return TempoMap.from_pretty_midi(midi, resolution=resolution)
+
+
+def read_variable_int(data, pos):
+    """
+    Read a variable-length quantity from MIDI data.
+
+    Parameters
+    ----------
+    data : bytes
+        The MIDI data.
+
+    pos : int
+        The position of the first byte of the quantity.
+
+    Returns
+    -------
+    value : int
+        The value of the quantity.
+
+    pos : int
+        The position after the last byte of the quantity.
+    """
+    byte = data[pos]
+    value = byte & 0x7F
+    pos += 1
+    while byte & 0x80:
+        byte = data[pos]
+        value = (value << 7) | (byte & 0x7F)
+        pos += 1
+    return value, pos
+
+
+def parse_midi_notes(data):
+    """
+    Parse the notes and tempo changes of a standard MIDI file directly from
+    its bytes, giving exactly the notes that pretty_midi would (in particular,
+    with the same note pairing, instrument numbering, and tempo handling),
+    without creating a Python object for each event or note.
+
+    The track chunks are streamed once. Note-ons are kept on a stack for each
+    (channel, pitch) pair, and a note-off closes every open note on its stack
+    which began before its tick (keeping any that began on its tick, unless
+    none are closed, in which case they are all dropped). Each closed note is
+    assigned to an instrument by (program, channel, track), numbered in the
+    order in which they first close a note. As in pretty_midi, tempo changes
+    are only read from the first track.
+
+    Only files which pretty_midi is certain to parse in the same way are
+    supported. For anything else (for example, SMPTE timing, system common
+    messages, or malformed data), a ValueError is raised, so that the file
+    can be parsed with pretty_midi instead.
+
+    Parameters
+    ----------
+    data : bytes
+        The contents of a MIDI file.
+
+    Returns
+    -------
+    ticks_per_beat : int
+        The resolution of the file, in ticks per quarter note.
+
+    tempo_ticks : np.ndarray
+        The tick of each tempo change (as int64), the first being 0.
+
+    tick_scales : np.ndarray
+        The number of seconds per tick after each tempo change.
+
+    notes : np.ndarray
+        An int64 array of shape (4, num_notes), with rows containing the start
+        tick, end tick, instrument index, and pitch of each note.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a MIDI file which this function supports.
+    """
+    if len(data) < 14 or data[:4] != b"MThd":
+        raise ValueError("No MIDI header found.")
+    header_size = int.from_bytes(data[4:8], "big")
+    _, num_tracks, ticks_per_beat = struct.unpack(">hhh", data[8:14])
+    if header_size < 6 or num_tracks <= 0 or ticks_per_beat <= 0:
+        raise ValueError("Unsupported MIDI header.")
+
+    tempo_ticks = [0]
+    tick_scales = [60.0 / (120.0 * ticks_per_beat)]
+    instruments = {}
+    notes = [], [], [], []
+    max_tick = 0
+    pos = 8 + header_size
+
+    try:
+        for track in range(num_tracks):
+            if data[pos : pos + 4] != b"MTrk":
+                raise ValueError(f"No MTrk header for track {track}.")
+            end = pos + 8 + int.from_bytes(data[pos + 4 : pos + 8], "big")
+            if end > len(data):
+                raise ValueError(f"Track {track} is truncated.")
+            pos += 8
+
+            tick = 0
+            last_status = None
+            programs = [0] * 16
+            open_notes = {}
+            num_events = 0
+            while pos < end:
+                delta, pos = read_variable_int(data, pos)
+                tick += delta
+                num_events += 1
+                status = data[pos]
+                pos += 1
+
+                if status == 0xFF:
+                    # Meta messages don't change the running status
+                    meta_type = data[pos]
+                    length, pos = read_variable_int(data, pos + 1)
+                    if length > MAX_MESSAGE_LENGTH or pos + length > len(data):
+                        raise ValueError("Invalid meta message length.")
+                    meta = data[pos : pos + length]
+                    pos += length
+                    if (
+                        meta_type not in KNOWN_META_TYPES
+                        or (meta_type == 0x00 and length == 1)
+                        or (meta_type == 0x20 and length == 0)
+                        or (meta_type == 0x51 and length < 3)
+                        or (meta_type == 0x54 and length < 5)
+                        or (meta_type == 0x58 and length < 4)
+                        or (meta_type == 0x59 and length < 2)
+                    ):
+                        raise ValueError("Unsupported meta message.")
+                    if meta_type == 0x54 and (
+                        meta[0] >> 5 > 3 or max(meta[1], meta[2]) > 59 or meta[4] > 99
+                    ):
+                        raise ValueError("Invalid SMPTE offset.")
+                    if meta_type == 0x59:
+                        key = meta[0] - 256 if meta[0] > 127 else meta[0]
+                        if not (-7 <= key <= 7 and meta[1] in (0, 1)):
+                            raise ValueError("Invalid key signature.")
+                    if track == 0 and meta_type == 0x58 and meta[0] == 0:
+                        raise ValueError("Invalid time signature.")
+                    if track == 0 and meta_type == 0x51:
+                        tempo = (meta[0] << 16) | (meta[1] << 8) | meta[2]
+                        if tempo == 0:
+                            raise ValueError("Invalid tempo.")
+                        tick_scale = 60.0 / ((6e7 / tempo) * ticks_per_beat)
+                        if tick == 0:
+                            tempo_ticks = [0]
+                            tick_scales = [tick_scale]
+                        elif tick_scale != tick_scales[-1]:
+                            tempo_ticks.append(tick)
+                            tick_scales.append(tick_scale)
+                    continue
+
+                if status in (0xF0, 0xF7):
+                    last_status = status
+                    length, pos = read_variable_int(data, pos)
+                    if length > MAX_MESSAGE_LENGTH or pos + length > len(data):
+                        raise ValueError("Invalid sysex message length.")
+                    sysex = data[pos : pos + length]
+                    pos += length
+                    # mido strips the start and end bytes, and checks the rest
+                    if sysex[:1] == b"\xf0":
+                        sysex = sysex[1:]
+                    if sysex[-1:] == b"\xf7":
+                        sysex = sysex[:-1]
+                    if any(byte > 127 for byte in sysex):
+                        raise ValueError("Invalid sysex data byte.")
+                    continue
+
+                if status < 0x80:
+                    # Running status: this is the first data byte
+                    if last_status is None or last_status >= 0xF0:
+                        raise ValueError("Unsupported running status.")
+                    data_1 = status
+                    status = last_status
+                elif status < 0xF0:
+                    last_status = status
+                    data_1 = data[pos]
+                    pos += 1
+                else:
+                    raise ValueError("Unsupported system message.")
+
+                kind = status & 0xF0
+                channel = status & 0x0F
+                if kind in (0xC0, 0xD0):
+                    if data_1 > 127:
+                        raise ValueError("Invalid data byte.")
+                    if kind == 0xC0:
+                        programs[channel] = data_1
+                    continue
+
+                data_2 = data[pos]
+                pos += 1
+                if data_1 > 127 or data_2 > 127:
+                    raise ValueError("Invalid data byte.")
+                if kind == 0x90 and data_2 > 0:
+                    open_notes.setdefault((channel, data_1), []).append(tick)
+                elif (kind == 0x80 or kind == 0x90) and (
+                    (channel, data_1) in open_notes
+                ):
+                    starts = open_notes[(channel, data_1)]
+                    kept = [start for start in starts if start == tick]
+                    if len(kept) < len(starts):
+                        instrument = instruments.setdefault(
+                            (programs[channel], channel, track), len(instruments)
+                        )
+                        for start in starts:
+                            if start != tick:
+                                notes[0].append(start)
+                                notes[1].append(tick)
+                                notes[2].append(instrument)
+                                notes[3].append(data_1)
+                    if 0 < len(kept) < len(starts):
+                        open_notes[(channel, data_1)] = kept
+                    else:
+                        del open_notes[(channel, data_1)]
+
+            if pos != end or num_events == 0:
+                raise ValueError(f"Track {track} does not end on an event.")
+            max_tick = max(max_tick, tick)
+    except IndexError:
+        raise ValueError("Unexpected end of MIDI data.")
+
+    if max_tick + 1 > pretty_midi.pretty_midi.MAX_TICK:
+        raise ValueError(f"MIDI file has a largest tick of {max_tick + 1}.")
+
+    return (
+        ticks_per_beat,
+        np.array(tempo_ticks, dtype=np.int64),
+        np.array(tick_scales),
+        np.array(notes, dtype=np.int64).reshape(4, -1),
+    )
+
+
+def ticks_to_seconds(ticks, tempo_ticks, tick_scales):
+    """
+    Convert MIDI ticks to seconds, with exactly the same floating-point
+    operations as pretty_midi (so that rounded times match).
+
+    Parameters
+    ----------
+    ticks : np.ndarray
+        The ticks to convert.
+
+    tempo_ticks : np.ndarray
+        The tick of each tempo change, as returned by parse_midi_notes.
+
+    tick_scales : np.ndarray
+        The number of seconds per tick after each tempo change, as returned
+        by parse_midi_notes.
+
+    Returns
+    -------
+    seconds : np.ndarray
+        The time of each tick, in seconds.
+    """
+    change_times = np.zeros(len(tempo_ticks))
+    for index in range(1, len(tempo_ticks)):
+        change_times[index] = change_times[index - 1] + tick_scales[index - 1] * (
+            tempo_ticks[index] - tempo_ticks[index - 1]
+        )
+    index = np.searchsorted(tempo_ticks, ticks, side="right") - 1
+    return change_times[index] + tick_scales[index] * (ticks - tempo_ticks[index])
+
+
 def csv_to_df(csv_path, single_track=False, non_overlapping=False):
     """
     Read a csv and create a standard note event DataFrame - a `note_df`.
@@ -7,6 +7,7 @@ import numpy as np
 import pandas as pd
 import tqdm
 
+from mdtk.accel import pianoroll_frames, pianoroll_notes
 from mdtk.degradations import MAX_PITCH_DEFAULT, MIN_PITCH_DEFAULT
 from mdtk.df_utils import NOTE_DF_SORT_ORDER
 
@@ -123,6 +124,42 @@ def create_corpus_csvs(acme_dir, format_dict):
     meta_df.to_csv(os.path.join(acme_dir, "metadata.csv"), index=False)
 
 
+def notes_to_df(onsets, pitches, offsets, time_increment=40):
+    """
+    Create a sorted note_df (with all notes on track 0) from frame-quantized
+    notes.
+
+    Parameters
+    ----------
+    onsets : np.ndarray(int)
+        The onset frame of each note.
+
+    pitches : np.ndarray(int)
+        The pitch of each note.
+
+    offsets : np.ndarray(int)
+        The offset frame of each note.
+
+    time_increment : int
+        The length of a single frame, in milliseconds.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        A note_df containing the given notes, sorted by onset, track, pitch,
+        and then dur.
+    """
+    df = pd.DataFrame(
+        {
+            "onset": onsets * time_increment,
+            "track": np.zeros(len(onsets), dtype=np.int64),
+            "pitch": pitches,
+            "dur": (offsets - onsets) * time_increment,
+        }
+    )
+    return df.sort_values(by=NOTE_DF_SORT_ORDER).reset_index(drop=True)
+
+
 def df_to_pianoroll_str(df, time_increment=40):
     """
     Convert a given pandas DataFrame into a packed piano-roll representation:
@@ -140,7 +177,9 @@ def df_to_pianoroll_str(df, time_increment=40):
         The pandas DataFrame which we will convert into the piano-roll.
 
     time_increment : int
-        The length of a single frame, in milliseconds.
+        The length of a single frame, in milliseconds (or in the units of a
+        df in symbolic time, see tempo.TempoMap, in which case notes whose
+        times are multiples of time_increment are quantized exactly).
     """
     # Input validation
     assert time_increment > 0, "time_increment must be positive."
@@ -157,19 +196,22 @@ def df_to_pianoroll_str(df, time_increment=40):
     # Create piano rolls
     length = quant_df["offset"].max()
     max_pitch = quant_df["pitch"].max() + 1
-    note_pr = np.zeros((length, max_pitch))
-    onset_pr = np.zeros((length, max_pitch))
-    for _, note in quant_df.iterrows():
-        onset_pr[note.onset, note.pitch] = 1
-        note_pr[note.onset : note.offset, note.pitch] = 1
+    note_pr, onset_pr = pianoroll_frames(
+        quant_df["onset"].to_numpy(),
+        quant_df["offset"].to_numpy(),
+        quant_df["pitch"].to_numpy(),
+        length,
+        max_pitch,
+    )
 
     # Pack into format
+    pitch_strs = [str(pitch) for pitch in range(max_pitch)]
     strings = []
     for note_frame, onset_frame in zip(note_pr, onset_pr):
         strings.append(
-            " ".join(map(str, np.where(note_frame == 1)[0]))
+            " ".join([pitch_strs[pitch] for pitch in np.flatnonzero(note_frame)])
             + "_"
-            + " ".join(map(str, np.where(onset_frame == 1)[0]))
+            + " ".join([pitch_strs[pitch] for pitch in np.flatnonzero(onset_frame)])
         )
 
     return "/".join(strings)
@@ -189,48 +231,32 @@ def pianoroll_str_to_df(pr_str, time_increment=40):
     df : pd.DataFrame
         A dataframe equal to the given pianoroll string.
     """
-    notes = []
-    active = [-1] * 128
-
     frames = pr_str.split("/")
+    note_pr = np.zeros((len(frames), 128), dtype=bool)
+    onset_counts = np.zeros((len(frames), 128), dtype=np.int64)
+    # Frames with no sustained pitches don't stop any notes
+    check_sustain = np.zeros(len(frames), dtype=bool)
 
+    note_frames, note_pitches = [], []
+    onset_frames, onset_pitches = [], []
     for frame_num, frame in enumerate(frames):
-        time = frame_num * time_increment
-        note_pitches, onset_pitches = frame.split("_")
-        if note_pitches != "":
-            note_pitches = list(map(int, note_pitches.split(" ")))
-
-            # Check that all pitches continue
-            for pitch, idx in enumerate(active):
-                if idx >= 0 and pitch not in note_pitches:
-                    # Pitch doesn't continue
-                    notes[idx]["dur"] = time - notes[idx]["onset"]
-                    active[pitch] = -1
-
-        if onset_pitches == "":
-            continue
-
-        # Check onsets for new notes/breaks in existing notes
-        for pitch in map(int, onset_pitches.split(" ")):
-            if active[pitch] >= 0:
-                # Pitch was active. Stop it here.
-                notes[active[pitch]]["dur"] = time - notes[active[pitch]]["onset"]
-
-            # Start new note
-            active[pitch] = len(notes)
-            notes.append({"onset": time, "pitch": pitch, "track": 0, "dur": None})
-
-    # Close any still open notes
-    for idx in active:
-        if idx >= 0:
-            notes[idx]["dur"] = len(frames) * time_increment - notes[idx]["onset"]
-
-    # Create df
-    df = pd.DataFrame(notes)
-    df = df.sort_values(by=NOTE_DF_SORT_ORDER)[NOTE_DF_SORT_ORDER].reset_index(
-        drop=True
+        note_pitch_str, onset_pitch_str = frame.split("_")
+        if note_pitch_str != "":
+            check_sustain[frame_num] = True
+            pitches = note_pitch_str.split(" ")
+            note_pitches.extend(pitches)
+            note_frames.extend([frame_num] * len(pitches))
+        if onset_pitch_str != "":
+            pitches = onset_pitch_str.split(" ")
+            onset_pitches.extend(pitches)
+            onset_frames.extend([frame_num] * len(pitches))
+    note_pr[note_frames, np.array(note_pitches, dtype=np.int64)] = True
+    np.add.at(onset_counts, (onset_frames, np.array(onset_pitches, dtype=np.int64)), 1)
+
+    onsets, pitches, offsets = pianoroll_notes(
+        note_pr, onset_counts, check_sustain, False
     )
-    return df
+    return notes_to_df(onsets, pitches, offsets, time_increment)
 
 
 def double_pianoroll_to_df(
@@ -273,58 +299,19 @@ def double_pianoroll_to_df(
         )
         max_pitch = int(pianoroll.shape[1] / 2 + min_pitch - 1)
 
-    df_notes = []
-    active = [-1] * (max_pitch - min_pitch + 1)  # Index of active note in notes
     midpoint = int(pianoroll.shape[1] / 2)
 
-    for frame_num, (notes, onsets) in enumerate(
-        zip(pianoroll[:, :midpoint], pianoroll[:, midpoint:])
-    ):
-        time = frame_num * time_increment
-        note_pitches = np.where(notes == 1)[0]
-        onset_pitches = np.where(onsets == 1)[0]
-
-        # Check that all pitches continue
-        for pitch, idx in enumerate(active):
-            if idx >= 0 and pitch not in note_pitches:
-                # Pitch doesn't continue
-                df_notes[idx]["dur"] = time - df_notes[idx]["onset"]
-                active[pitch] = -1
-
-        # Check onsets for new notes/breaks in existing notes
-        for pitch in onset_pitches:
-            if active[pitch] >= 0:
-                # Pitch was active. Stop it here.
-                df_notes[active[pitch]]["dur"] = time - df_notes[active[pitch]]["onset"]
-
-            # Start new note
-            active[pitch] = len(df_notes)
-            df_notes.append(
-                {"onset": time, "pitch": pitch + min_pitch, "track": 0, "dur": None}
-            )
-
-        # Find pitch presences that should've been onsets but weren't
-        for pitch in note_pitches:
-            if active[pitch] < 0:
-                # Pitch is supposed to be inactive, but there is a sustain
-                # Treat this as an onset
-                active[pitch] = len(df_notes)
-                df_notes.append(
-                    {"onset": time, "pitch": pitch + min_pitch, "track": 0, "dur": None}
-                )
-
-    # Close any still open notes
-    frames = pianoroll.shape[0]
-    for idx in active:
-        if idx >= 0:
-            df_notes[idx]["dur"] = frames * time_increment - df_notes[idx]["onset"]
+    # Sustains without a sounding note are treated as onsets
+    onsets, pitches, offsets = pianoroll_notes(
+        pianoroll[:, :midpoint] == 1,
+        (pianoroll[:, midpoint:] == 1).astype(np.int64),
+        np.ones(pianoroll.shape[0], dtype=bool),
+        True,
+    )
 
     # Create df
-    if len(df_notes) > 0:
-        df = pd.DataFrame(df_notes)
-        df = df.sort_values(by=NOTE_DF_SORT_ORDER)[NOTE_DF_SORT_ORDER].reset_index(
-            drop=True
-        )
+    if len(onsets) > 0:
+        df = notes_to_df(onsets, pitches + min_pitch, offsets, time_increment)
     else:
         df = pd.DataFrame(columns=NOTE_DF_SORT_ORDER).reset_index(drop=True)
     return df
@@ -0,0 +1,1166 @@
+"""A compact, array-backed alternative to note_dfs, used by the degradations to
+avoid pandas overhead on short excerpts."""
+import numpy as np
+import pandas as pd
+
+from mdtk.df_utils import NOTE_DF_SORT_ORDER, ExcerptSampler, is_sorted_columns
+
+NOTE_ARRAY_DTYPE = np.int64
+
+# The number of notes above which a NoteEdit of a sorted base is sorted by
+# insertion (see NoteArray.insert_sorted) rather than by a full sort
+INSERT_SORTED_MIN_NOTES = 1000
+
+
+class NoteArray:
+    """
+    A NoteArray holds the notes of a note_df in a single integer array.
+
+    The notes are stored column-major in `data`, an array of shape (4, n)
+    whose rows are the onset, track, pitch, and dur of each note (in the order
+    given by NOTE_DF_SORT_ORDER). This is exactly the layout pandas uses for
+    a DataFrame with a single integer block, so converting to and from a
+    clean note_df does not copy any note data.
+
+    Note that a NoteArray created from a note_df may share its memory. Any
+    code which edits notes in place should call copy() first.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        """
+        Create a new NoteArray around the given data.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            An integer array of shape (4, n), with rows onset, track, pitch,
+            and dur.
+        """
+        self.data = data
+
+    @classmethod
+    def from_columns(cls, onset, track, pitch, dur):
+        """
+        Create a new NoteArray from the given columns.
+
+        Parameters
+        ----------
+        onset, track, pitch, dur : array-like
+            Equal length sequences containing the value of each column for
+            each note.
+
+        Returns
+        -------
+        note_array : NoteArray
+            A new NoteArray containing the given notes.
+        """
+        data = np.array([onset, track, pitch, dur], dtype=NOTE_ARRAY_DTYPE)
+        return cls(data.reshape(len(NOTE_DF_SORT_ORDER), -1))
+
+    @classmethod
+    def from_df(cls, df):
+        """
+        Create a NoteArray from a note_df. Any additional columns are ignored,
+        and all values are rounded to ints. If the df already contains exactly
+        the columns onset, track, pitch, and dur (in that order) as ints, the
+        returned NoteArray will share its memory.
+
+        Parameters
+        ----------
+        df : pd.DataFrame or NoteArray
+            The note_df to convert. If a NoteArray is given, it is returned
+            unchanged.
+
+        Returns
+        -------
+        note_array : NoteArray
+            A NoteArray containing the notes of the given df, in the same
+            order.
+
+        Raises
+        ------
+        ValueError
+            If the given df does not have all of the necessary columns.
+        """
+        if isinstance(df, NoteArray):
+            return df
+
+        if list(df.columns) != NOTE_DF_SORT_ORDER:
+            try:
+                df = df.loc[:, NOTE_DF_SORT_ORDER]
+            except KeyError:  # df has incorrect columns
+                raise ValueError(
+                    f"Input note_df must have all of the columns: {NOTE_DF_SORT_ORDER}"
+                )
+
+        values = df.to_numpy()
+        if values.dtype.kind in "iu":
+            values = values.astype(NOTE_ARRAY_DTYPE, copy=False)
+        else:
+            values = np.round(values.astype(float)).astype(NOTE_ARRAY_DTYPE)
+        return cls(values.T)
+
+    def to_df(self):
+        """
+        Convert this NoteArray into a note_df, without copying.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            A note_df with columns onset, track, pitch, and dur, and a default
+            RangeIndex. The df shares its memory with this NoteArray.
+        """
+        return pd.DataFrame(self.data.T, columns=NOTE_DF_SORT_ORDER)
+
+    @property
+    def onset(self):
+        return self.data[0]
+
+    @property
+    def track(self):
+        return self.data[1]
+
+    @property
+    def pitch(self):
+        return self.data[2]
+
+    @property
+    def dur(self):
+        return self.data[3]
+
+    @property
+    def offset(self):
+        return self.data[0] + self.data[3]
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    def __getitem__(self, key):
+        return NoteArray(self.data[:, key])
+
+    def __repr__(self):
+        return f"NoteArray(\n{self.to_df()}\n)"
+
+    def copy(self):
+        """
+        Returns
+        -------
+        note_array : NoteArray
+            A copy of this NoteArray which does not share its memory.
+        """
+        return NoteArray(self.data.copy())
+
+    def equals(self, other):
+        """
+        Returns
+        -------
+        equal : boolean
+            True if the other NoteArray contains the same notes in the same
+            order. False otherwise.
+        """
+        return isinstance(other, NoteArray) and np.array_equal(self.data, other.data)
+
+    def append(self, other):
+        """
+        Returns
+        -------
+        note_array : NoteArray
+            A new NoteArray containing the notes of this NoteArray, followed by
+            the notes of the other given NoteArray.
+        """
+        return NoteArray(np.concatenate((self.data, other.data), axis=1))
+
+    def drop(self, indices):
+        """
+        Returns
+        -------
+        note_array : NoteArray
+            A new NoteArray with the notes at the given (positional) indices
+            removed.
+        """
+        return NoteArray(np.delete(self.data, indices, axis=1))
+
+    def sort(self):
+        """
+        Returns
+        -------
+        note_array : NoteArray
+            A new NoteArray with the notes sorted by onset, track, pitch, and
+            then dur.
+        """
+        order = np.lexsort(self.data[::-1])
+        return NoteArray(self.data[:, order])
+
+    def is_sorted(self):
+        """
+        Returns
+        -------
+        is_sorted : boolean
+            True if the notes are sorted by onset, track, pitch, and then dur.
+        """
+        return is_sorted_columns(self.data)
+
+    def insert_sorted(self, other):
+        """
+        Insert notes into this (sorted) NoteArray at their sorted positions.
+        Each note is placed with a binary search on onset (and a scan of the
+        notes with the same onset), so this takes linear time rather than
+        re-sorting all of the notes.
+
+        Parameters
+        ----------
+        other : NoteArray
+            The notes to insert.
+
+        Returns
+        -------
+        note_array : NoteArray
+            A new NoteArray containing the notes of both NoteArrays, sorted
+            exactly as sort() would sort them.
+        """
+        other = other.sort()
+        onset = self.onset
+        positions = np.searchsorted(onset, other.onset, side="left")
+        ends = np.searchsorted(onset, other.onset, side="right")
+        for index, (start, end) in enumerate(zip(positions, ends)):
+            if start == end:
+                continue
+            # Count the notes with the same onset which sort before this one
+            ties = self.data[1:, start:end]
+            note = other.data[1:, index, None]
+            before = np.zeros(end - start, dtype=bool)
+            equal = np.ones(end - start, dtype=bool)
+            for tie, value in zip(ties, note):
+                before |= equal & (tie < value)
+                equal &= tie == value
+            positions[index] = start + np.count_nonzero(before | equal)
+        return NoteArray(np.insert(self.data, positions, other.data, axis=1))
+
+
+class NoteEdit:
+    """
+    A NoteEdit records the changes made to an excerpt by a degradation: the
+    (positional) indices of the notes removed from it, the notes added to it,
+    and the new values of any modified fields of its other notes.
+
+    The degraded excerpt is only materialized (copied, edited, and sorted)
+    the first time it is requested, so callers which only need to know what
+    was changed (for example, the time span of the degradation) never pay for
+    it. The record itself is an exact label of the location of the
+    degradation.
+    """
+
+    def __init__(
+        self, base, removed=(), added=None, modified=None, sort=True, base_sorted=False
+    ):
+        """
+        Create a new record of changes to the given notes.
+
+        Parameters
+        ----------
+        base : NoteArray
+            The notes before the edit. These must not be changed while the
+            NoteEdit is in use.
+
+        removed : array-like(int)
+            The indices of the notes removed from base.
+
+        added : NoteArray
+            The notes added to base, or None if none were added.
+
+        modified : dict(string -> (array-like(int), array-like(int)))
+            For each modified field (onset, track, pitch, or dur), the indices
+            of the notes in base which were modified, and their new values.
+
+        sort : boolean
+            True to sort the notes of the materialized excerpt. False to
+            leave them in the order of base (followed by the added notes).
+
+        base_sorted : boolean
+            True if base is sorted. If base has at least
+            INSERT_SORTED_MIN_NOTES notes, the materialized excerpt is then
+            sorted by inserting the changed notes into the unchanged ones (see
+            NoteArray.insert_sorted), which is faster for long excerpts.
+        """
+        self.base = base
+        self.removed = np.asarray(removed, dtype=NOTE_ARRAY_DTYPE).reshape(-1)
+        if added is None:
+            added = NoteArray(
+                np.empty((len(NOTE_DF_SORT_ORDER), 0), dtype=NOTE_ARRAY_DTYPE)
+            )
+        self.added = added
+        self.modified = {}
+        for field, (indices, values) in (modified or {}).items():
+            self.modified[field] = (
+                np.asarray(indices, dtype=NOTE_ARRAY_DTYPE).reshape(-1),
+                np.asarray(values, dtype=NOTE_ARRAY_DTYPE).reshape(-1),
+            )
+        self.sort = sort
+        self.base_sorted = base_sorted
+        self._notes = None
+
+    def __len__(self):
+        return len(self.base) - len(self.removed) + len(self.added)
+
+    def __repr__(self):
+        modified = {
+            field: (indices.tolist(), values.tolist())
+            for field, (indices, values) in self.modified.items()
+        }
+        return (
+            f"NoteEdit(removed={self.removed.tolist()}, "
+            f"added={self.added.data.T.tolist()}, modified={modified})"
+        )
+
+    @property
+    def notes(self):
+        """The degraded notes (as a NoteArray), materialized on first use."""
+        if (
+            self._notes is None
+            and self.sort
+            and self.base_sorted
+            and len(self.base) >= INSERT_SORTED_MIN_NOTES
+        ):
+            self._notes = self.base.drop(self.changed_indices).insert_sorted(
+                self.new_notes()
+            )
+        if self._notes is None:
+            notes = self.base
+            if self.modified:
+                notes = notes.copy()
+                for field, (indices, values) in self.modified.items():
+                    notes.data[NOTE_DF_SORT_ORDER.index(field), indices] = values
+            if len(self.removed) > 0:
+                notes = notes.drop(self.removed)
+            if len(self.added) > 0:
+                notes = notes.append(self.added)
+            self._notes = notes.sort() if self.sort else notes
+        return self._notes
+
+    @property
+    def modified_indices(self):
+        """The sorted indices of the modified (and not removed) base notes."""
+        indices = [indices for indices, _ in self.modified.values()]
+        indices = np.unique(np.concatenate([self.removed[:0]] + indices))
+        return np.setdiff1d(indices, self.removed, assume_unique=True)
+
+    @property
+    def changed_indices(self):
+        """The sorted indices of the removed or modified base notes."""
+        return np.union1d(self.removed, self.modified_indices)
+
+    def old_notes(self):
+        """
+        Returns
+        -------
+        old_notes : NoteArray
+            The notes of base which were removed or modified, before the edit.
+        """
+        return self.base[self.changed_indices]
+
+    def new_notes(self):
+        """
+        Returns
+        -------
+        new_notes : NoteArray
+            The modified notes (after the edit), followed by the added notes.
+        """
+        indices = self.modified_indices
+        modified = self.base[indices].copy()
+        for field, (field_indices, values) in self.modified.items():
+            keep = np.isin(field_indices, indices)
+            positions = np.searchsorted(indices, field_indices[keep])
+            modified.data[NOTE_DF_SORT_ORDER.index(field), positions] = values[keep]
+        return modified.append(self.added)
+
+    def changed_span(self):
+        """
+        Get the time span affected by the edit.
+
+        Returns
+        -------
+        span : tuple(int, int)
+            The earliest onset and latest offset of any note before or after
+            the edit which was changed, or None if nothing was changed.
+        """
+        changed = self.old_notes().append(self.new_notes())
+        if len(changed) == 0:
+            return None
+        return int(changed.onset.min()), int(changed.offset.max())
+
+
+def overlapping_pairs(note_array, groups):
+    """
+    Find every pair of notes in the same group which overlap in time.
+
+    Notes are sorted by group and onset, so that the notes which could
+    overlap a given note are found with two binary searches: those which
+    begin before it ends, after the first whose group's running max offset
+    passes its onset.
+
+    Parameters
+    ----------
+    note_array : NoteArray
+        The notes to check.
+
+    groups : np.ndarray
+        An int array containing the group of each note (for example, its
+        track). Only notes in the same group are paired.
+
+    Returns
+    -------
+    note : np.ndarray
+        The index of the first note of each overlapping pair.
+
+    other : np.ndarray
+        The index of the second note of each overlapping pair. Each pair is
+        returned in both orders, and no note is paired with itself.
+    """
+    if len(note_array) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    order = np.lexsort((note_array.onset, groups))
+    onset = note_array.onset[order]
+    offset = note_array.offset[order]
+    group = groups[order]
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = group[1:] != group[:-1]
+    group_offset = (np.cumsum(new_group) - 1) * (
+        int(offset.max()) - int(onset.min()) + 1
+    )
+    max_offset = np.maximum.accumulate(offset + group_offset)
+
+    first = np.searchsorted(max_offset, onset + group_offset, "right")
+    stop = np.searchsorted(onset + group_offset, offset + group_offset, "left")
+
+    # A zero-duration note may have no candidates, with stop before first
+    size = np.maximum(stop - first, 0)
+    note = np.repeat(np.arange(len(order)), size)
+    other = np.arange(size.sum()) - np.repeat(np.cumsum(size) - size - first, size)
+    overlap = (note != other) & (offset[other] > onset[note])
+    return order[note[overlap]], order[other[overlap]]
+
+
+def pitch_occupancy(note_array, groups, first_pitch, num_pitches):
+    """
+    Find, for each note, which of a window of pitches are occupied during the
+    note's span by some note in the same group, using a per-pitch occupancy
+    bitmap.
+
+    Times are split into elementary segments at every onset and offset (of
+    each group separately), and a bitmap records which pitches are sounding
+    during each segment. Prefix counts of the bitmap over segments then give
+    whether a pitch is occupied at any time during any note's span in O(1),
+    so that no pairs of notes are ever enumerated. Notes of zero duration
+    occupy (and span) no segments.
+
+    Parameters
+    ----------
+    note_array : NoteArray
+        The notes to check.
+
+    groups : np.ndarray
+        An int array containing the group of each note (for example, its
+        track). Notes only occupy pitches within their own group.
+
+    first_pitch : np.ndarray
+        The first pitch of the window of each note.
+
+    num_pitches : int
+        The number of pitches in each note's window.
+
+    Returns
+    -------
+    occupied : np.ndarray
+        A boolean array of shape (len(note_array), num_pitches), where
+        occupied[i, j] is True if some note in the same group as note i with
+        pitch first_pitch[i] + j overlaps note i in time. Each note occupies
+        its own pitch.
+    """
+    occupied = np.zeros((len(note_array), num_pitches), dtype=bool)
+    if len(note_array) == 0 or num_pitches == 0:
+        return occupied
+
+    # Separate the times of each group, so that segments are per group
+    onset = note_array.onset
+    offset = note_array.offset
+    span = int(offset.max()) - int(onset.min()) + 1
+    group_start = (groups - groups.min()) * span
+    onset = onset + group_start
+    offset = offset + group_start
+    bounds = np.unique(np.append(onset, offset))
+    seg_start = np.searchsorted(bounds, onset)
+    seg_end = np.searchsorted(bounds, offset)
+
+    # Bitmap of pitches sounding in each segment, via a difference array
+    min_pitch = int(note_array.pitch.min())
+    pitch = note_array.pitch - min_pitch
+    num_bitmap_pitches = int(pitch.max()) + 1
+    size = len(bounds) * num_bitmap_pitches
+    diff = np.bincount(seg_start * num_bitmap_pitches + pitch, minlength=size)
+    diff -= np.bincount(seg_end * num_bitmap_pitches + pitch, minlength=size)
+    bitmap = np.cumsum(diff.reshape(len(bounds), -1), axis=0) > 0
+
+    # Number of occupied segments before each segment, for each pitch
+    counts = np.zeros((len(bounds) + 1, num_bitmap_pitches), dtype=np.int32)
+    np.cumsum(bitmap, axis=0, out=counts[1:])
+
+    # Occupied pitches (of the bitmap) during each note's span
+    note_occupied = counts[seg_end] - counts[seg_start] > 0
+
+    # Shift each note's row into its window
+    shift = first_pitch - min_pitch
+    if np.all(shift == shift[0]):
+        shift = int(shift[0])
+        start = max(-shift, 0)
+        end = min(num_bitmap_pitches - shift, num_pitches)
+        if start < end:
+            occupied[:, start:end] = note_occupied[:, start + shift : end + shift]
+    else:
+        columns = shift[:, None] + np.arange(num_pitches)
+        in_bitmap = (columns >= 0) & (columns < num_bitmap_pitches)
+        rows, cols = np.nonzero(in_bitmap)
+        occupied[rows, cols] = note_occupied[rows, columns[rows, cols]]
+    return occupied
+
+
+class PitchIntervalIndex:
+    """
+    An index over the notes of a NoteArray, grouped by (track, pitch), which
+    answers collision queries with binary searches rather than full scans.
+
+    Within each (track, pitch) group, notes are kept sorted by onset, along
+    with the running maximum offset of the group. Since the running maximum
+    is non-decreasing, both the notes which begin before a given time and the
+    first note which ends after a given time can be found with searchsorted.
+
+    Queries which exclude a note (for example, the note being moved) recompute
+    the running maximum of that note's group only.
+    """
+
+    def __init__(self, note_array):
+        """
+        Build an index of the given notes.
+
+        Parameters
+        ----------
+        note_array : NoteArray
+            The notes to index. Indices given to and returned by the index
+            refer to positions within this NoteArray.
+        """
+        order = np.lexsort((note_array.onset, note_array.pitch, note_array.track))
+        track = note_array.track[order]
+        pitch = note_array.pitch[order]
+        self.order = order
+        self.onset = note_array.onset[order]
+        self.offset = note_array.offset[order]
+
+        self.position = np.empty_like(order)
+        self.position[order] = np.arange(len(order))
+
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = (track[1:] != track[:-1]) | (pitch[1:] != pitch[:-1])
+        self.group_starts = np.flatnonzero(new_group)
+        self.group_ends = np.append(self.group_starts[1:], len(order))
+        if len(order) == 0:
+            self.group_ends = self.group_starts.copy()
+        self.groups = dict(
+            zip(
+                zip(
+                    track[self.group_starts].tolist(), pitch[self.group_starts].tolist()
+                ),
+                range(len(self.group_starts)),
+            )
+        )
+        self.note_group = np.cumsum(new_group) - 1
+
+        # Running max offset within each group, and the offsets of each group
+        # in sorted order. Adding a large per-group offset to each value lets
+        # a single cumulative max, sort, or search run over all groups at once.
+        self.base = int(self.onset.min()) if len(order) > 0 else 0
+        self.span = int(self.offset.max()) - self.base + 2 if len(order) > 0 else 1
+        group_offset = self.note_group * self.span
+        self.max_offset = (
+            np.maximum.accumulate(self.offset + group_offset) - group_offset
+        )
+        offset_order = np.lexsort((self.offset, self.note_group))
+        self.sorted_offset = self.offset[offset_order]
+        self.offset_position = np.empty_like(order)
+        self.offset_position[offset_order] = np.arange(len(order))
+        self.onset_keys = self.onset - self.base + group_offset
+        self.offset_keys = self.sorted_offset - self.base + group_offset
+        self.zero_keys = self.onset_keys[self.onset == self.offset]
+
+    def group_keys(self, group, values):
+        """
+        Get search keys for the given values within the given groups, which
+        can be passed to searchsorted on onset_keys or offset_keys.
+
+        Parameters
+        ----------
+        group : int or np.ndarray
+            The group id(s) to search within.
+
+        values : int or np.ndarray
+            The time value(s) to search for.
+
+        Returns
+        -------
+        keys : np.ndarray
+            The key of each value within its group.
+        """
+        values = np.clip(values, self.base, self.base + self.span - 1)
+        return np.asarray(values - self.base + group * self.span, dtype=np.int64)
+
+    def get_group(self, track, pitch, exclude=None):
+        """
+        Get the sorted onsets and running max offsets of a (track, pitch)
+        group.
+
+        Parameters
+        ----------
+        track : int
+            The track of the group.
+
+        pitch : int
+            The pitch of the group.
+
+        exclude : int
+            The index of a note to leave out of the group, if any.
+
+        Returns
+        -------
+        onset : np.ndarray
+            The onsets of the notes in the group, in ascending order.
+
+        max_offset : np.ndarray
+            For each note in onset, the maximum offset of it and all notes
+            before it.
+        """
+        group = self.groups.get((int(track), int(pitch)))
+        if group is None:
+            return self.onset[:0], self.max_offset[:0]
+        start, end = self.group_starts[group], self.group_ends[group]
+        if exclude is not None and start <= self.position[exclude] < end:
+            position = self.position[exclude]
+            onset = np.delete(self.onset[start:end], position - start)
+            offset = np.delete(self.offset[start:end], position - start)
+            return onset, np.maximum.accumulate(offset)
+        return self.onset[start:end], self.max_offset[start:end]
+
+    def collides(self, track, pitch, onset, offset, exclude=None):
+        """
+        Check whether the range [onset, offset) would overlap any note on the
+        given track and pitch.
+
+        Parameters
+        ----------
+        track : int
+            The track to check.
+
+        pitch : int
+            The pitch to check.
+
+        onset : int or np.ndarray
+            The onset time(s) to check.
+
+        offset : int or np.ndarray
+            The offset time(s) to check, of the same shape as onset.
+
+        exclude : int
+            The index of a note to ignore, if any.
+
+        Returns
+        -------
+        collides : boolean or np.ndarray
+            True for each range which overlaps some note. False otherwise.
+        """
+        group_onset, max_offset = self.get_group(track, pitch, exclude=exclude)
+        # Notes [first, stop) are those which could overlap the range. The
+        # note at first ends after onset, so these overlap if non-empty.
+        stop = np.searchsorted(group_onset, offset, side="left")
+        first = np.searchsorted(max_offset, onset, side="right")
+        return first < stop
+
+    def max_offset_before(self, track, pitch, time, exclude=None):
+        """
+        Get the latest offset of the notes on the given track and pitch which
+        begin before the given time.
+
+        Returns
+        -------
+        max_offset : int or float
+            The latest such offset, or -np.inf if there are no such notes.
+        """
+        group_onset, max_offset = self.get_group(track, pitch, exclude=exclude)
+        stop = np.searchsorted(group_onset, time, side="left")
+        return max_offset[stop - 1] if stop > 0 else -np.inf
+
+    def min_onset_after(self, track, pitch, time, exclude=None):
+        """
+        Get the earliest onset of the notes on the given track and pitch which
+        end after the given time.
+
+        Returns
+        -------
+        min_onset : int or float
+            The earliest such onset, or np.inf if there are no such notes.
+        """
+        group_onset, max_offset = self.get_group(track, pitch, exclude=exclude)
+        first = np.searchsorted(max_offset, time, side="right")
+        return group_onset[first] if first < len(group_onset) else np.inf
+
+    def free_onsets(self, track, pitch, dur, low, high, exclude=None):
+        """
+        Find the onset times within [low, high) at which a note of the given
+        duration could be placed on the given track and pitch without
+        overlapping any other note.
+
+        Parameters
+        ----------
+        track : int
+            The track of the note.
+
+        pitch : int
+            The pitch of the note.
+
+        dur : int
+            The duration of the note.
+
+        low : int
+            The earliest allowed onset.
+
+        high : int
+            One past the latest allowed onset.
+
+        exclude : int
+            The index of a note to ignore, if any.
+
+        Returns
+        -------
+        ranges : list(tuple)
+            A sorted list of disjoint [min, max) onset ranges.
+        """
+        if low >= high:
+            return []
+        group_onset, max_offset = self.get_group(track, pitch, exclude=exclude)
+
+        # A note of duration dur beginning at o overlaps note j if and only if
+        # onset_j - dur < o < offset_j. The free onsets are therefore the gaps
+        # between (max_offset[k-1], onset[k] - dur].
+        gap_starts = np.append(-np.inf, max_offset)
+        gap_ends = np.append(group_onset - dur + 1, np.inf)
+        gap_starts = np.maximum(gap_starts, low)
+        gap_ends = np.minimum(gap_ends, high)
+        valid = gap_starts < gap_ends
+        return list(zip(gap_starts[valid].tolist(), gap_ends[valid].tolist()))
+
+    def count_overlaps(self, group, onset, offset, exclude=None):
+        """
+        Count the notes of the given groups which overlap the given ranges.
+
+        A note overlaps [onset, offset) exactly when it begins before offset,
+        and does not end at or before onset. Both of these can be counted with
+        a single searchsorted over all groups at once.
+
+        Parameters
+        ----------
+        group : int or np.ndarray
+            The group id of each range (see groups), or -1 for a (track, pitch)
+            with no notes.
+
+        onset : int or np.ndarray
+            The onset time of each range.
+
+        offset : int or np.ndarray
+            The offset time of each range.
+
+        exclude : int or np.ndarray
+            The index of a note to ignore for each range, if any. It must be
+            in the given group.
+
+        Returns
+        -------
+        counts : np.ndarray
+            The number of notes overlapping each range.
+        """
+        group, onset, offset = np.broadcast_arrays(group, onset, offset)
+        has_group = group >= 0
+        group = np.where(has_group, group, 0)
+        if len(self.onset) == 0:
+            return np.zeros(group.shape, dtype=int)
+
+        start = self.group_starts[group]
+        began = (
+            np.searchsorted(self.onset_keys, self.group_keys(group, offset), "left")
+            - start
+        )
+        ended = (
+            np.searchsorted(self.offset_keys, self.group_keys(group, onset), "right")
+            - start
+        )
+        counts = np.where(has_group, began - ended, 0)
+
+        # An empty range [t, t) counts the zero-duration notes at t as having
+        # ended without having begun, so add those back
+        empty = has_group & (offset == onset)
+        if np.any(empty) and len(self.zero_keys) > 0:
+            keys = self.group_keys(group, onset)
+            counts += np.where(
+                empty,
+                np.searchsorted(self.zero_keys, keys, "right")
+                - np.searchsorted(self.zero_keys, keys, "left"),
+                0,
+            )
+
+        if exclude is not None:
+            position = self.position[exclude]
+            counts -= (self.onset[position] < offset) & (self.offset[position] > onset)
+        return counts
+
+    def earliest_free_onsets(self):
+        """
+        For every note, find the earliest onset time it could be given (with
+        its offset unchanged) without overlapping another note of its group.
+
+        Returns
+        -------
+        onsets : np.ndarray
+            For each note, the latest offset of any other note of its group
+            which begins before it ends, or -np.inf if there is none. If this
+            is not before the note's offset, some value at least its offset
+            is returned instead (the note cannot be given any new onset).
+        """
+        if len(self.onset) == 0:
+            return np.empty(0)
+        start = self.group_starts[self.note_group]
+
+        # The notes which begin before this one ends (excluding itself, which
+        # is only among them if it has a positive duration) must all end
+        # before the new onset: that is the k-th earliest offset.
+        k = (
+            np.searchsorted(
+                self.onset_keys,
+                self.group_keys(self.note_group, self.offset),
+                "left",
+            )
+            - start
+            - (self.onset < self.offset)
+        )
+        own = self.offset_position - start
+        index = start + np.maximum(k - 1, 0) + (k - 1 >= own)
+        index = np.minimum(index, len(self.onset) - 1)
+        onsets = np.where(k > 0, self.sorted_offset[index], -np.inf)
+        return onsets[self.position]
+
+    def latest_free_offsets(self):
+        """
+        For every note, find the latest offset time it could be given (with
+        its onset unchanged) without overlapping another note of its group.
+
+        Returns
+        -------
+        offsets : np.ndarray
+            For each note, the earliest onset of any other note of its group
+            which ends after it begins, or np.inf if there is none. If this
+            is not after the note's onset, some value at most its onset is
+            returned instead (the note cannot be given any new offset).
+        """
+        if len(self.onset) == 0:
+            return np.empty(0)
+        start = self.group_starts[self.note_group]
+        size = self.group_ends[self.note_group] - start
+
+        # The notes which end at or before this one begins (excluding itself,
+        # which is only among them if it has zero duration) are skipped. The
+        # next note by onset must begin after the new offset.
+        k = (
+            np.searchsorted(
+                self.offset_keys,
+                self.group_keys(self.note_group, self.onset),
+                "right",
+            )
+            - start
+            - (self.offset <= self.onset)
+        )
+        own = np.arange(len(self.onset)) - start
+        index = np.minimum(start + k + (k >= own), len(self.onset) - 1)
+        offsets = np.where(k < size - 1, self.onset[index], np.inf)
+        return offsets[self.position]
+
+    def insert_gaps(self, dur, low, high):
+        """
+        Find, for every group, the onset times within [low, high) at which a
+        new note of the given duration could be placed without overlapping
+        any note.
+
+        Parameters
+        ----------
+        dur : int
+            The duration of the new note.
+
+        low : int
+            The earliest allowed onset.
+
+        high : int
+            One past the latest allowed onset.
+
+        Returns
+        -------
+        group : np.ndarray
+            The group id of each gap.
+
+        start : np.ndarray
+            The first valid onset of each gap.
+
+        end : np.ndarray
+            One past the last valid onset of each gap. Only non-empty gaps
+            are returned.
+        """
+        # The gap before each note, and after the last note of each group
+        new_group = np.zeros(len(self.onset), dtype=bool)
+        new_group[self.group_starts] = True
+        prev_max = np.append(-np.inf, self.max_offset[:-1])
+        group = np.append(self.note_group, np.arange(len(self.group_starts)))
+        start = np.append(
+            np.where(new_group, -np.inf, prev_max),
+            self.max_offset[self.group_ends - 1],
+        )
+        end = np.append(self.onset - dur + 1, np.full(len(self.group_starts), np.inf))
+
+        start = np.maximum(start, low)
+        end = np.minimum(end, high)
+        valid = start < end
+        return group[valid], start[valid], end[valid]
+
+    def move_gaps(self, dur, low, high):
+        """
+        Find, for every note, the onset times within [low, high) to which it
+        could be moved (given a duration) without overlapping any other note.
+
+        For a note with k other notes in its group, the valid onsets are those
+        at which, for some i, exactly i of the other notes have ended and
+        exactly i have begun before the moved note ends. That is, the gaps
+        between the i-th earliest offset and the (i+1)-th earliest onset.
+
+        Parameters
+        ----------
+        dur : int or np.ndarray
+            The duration of each note once moved.
+
+        low : int or np.ndarray
+            The earliest allowed onset for each note.
+
+        high : int or np.ndarray
+            One past the latest allowed onset for each note.
+
+        Returns
+        -------
+        note : np.ndarray
+            The index of the note of each gap.
+
+        start : np.ndarray
+            The first valid onset of each gap.
+
+        end : np.ndarray
+            One past the last valid onset of each gap. Only non-empty gaps
+            are returned.
+        """
+        num_notes = len(self.onset)
+        dur, low, high = (
+            np.broadcast_to(values, num_notes)[self.order]
+            for values in (dur, low, high)
+        )
+
+        # One gap per note in the group, for each note
+        start = self.group_starts[self.note_group]
+        size = self.group_ends[self.note_group] - start
+        note = np.repeat(np.arange(num_notes), size)
+        i = np.arange(size.sum()) - np.repeat(np.cumsum(size) - size, size)
+        start, size = start[note], size[note]
+
+        # The (i+1)-th earliest other onset, skipping the note itself
+        own = note - start
+        next_onset = self.onset[np.minimum(start + i + (i >= own), num_notes - 1)]
+        next_onset = np.where(i == size - 1, np.inf, next_onset)
+
+        # The i-th earliest other offset, skipping the note itself
+        own = self.offset_position[note] - start
+        prev = np.maximum(i - 1, 0)
+        prev_offset = self.sorted_offset[
+            np.minimum(start + prev + (prev >= own), num_notes - 1)
+        ]
+        zero_dur = dur[note] == 0
+        if np.any(zero_dur) and len(self.zero_keys) > 0:
+            # A moved note of zero duration doesn't overlap a zero-duration
+            # note at its onset, which has ended but not begun by then. Such
+            # notes instead end one unit later, when they have also begun.
+            late_offset = self.offset + (self.onset == self.offset)
+            offset_order = np.lexsort((late_offset, self.note_group))
+            offset_position = np.empty_like(offset_order)
+            offset_position[offset_order] = np.arange(num_notes)
+            own = offset_position[note] - start
+            prev_offset = np.where(
+                zero_dur,
+                late_offset[offset_order][
+                    np.minimum(start + prev + (prev >= own), num_notes - 1)
+                ],
+                prev_offset,
+            )
+        prev_offset = np.where(i == 0, -np.inf, prev_offset)
+
+        gap_start = np.maximum(prev_offset, low[note])
+        gap_end = np.minimum(next_onset - dur[note] + 1, high[note])
+        valid = gap_start < gap_end
+        return self.order[note[valid]], gap_start[valid], gap_end[valid]
+
+
+class NoteArrayBatch:
+    """
+    A batch of excerpts, stored as a single ragged NoteArray buffer.
+
+    The notes of all excerpts are concatenated into `notes`, and excerpt i
+    is made up of the notes at positions offsets[i] to offsets[i + 1]. This
+    lets operations be run over every excerpt of a batch at once.
+    """
+
+    __slots__ = ("notes", "offsets")
+
+    def __init__(self, notes, offsets):
+        """
+        Create a new NoteArrayBatch around the given buffer.
+
+        Parameters
+        ----------
+        notes : NoteArray
+            The notes of every excerpt, concatenated in order.
+
+        offsets : np.ndarray
+            An int array of length (num_excerpts + 1), containing the position
+            in notes at which each excerpt begins, followed by len(notes).
+        """
+        self.notes = notes
+        self.offsets = offsets
+
+    @classmethod
+    def from_excerpts(cls, excerpts):
+        """
+        Create a new NoteArrayBatch from the given excerpts.
+
+        Parameters
+        ----------
+        excerpts : iterable(pd.DataFrame or NoteArray)
+            The excerpts to include in the batch, in order.
+
+        Returns
+        -------
+        batch : NoteArrayBatch
+            A batch containing a copy of the notes of each excerpt.
+        """
+        note_arrays = [NoteArray.from_df(excerpt) for excerpt in excerpts]
+        lengths = [len(note_array) for note_array in note_arrays]
+        offsets = np.zeros(len(lengths) + 1, dtype=NOTE_ARRAY_DTYPE)
+        np.cumsum(lengths, out=offsets[1:])
+        if note_arrays:
+            data = np.concatenate(
+                [note_array.data for note_array in note_arrays], axis=1
+            )
+        else:
+            data = np.empty((len(NOTE_DF_SORT_ORDER), 0), dtype=NOTE_ARRAY_DTYPE)
+        return cls(NoteArray(data), offsets)
+
+    @property
+    def lengths(self):
+        """The number of notes in each excerpt."""
+        return np.diff(self.offsets)
+
+    @property
+    def excerpt_ids(self):
+        """The index of the excerpt to which each note belongs."""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        """
+        Returns
+        -------
+        excerpt : NoteArray
+            The notes of the excerpt at the given index. This is a view into
+            the batch buffer, and should be copied before being edited.
+        """
+        return self.notes[self.offsets[index] : self.offsets[index + 1]]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def sort(self):
+        """
+        Returns
+        -------
+        batch : NoteArrayBatch
+            A new batch with the notes of each excerpt sorted by onset,
+            track, pitch, and then dur.
+        """
+        data = self.notes.data
+        order = np.lexsort(np.vstack((data[::-1], self.excerpt_ids)))
+        return NoteArrayBatch(NoteArray(data[:, order]), self.offsets)
+
+
+def sample_excerpts(
+    note_df,
+    n,
+    excerpt_length=5000,
+    min_notes=10,
+    overlap_policy="allow",
+    seed=None,
+):
+    """
+    Draw n random excerpts from a piece at once. The number of notes in the
+    window beginning at every note is counted in a single searchsorted pass
+    (see df_utils.ExcerptSampler), and the windows are drawn from those with
+    at least min_notes notes.
+
+    Parameters
+    ----------
+    note_df : pd.DataFrame or NoteArray
+        The piece from which to draw excerpts.
+
+    n : int
+        The number of excerpts to draw.
+
+    excerpt_length : int
+        The length of each excerpt, in ms. All notes which onset within this
+        amount of time after the first note are included in the excerpt.
+
+    min_notes : int
+        The minimum number of notes that must be contained in an excerpt.
+
+    overlap_policy : string
+        One of df_utils.EXCERPT_OVERLAP_POLICIES: "allow" to draw each excerpt
+        independently, "distinct" to never draw the same excerpt twice, or
+        "disjoint" to draw excerpts which share no notes.
+
+    seed : int, np.random.Generator, or None
+        A seed (or Generator) to be supplied to get_random_generator().
+
+    Returns
+    -------
+    excerpts : list(NoteArray)
+        The excerpts, in order of their first note. Their onsets are not
+        shifted. Each is a view into the piece's notes (sorted by onset), so
+        if the piece is a clean note_df, no note data is copied, and
+        excerpts should be copied before being edited. Fewer than n excerpts
+        are returned if there are not enough to draw from.
+    """
+    if isinstance(note_df, NoteArray):
+        note_df = note_df.to_df()
+    sampler = ExcerptSampler(
+        note_df, min_notes=min_notes, excerpt_length=excerpt_length
+    )
+    starts, ends = sampler.sample_windows(n, overlap_policy=overlap_policy, seed=seed)
+    notes = NoteArray.from_df(sampler.note_df)
+    return [notes[start:end] for start, end in zip(starts, ends)]
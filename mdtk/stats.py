@@ -0,0 +1,209 @@
+"""A collector of statistics about degradations (attempts, successes, failures,
+retries, and latencies), which can be passed to a Degrader or to any of the
+functions in degradations.DEGRADATIONS."""
+import json
+from bisect import bisect_right
+
+# Upper edges (in microseconds) of the latency histogram bins. The last bin
+# holds every latency above the last edge.
+LATENCY_BIN_EDGES_US = [2**power for power in range(25)]
+
+
+class DegradationStats:
+    """A DegradationStats object counts, for each degradation, how many times
+    it was attempted, succeeded, and failed, along with histograms of its
+    latency and (for degradations performed by a Degrader) of the number of
+    failed attempts that preceded it on the same excerpt.
+
+    Collectors from different workers (threads or processes) can be combined
+    with merge, or rebuilt from the output of to_dict with from_dict."""
+
+    def __init__(self):
+        """
+        Create a new, empty collector.
+        """
+        self.degradations = {}
+        self.degrade_calls = 0
+        self.clean = 0
+        self.all_failed = 0
+
+    def get_degradation(self, name):
+        """
+        Get the counts of a degradation, creating them if necessary.
+
+        Parameters
+        ----------
+        name : string
+            The name of the degradation.
+
+        Returns
+        -------
+        counts : dict
+            The attempts, successes, failures, latency_hist, and
+            retry_depth_hist of the degradation. latency_hist[i] counts the
+            attempts whose latency was below LATENCY_BIN_EDGES_US[i] (and not
+            below the previous edge). retry_depth_hist[i] counts the
+            successes which followed i failed attempts.
+        """
+        if name not in self.degradations:
+            self.degradations[name] = {
+                "attempts": 0,
+                "successes": 0,
+                "failures": 0,
+                "latency_hist": [0] * (len(LATENCY_BIN_EDGES_US) + 1),
+                "retry_depth_hist": [],
+            }
+        return self.degradations[name]
+
+    def record_attempt(self, name, success, seconds):
+        """
+        Record one attempt of a degradation.
+
+        Parameters
+        ----------
+        name : string
+            The name of the degradation.
+
+        success : boolean
+            True if the degradation succeeded. False if it returned None.
+
+        seconds : float
+            The latency of the attempt, in seconds.
+        """
+        counts = self.get_degradation(name)
+        counts["attempts"] += 1
+        counts["successes" if success else "failures"] += 1
+        counts["latency_hist"][bisect_right(LATENCY_BIN_EDGES_US, seconds * 1e6)] += 1
+
+    def record_degrade(self, name, retry_depth):
+        """
+        Record the outcome of one Degrader.degrade call.
+
+        Parameters
+        ----------
+        name : string
+            The name of the degradation that was performed, or None if the
+            excerpt was left clean (on purpose, if retry_depth is 0, or
+            because every degradation failed).
+
+        retry_depth : int
+            The number of failed attempts before the degradation succeeded
+            (or before giving up).
+        """
+        self.degrade_calls += 1
+        if name is None:
+            if retry_depth == 0:
+                self.clean += 1
+            else:
+                self.all_failed += 1
+            return
+
+        hist = self.get_degradation(name)["retry_depth_hist"]
+        if len(hist) <= retry_depth:
+            hist.extend([0] * (retry_depth + 1 - len(hist)))
+        hist[retry_depth] += 1
+
+    def merge(self, other):
+        """
+        Add the counts of another collector into this one.
+
+        Parameters
+        ----------
+        other : DegradationStats
+            The collector to merge into this one. It is not changed.
+
+        Returns
+        -------
+        self : DegradationStats
+            This collector, after merging.
+        """
+        self.degrade_calls += other.degrade_calls
+        self.clean += other.clean
+        self.all_failed += other.all_failed
+        for name, other_counts in other.degradations.items():
+            counts = self.get_degradation(name)
+            for key in ["attempts", "successes", "failures"]:
+                counts[key] += other_counts[key]
+            for key in ["latency_hist", "retry_depth_hist"]:
+                hist, other_hist = counts[key], other_counts[key]
+                if len(hist) < len(other_hist):
+                    hist.extend([0] * (len(other_hist) - len(hist)))
+                for index, count in enumerate(other_hist):
+                    hist[index] += count
+        return self
+
+    def to_dict(self):
+        """
+        Export the collected statistics.
+
+        Returns
+        -------
+        stats : dict
+            A json-serializable dict of the statistics, including the
+            latency_bin_edges_us, and for each degradation its failure_rate.
+        """
+        degradations = {}
+        for name, counts in self.degradations.items():
+            degradations[name] = {
+                "attempts": counts["attempts"],
+                "successes": counts["successes"],
+                "failures": counts["failures"],
+                "failure_rate": counts["failures"] / max(counts["attempts"], 1),
+                "latency_hist": list(counts["latency_hist"]),
+                "retry_depth_hist": list(counts["retry_depth_hist"]),
+            }
+        return {
+            "degrade_calls": self.degrade_calls,
+            "clean": self.clean,
+            "all_failed": self.all_failed,
+            "latency_bin_edges_us": list(LATENCY_BIN_EDGES_US),
+            "degradations": degradations,
+        }
+
+    def to_json(self, **kwargs):
+        """
+        Export the collected statistics as a json string.
+
+        Parameters
+        ----------
+        kwargs
+            Keyword arguments for json.dumps.
+
+        Returns
+        -------
+        json_str : string
+            The output of to_dict, as json.
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_dict(cls, stats_dict):
+        """
+        Create a collector from the output of to_dict.
+
+        Parameters
+        ----------
+        stats_dict : dict
+            Statistics, as returned by to_dict.
+
+        Returns
+        -------
+        stats : DegradationStats
+            A new collector with the given statistics.
+        """
+        assert (
+            stats_dict["latency_bin_edges_us"] == LATENCY_BIN_EDGES_US
+        ), "Statistics were collected with different latency bins."
+        stats = cls()
+        stats.degrade_calls = stats_dict["degrade_calls"]
+        stats.clean = stats_dict["clean"]
+        stats.all_failed = stats_dict["all_failed"]
+        for name, counts in stats_dict["degradations"].items():
+            stats.degradations[name] = {
+                "attempts": counts["attempts"],
+                "successes": counts["successes"],
+                "failures": counts["failures"],
+                "latency_hist": list(counts["latency_hist"]),
+                "retry_depth_hist": list(counts["retry_depth_hist"]),
+            }
+        return stats
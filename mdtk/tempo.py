@@ -0,0 +1,205 @@
+"""A vectorized tempo map, for working with note_dfs in symbolic time units
+(MIDI ticks or beat subdivisions) and converting them to milliseconds only
+when needed."""
+import numpy as np
+
+# The number of milliseconds in a minute, for tempos in quarter notes per minute
+MS_PER_MINUTE = 60000
+
+
+class TempoMap:
+    """A TempoMap converts times between symbolic units (a fixed number of
+    units per quarter note, such as MIDI ticks) and milliseconds, for a piece
+    whose tempo may change at any number of points.
+
+    note_dfs in symbolic units can be degraded and formatted exactly like
+    note_dfs in milliseconds (every time is an integer). Note that the
+    default arguments of the degradations (min_shift, min_duration, etc.)
+    are given in milliseconds, so they should be scaled to the chosen units
+    (for example with units_per_ms)."""
+
+    def __init__(self, change_units, tempos, resolution):
+        """
+        Create a new tempo map.
+
+        Parameters
+        ----------
+        change_units : list(number)
+            The time (in units) of each tempo change, in ascending order. The
+            first tempo is also used before the first change.
+
+        tempos : list(float)
+            The tempo after each change, in quarter notes per minute.
+
+        resolution : int
+            The number of units per quarter note.
+        """
+        change_units = np.asarray(change_units, dtype=float)
+        tempos = np.asarray(tempos, dtype=float)
+        assert len(change_units) > 0, "A tempo map needs at least one tempo."
+        assert len(change_units) == len(
+            tempos
+        ), "change_units and tempos must have the same length."
+        assert np.all(np.diff(change_units) >= 0), "change_units must be sorted."
+        assert np.all(tempos > 0), "tempos must be positive."
+        assert resolution > 0, "resolution must be positive."
+
+        self.change_units = change_units
+        self.tempos = tempos
+        self.resolution = resolution
+        self.ms_per_unit = MS_PER_MINUTE / (tempos * resolution)
+        self.change_ms = np.cumsum(
+            np.diff(change_units, prepend=0)
+            * np.append(self.ms_per_unit[0], self.ms_per_unit[:-1])
+        )
+
+    @classmethod
+    def from_pretty_midi(cls, midi, resolution=None):
+        """
+        Create the tempo map of a MIDI file.
+
+        Parameters
+        ----------
+        midi : pretty_midi.PrettyMIDI
+            The parsed MIDI file.
+
+        resolution : int
+            The number of units per quarter note. None uses the resolution
+            of the MIDI file, so that units are MIDI ticks.
+
+        Returns
+        -------
+        tempo_map : TempoMap
+            The tempo map of the MIDI file.
+        """
+        if resolution is None:
+            resolution = midi.resolution
+        times, tempos = midi.get_tempo_changes()
+        ticks = np.array([midi.time_to_tick(time) for time in times], dtype=float)
+        return cls(ticks * resolution / midi.resolution, tempos, resolution)
+
+    def change_indices(self, values, change_values):
+        """
+        Find the tempo in effect at each of the given times.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            The times to look up.
+
+        change_values : np.ndarray
+            The time of each tempo change, in the same units as values
+            (either self.change_units or self.change_ms).
+
+        Returns
+        -------
+        indices : np.ndarray
+            The index of the tempo change in effect at each time.
+        """
+        return np.maximum(np.searchsorted(change_values, values, side="right") - 1, 0)
+
+    def units_to_ms(self, units):
+        """
+        Convert times from units to milliseconds.
+
+        Parameters
+        ----------
+        units : number or np.ndarray
+            The times to convert, in units.
+
+        Returns
+        -------
+        ms : float or np.ndarray
+            The given times, in (unrounded) milliseconds.
+        """
+        units = np.asarray(units, dtype=float)
+        index = self.change_indices(units, self.change_units)
+        return (
+            self.change_ms[index]
+            + (units - self.change_units[index]) * self.ms_per_unit[index]
+        )
+
+    def ms_to_units(self, ms):
+        """
+        Convert times from milliseconds to units.
+
+        Parameters
+        ----------
+        ms : number or np.ndarray
+            The times to convert, in milliseconds.
+
+        Returns
+        -------
+        units : float or np.ndarray
+            The given times, in (unrounded) units.
+        """
+        ms = np.asarray(ms, dtype=float)
+        index = self.change_indices(ms, self.change_ms)
+        return self.change_units[index] + (ms - self.change_ms[index]) / (
+            self.ms_per_unit[index]
+        )
+
+    def units_per_ms(self, time=0):
+        """
+        Get the number of units per millisecond at the given time, for
+        example to scale degradation arguments given in milliseconds.
+
+        Parameters
+        ----------
+        time : number
+            The time (in units) at which to get the tempo.
+
+        Returns
+        -------
+        units_per_ms : float
+            The number of units per millisecond at the given time.
+        """
+        return 1 / self.ms_per_unit[self.change_indices(time, self.change_units)]
+
+    def to_ms(self, note_df):
+        """
+        Convert a note_df from units to milliseconds. Onset and offset times
+        are each rounded to the nearest millisecond.
+
+        Parameters
+        ----------
+        note_df : pd.DataFrame
+            A note_df whose times are in units.
+
+        Returns
+        -------
+        ms_df : pd.DataFrame
+            A copy of the note_df, with times in milliseconds.
+        """
+        onset = np.round(self.units_to_ms(note_df["onset"].to_numpy()))
+        offset = np.round(
+            self.units_to_ms((note_df["onset"] + note_df["dur"]).to_numpy())
+        )
+        ms_df = note_df.copy()
+        ms_df["onset"] = onset.astype("int64")
+        ms_df["dur"] = (offset - onset).astype("int64")
+        return ms_df
+
+    def to_units(self, note_df):
+        """
+        Convert a note_df from milliseconds to units. Onset and offset times
+        are each rounded to the nearest unit.
+
+        Parameters
+        ----------
+        note_df : pd.DataFrame
+            A note_df whose times are in milliseconds.
+
+        Returns
+        -------
+        units_df : pd.DataFrame
+            A copy of the note_df, with times in units.
+        """
+        onset = np.round(self.ms_to_units(note_df["onset"].to_numpy()))
+        offset = np.round(
+            self.ms_to_units((note_df["onset"] + note_df["dur"]).to_numpy())
+        )
+        units_df = note_df.copy()
+        units_df["onset"] = onset.astype("int64")
+        units_df["dur"] = (offset - onset).astype("int64")
+        return units_df
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from mdtk import accel
+
+KERNELS = [
+    "split_note_times",
+    "pitch_overlap_offsets",
+    "pianoroll_frames",
+    "pianoroll_notes",
+]
+
+
+def sort_notes(notes):
+    order = np.lexsort(notes[::-1])
+    return tuple(column[order] for column in notes)
+
+
+def assert_equal_outputs(loop_res, numpy_res, msg=""):
+    if not isinstance(loop_res, tuple):
+        loop_res, numpy_res = (loop_res,), (numpy_res,)
+    assert len(loop_res) == len(numpy_res), msg
+    for loop_val, numpy_val in zip(loop_res, numpy_res):
+        assert np.array_equal(loop_val, numpy_val), f"{msg}\n{loop_val}\n{numpy_val}"
+
+
+def test_backend():
+    for kernel in KERNELS:
+        func = getattr(accel, kernel)
+        if accel.NUMBA_AVAILABLE:
+            assert func is getattr(accel, f"{kernel}_loop")
+        elif kernel != "split_note_times":
+            assert func is getattr(accel, f"{kernel}_numpy")
+
+
+@pytest.mark.parametrize("num_splits", [1, 2, 3, 7])
+def test_split_note_times(num_splits):
+    for onset in range(0, 30, 7):
+        for dur in range(num_splits + 1, 60):
+            loop_res = accel.split_note_times_loop(onset, dur, num_splits)
+            numpy_res = accel.split_note_times_numpy(onset, dur, num_splits)
+            assert loop_res[0] == numpy_res[0]
+            assert_equal_outputs(loop_res[1:], numpy_res[1:], f"{onset, dur}")
+
+            first_dur, onsets, durs = loop_res
+            assert len(onsets) == len(durs) == num_splits
+            assert abs(onsets[0] - (onset + first_dur)) <= 1
+            assert onsets[-1] + durs[-1] == onset + dur, "Split notes too long."
+            assert np.all(onsets[1:] == onsets[:-1] + durs[:-1])
+
+
+def test_pitch_overlap_offsets():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        num_notes = rng.integers(1, 50)
+        onset = np.sort(rng.integers(0, 500, num_notes))
+        offset = onset + rng.integers(0, 100, num_notes)
+        num_groups = rng.integers(1, 5)
+        groups = rng.integers(0, num_groups, num_notes)
+
+        loop_res = accel.pitch_overlap_offsets_loop(onset, offset, groups, num_groups)
+        numpy_res = accel.pitch_overlap_offsets_numpy(onset, offset, groups, num_groups)
+        assert_equal_outputs(loop_res, numpy_res)
+
+        for group in range(num_groups):
+            indices = np.flatnonzero(groups == group)
+            assert np.all(
+                loop_res[indices[:-1]] <= onset[indices[1:]]
+            ), "Overlaps not removed."
+
+    # Float times are kept
+    onset = np.array([0.5, 1.0])
+    offset = np.array([2.5, 1.5])
+    res = accel.pitch_overlap_offsets_numpy(onset, offset, np.zeros(2, dtype=int), 1)
+    assert_equal_outputs(res, np.array([1.0, 2.5]))
+
+
+def test_pianoroll_frames():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        num_notes = rng.integers(1, 30)
+        onset = rng.integers(0, 40, num_notes)
+        offset = onset + rng.integers(1, 10, num_notes)
+        pitch = rng.integers(0, 10, num_notes)
+        args = (onset, offset, pitch, offset.max() + rng.integers(0, 3), 10)
+
+        loop_res = accel.pianoroll_frames_loop(*args)
+        numpy_res = accel.pianoroll_frames_numpy(*args)
+        assert_equal_outputs(loop_res, numpy_res)
+        assert np.all(loop_res[0][loop_res[1]]), "Onsets not sustained."
+
+
+@pytest.mark.parametrize("sustain_onsets", [True, False])
+def test_pianoroll_notes(sustain_onsets):
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        shape = (rng.integers(1, 20), rng.integers(1, 6))
+        note_pr = rng.random(shape) < 0.5
+        onset_counts = rng.integers(0, 3, shape) * (rng.random(shape) < 0.3)
+        check_sustain = rng.random(shape[0]) < 0.8
+
+        loop_res = accel.pianoroll_notes_loop(
+            note_pr, onset_counts, check_sustain, sustain_onsets
+        )
+        numpy_res = accel.pianoroll_notes_numpy(
+            note_pr, onset_counts, check_sustain, sustain_onsets
+        )
+        assert_equal_outputs(sort_notes(loop_res), sort_notes(numpy_res))
+
+        onsets, pitches, offsets = loop_res
+        assert np.all(onsets <= offsets)
+        assert len(onsets) >= onset_counts.sum()
+
+    # Round trip
+    onset = np.array([0, 0, 3, 5, 5])
+    offset = np.array([2, 4, 5, 6, 9])
+    pitch = np.array([0, 1, 0, 0, 2])
+    note_pr, onset_pr = accel.pianoroll_frames(onset, offset, pitch, 9, 3)
+    res = accel.pianoroll_notes(
+        note_pr, onset_pr.astype(np.int64), np.ones(9, dtype=bool), sustain_onsets
+    )
+    assert_equal_outputs(sort_notes(res), (onset, pitch, offset))
@@ -0,0 +1,57 @@
+import json
+
+from mdtk.benchmarks import __main__ as benchmarks_main
+from mdtk.benchmarks.accel import KERNELS, load_pieces, run_accel_benchmarks
+from mdtk.benchmarks.degradations import DEGRADER_NAME, make_excerpt, run_benchmarks
+from mdtk.degradations import DEGRADATIONS
+
+
+def test_make_excerpt():
+    excerpt = make_excerpt(100, polyphony=4, num_tracks=2, seed=0)
+    assert 0 < len(excerpt) <= 100
+    assert set(excerpt.track) <= {0, 1}
+    assert excerpt.equals(make_excerpt(100, polyphony=4, num_tracks=2, seed=0))
+
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks(sizes=[5, 20], polyphonies=[2], num_excerpts=2, repeats=2)
+    assert len(results) == 2 * (len(DEGRADATIONS) + 1)
+    assert {result["degradation"] for result in results} == set(DEGRADATIONS) | {
+        DEGRADER_NAME
+    }
+    for result in results:
+        assert result["calls"] == 4
+        assert result["ops_per_sec"] > 0
+        assert 0 <= result["p50_ms"] <= result["p99_ms"]
+        assert 0 <= result["failure_rate"] <= 1
+        assert result["peak_memory_bytes"] >= 0
+
+    output = tmp_path / "results.json"
+    benchmarks_main.main(
+        ["-o", str(output), "--sizes", "5", "--num-excerpts", "1", "--repeats", "1"]
+        + ["--degradations", "remove_note", "--no-degrader", "--note-array"]
+    )
+    with open(output, "r") as file:
+        output = json.load(file)
+    assert len(output["results"]) == 2
+    assert output["metadata"]["args"]["sizes"] == [5]
+
+
+def test_run_accel_benchmarks(tmp_path):
+    pieces = load_pieces(num_pieces=2, num_notes=200)
+    assert len(pieces) == 2
+    results = run_accel_benchmarks(pieces, repeats=2, backends=["numpy"])
+    assert len(results) == 2 * len(KERNELS)
+    for result in results:
+        assert result["calls"] == 2
+        assert result["backend"] == "numpy"
+        assert result["num_notes"] == len(pieces[result["piece"]])
+
+    output = tmp_path / "results.json"
+    benchmarks_main.main(
+        ["-o", str(output), "--accel", "--num-pieces", "1", "--repeats", "1"]
+        + ["--kernels", "pianoroll_frames"]
+    )
+    with open(output, "r") as file:
+        output = json.load(file)
+    assert {result["kernel"] for result in output["results"]} == {"pianoroll_frames"}
@@ -1,3 +1,4 @@
+import inspect
 import itertools
 
 import numpy as np
@@ -5,6 +6,8 @@ import pandas as pd
 import pytest
 
 import mdtk.degradations as deg
+from mdtk.df_utils import clean_df, is_canonical
+from mdtk.note_array import NoteArray, NoteArrayBatch, overlapping_pairs
 
 EMPTY_DF = pd.DataFrame({"onset": [], "track": [], "pitch": [], "dur": []})
 
@@ -207,7 +210,7 @@ def test_pitch_shift(caplog):
                 {
                     "onset": [0, 100, 200, 200],
                     "track": [0, 1, 0, 1],
-                    "pitch": [10, 33, 30, 40],
+                    "pitch": [10, 20, 24, 40],
                     "dur": [100, 100, 100, 100],
                 }
             )
@@ -219,11 +222,11 @@ def test_pitch_shift(caplog):
 
             assert not BASIC_DF.equals(res), "Note_df was not copied."
 
-    # Test if tries works
+    # Test with no valid pitches
     df = pd.DataFrame({"onset": [0], "pitch": [10], "track": [0], "dur": [100]})
     res = deg.pitch_shift(df, min_pitch=10, max_pitch=10)
-    assert_none(res, msg="Pitch shift should run out of tries.")
-    assert_warned(caplog, msg=deg.TRIES_WARN_MSG)
+    assert_none(res, msg="Pitch shift with no valid pitches returned something.")
+    assert_warned(caplog, msg="No valid notes to pitch shift. Returning None.")
 
     # Truly random testing
     for i in range(10):
@@ -341,9 +344,9 @@ def test_time_shift(caplog):
 
             basic_res = pd.DataFrame(
                 {
-                    "onset": [0, 200, 200, 200],
-                    "track": [0, 0, 1, 1],
-                    "pitch": [10, 30, 20, 40],
+                    "onset": [0, 76, 100, 200],
+                    "track": [0, 1, 1, 0],
+                    "pitch": [10, 40, 20, 30],
                     "dur": [100, 100, 100, 100],
                 }
             )
@@ -490,10 +493,10 @@ def test_onset_shift(caplog):
 
             basic_res = pd.DataFrame(
                 {
-                    "onset": [0, 72, 100, 200],
-                    "track": [0, 0, 1, 1],
-                    "pitch": [10, 30, 20, 40],
-                    "dur": [100, 228, 100, 100],
+                    "onset": [0, 76, 100, 200],
+                    "track": [0, 1, 1, 0],
+                    "pitch": [10, 40, 20, 30],
+                    "dur": [100, 224, 100, 100],
                 }
             )
 
@@ -758,7 +761,7 @@ def test_offset_shift(caplog):
                     "onset": [0, 100, 200, 200],
                     "track": [0, 1, 0, 1],
                     "pitch": [10, 20, 30, 40],
-                    "dur": [100, 200, 100, 100],
+                    "dur": [276, 100, 100, 100],
                 }
             )
 
@@ -981,10 +984,10 @@ def test_add_note(caplog):
 
         basic_res = pd.DataFrame(
             {
-                "onset": [0, 100, 200, 200, 235],
-                "track": [0, 1, 0, 1, 0],
-                "pitch": [10, 20, 30, 40, 58],
-                "dur": [100, 100, 100, 100, 62],
+                "onset": [0, 100, 188, 200, 200],
+                "track": [0, 1, 1, 0, 1],
+                "pitch": [10, 20, 22, 30, 40],
+                "dur": [100, 100, 108, 100, 100],
             }
         )
 
@@ -1232,10 +1235,10 @@ def test_join_notes(caplog):
 
         join_res = pd.DataFrame(
             {
-                "onset": [0, 100, 200],
-                "track": [0, 0, 1],
-                "pitch": [10, 10, 40],
-                "dur": [100, 200, 100],
+                "onset": [0, 200],
+                "track": [0, 1],
+                "pitch": [10, 40],
+                "dur": [300, 100],
             }
         )
 
@@ -1374,7 +1377,7 @@ def test_join_notes(caplog):
             "dur": [83] + [125] * 10 + [83] + [125] * 3 + [250, 83] + [125] * 4,
         }
     )
-    res = deg.join_notes(excerpt, seed=1)
+    res = deg.join_notes(excerpt, seed=0)
     assert res.equals(correct), (
         "join_notes failed on excerpt with multiple "
         "pitches containing joinable notes." + f"{res}"
@@ -1500,3 +1503,587 @@ def test_join_notes(caplog):
             msg="Joining notes with too large of a gap didn't return None.",
         )
         assert_warned(caplog, msg="No valid notes to join. Returning None.")
+
+
+def test_joinable_chains():
+    excerpt = NoteArray.from_df(
+        pd.DataFrame(
+            {
+                "onset": [0, 0, 100, 150, 200, 300, 500],
+                "track": [0, 1, 0, 1, 0, 0, 0],
+                "pitch": [10, 10, 10, 10, 10, 10, 10],
+                "dur": [100, 100, 50, 50, 100, 100, 100],
+            }
+        )
+    )
+
+    order, starts, lengths = deg.joinable_chains(excerpt, 50, 20)
+    chains = [list(order[s : s + n]) for s, n in zip(starts, lengths)]
+    assert chains == [[0, 2, 4, 5], [2, 4, 5], [4, 5], [1, 3]]
+
+    order, starts, lengths = deg.joinable_chains(excerpt, 50, 3, only_first=True)
+    chains = [list(order[s : s + n]) for s, n in zip(starts, lengths)]
+    assert chains == [[0, 2, 4], [1, 3]]
+
+    order, starts, lengths = deg.joinable_chains(excerpt, 50, 1)
+    assert len(starts) == 0 and len(lengths) == 0
+
+
+def test_random_generator():
+    for deg_fun in deg.DEGRADATIONS.values():
+        res = deg_fun(BASIC_DF, seed=np.random.default_rng(1))
+        seeded_res = deg_fun(BASIC_DF, seed=1)
+        assert (res is None and seeded_res is None) or res.equals(
+            seeded_res
+        ), f"{deg_fun.__name__} differs with a Generator and its seed."
+
+    # Seeded calls don't touch the global random state
+    np.random.seed(0)
+    deg.pitch_shift(BASIC_DF, seed=1)
+    assert np.random.randint(1000) == np.random.RandomState(0).randint(1000)
+
+    # Unseeded calls are reproducible through the global random state
+    np.random.seed(0)
+    res = deg.time_shift(BASIC_DF)
+    np.random.seed(0)
+    assert res.equals(deg.time_shift(BASIC_DF)), "Global seed not reproducible."
+
+
+def test_degradation_plan():
+    excerpt = pd.DataFrame(
+        {
+            "onset": [0, 0, 100, 150, 200, 300, 500],
+            "track": [0, 1, 0, 1, 0, 0, 1],
+            "pitch": [10, 10, 10, 12, 10, 11, 10],
+            "dur": [100, 100, 50, 50, 100, 100, 100],
+        }
+    )
+    original = excerpt.copy()
+    plan = deg.DegradationPlan(excerpt)
+    kwargs = [
+        {},
+        {"align_onset": True},
+        {"align_dur": True},
+        {"align_pitch": True, "align_time": True},
+        {"min_shift": 10, "max_shift": 60},
+        {"distribution": [1, 0, 1]},
+    ]
+
+    for name, deg_fun in deg.DEGRADATIONS.items():
+        params = inspect.signature(deg_fun).parameters
+        for deg_kwargs in kwargs:
+            if any(key not in params for key in deg_kwargs):
+                continue
+            for seed in range(5):
+                res = deg_fun(excerpt, seed=seed, **deg_kwargs)
+                plan_res = plan.degrade(name, seed=seed, **deg_kwargs)
+                assert (res is None and plan_res is None) or res.equals(
+                    plan_res
+                ), f"{name}{deg_kwargs} differs when using a DegradationPlan."
+
+    assert excerpt.equals(original), "DegradationPlan changed the excerpt."
+    assert plan.to_excerpt().equals(original), "to_excerpt changed the excerpt."
+    assert "pitch_index" in plan.tables, "DegradationPlan did not cache tables."
+
+
+def test_canonical_excerpt():
+    rng = np.random.default_rng(0)
+    for num_notes in [20, 1500]:
+        excerpt = clean_df(
+            pd.DataFrame(
+                {
+                    "onset": rng.integers(0, 50 * num_notes, num_notes),
+                    "track": rng.integers(0, 2, num_notes),
+                    "pitch": rng.integers(30, 50, num_notes),
+                    "dur": rng.integers(50, 300, num_notes),
+                }
+            ),
+            non_overlapping=True,
+        )
+        assert is_canonical(excerpt)
+        assert deg.DegradationPlan(excerpt).notes_sorted
+        assert not deg.DegradationPlan(excerpt.copy()).notes_sorted
+
+        for name, deg_fun in deg.DEGRADATIONS.items():
+            for seed in range(3):
+                res = deg_fun(excerpt, seed=seed)
+                copy_res = deg_fun(excerpt.copy(), seed=seed)
+                assert (res is None and copy_res is None) or res.equals(
+                    copy_res
+                ), f"{name} differs on a canonical excerpt."
+                if res is not None and name != "remove_note":
+                    assert is_canonical(res), f"{name} output is not canonical."
+
+        # A canonical excerpt edited in place is degraded like any other df
+        edited = excerpt.copy()
+        excerpt.loc[0, "onset"] = excerpt["onset"].max() + 1
+        edited.loc[0, "onset"] = excerpt.loc[0, "onset"]
+        assert not deg.DegradationPlan(excerpt).notes_sorted
+        for name, deg_fun in deg.DEGRADATIONS.items():
+            for seed in range(3):
+                res = deg_fun(excerpt, seed=seed)
+                edited_res = deg_fun(edited, seed=seed)
+                assert (res is None and edited_res is None) or res.equals(
+                    edited_res
+                ), f"{name} differs on a canonical excerpt edited in place."
+
+
+def test_compose():
+    original = BASIC_DF.copy()
+
+    # A single degradation is the same as calling it directly
+    for name, deg_fun in deg.DEGRADATIONS.items():
+        res = deg_fun(BASIC_DF, seed=1)
+        comp_res, applied = deg.compose(BASIC_DF, [name], seed=1)
+        assert applied.tolist() == [res is not None]
+        if res is None:
+            assert comp_res.equals(
+                deg.post_process(BASIC_DF)
+            ), f"Failed {name} changed the excerpt."
+        else:
+            assert comp_res.equals(res), f"compose([{name}]) differs from {name}."
+
+    # Removing every note, then one more fails
+    res, applied = deg.compose(BASIC_DF, ["remove_note"] * 5, seed=0)
+    assert len(res) == 0
+    assert applied.tolist() == [True] * 4 + [False]
+
+    names = list(deg.DEGRADATIONS.keys()) * 3
+    for seed in range(5):
+        res, applied = deg.compose(BASIC_DF, names, seed=seed)
+        assert res.equals(deg.post_process(res)), "compose output is not sorted."
+        array_res, array_applied = deg.compose(
+            NoteArray.from_df(BASIC_DF), names, seed=seed
+        )
+        assert isinstance(array_res, NoteArray)
+        assert array_res.to_df().equals(res), "compose differs for NoteArray."
+        assert np.array_equal(applied, array_applied)
+
+    res, _ = deg.compose(
+        BASIC_DF,
+        ["pitch_shift"] * 3,
+        seed=0,
+        deg_kwargs={"pitch_shift": {"min_pitch": 100, "max_pitch": 110}},
+    )
+    assert 1 <= sum(res["pitch"] >= 100) <= 3, "deg_kwargs were not passed."
+    assert BASIC_DF.equals(original), "compose changed the excerpt."
+
+
+def test_return_edit():
+    kwargs = [{}, {"align_onset": True}, {"align_time": True}]
+    for name, deg_fun in deg.DEGRADATIONS.items():
+        params = inspect.signature(deg_fun).parameters
+        for deg_kwargs in kwargs:
+            if any(key not in params for key in deg_kwargs):
+                continue
+            for seed in range(5):
+                res = deg_fun(BASIC_DF, seed=seed, **deg_kwargs)
+                edit = deg_fun(BASIC_DF, seed=seed, return_edit=True, **deg_kwargs)
+                if res is None:
+                    assert_none(edit, msg=f"{name} returned an edit but no result.")
+                    continue
+                assert edit.notes.to_df().equals(
+                    res
+                ), f"{name} edit differs from its result."
+
+                # Every note outside of the changed span is unchanged
+                start, end = edit.changed_span()
+                notes = deg.post_process(NoteArray.from_df(BASIC_DF))
+                outside = (notes.offset <= start) | (notes.onset >= end)
+                res_notes = NoteArray.from_df(res)
+                res_outside = (res_notes.offset <= start) | (res_notes.onset >= end)
+                assert notes[outside].equals(
+                    res_notes[res_outside]
+                ), f"{name} changed notes outside of its changed span."
+
+
+def test_note_array_input():
+    note_array = NoteArray.from_df(BASIC_DF)
+    prior = note_array.copy()
+
+    for name, deg_fun in deg.DEGRADATIONS.items():
+        df_res = deg_fun(BASIC_DF, seed=1)
+        array_res = deg_fun(note_array, seed=1)
+
+        assert note_array.equals(prior), f"{name} changed the input NoteArray."
+        if df_res is None:
+            assert_none(array_res, msg=f"{name} returned a result for NoteArray.")
+            continue
+        assert isinstance(
+            array_res, NoteArray
+        ), f"{name} did not return a NoteArray for NoteArray input."
+        assert array_res.to_df().equals(df_res), (
+            f"{name} gave different results for NoteArray and note_df input:"
+            f"\n{array_res}\n{df_res}"
+        )
+
+
+def test_degrade_batch():
+    excerpts = [BASIC_DF, EMPTY_DF, UNSORTED_DF, BASIC_DF]
+
+    # Per-excerpt seeds match single calls
+    for name, deg_fun in deg.DEGRADATIONS.items():
+        res, failed = deg.degrade_batch(excerpts, name, seeds=[1, 2, 3, 4])
+        for i, excerpt in enumerate(excerpts):
+            correct = deg_fun(excerpt, seed=i + 1)
+            assert failed[i] == (correct is None)
+            if correct is None:
+                assert_none(res[i], msg=f"Batch {name} did not fail.")
+            else:
+                assert res[i].equals(
+                    correct
+                ), f"Batch {name} gave \n{res[i]}\ninstead of \n{correct}"
+
+    # Vectorized degradations
+    batch = NoteArrayBatch.from_excerpts(excerpts * 10)
+    for name in deg.BATCH_DEGRADATIONS:
+        res, failed = deg.degrade_batch(batch, name, seeds=1)
+        correct_failed = [
+            deg.DEGRADATIONS[name](excerpt, seed=1) is None for excerpt in batch
+        ]
+        assert np.array_equal(failed, correct_failed), f"Batch {name} failures."
+        for excerpt, degraded in zip(batch, res):
+            if degraded is None:
+                continue
+            assert isinstance(degraded, NoteArray)
+            excerpt = excerpt.sort()
+            if name == "remove_note":
+                assert len(degraded) == len(excerpt) - 1
+            elif name == "add_note":
+                assert len(degraded) == len(excerpt) + 1
+            elif name == "split_note":
+                assert len(degraded) == len(excerpt) + 1
+                assert degraded.dur.sum() == excerpt.dur.sum()
+            elif name == "join_notes":
+                assert len(degraded) < len(excerpt)
+            elif name == "pitch_shift":
+                assert np.array_equal(degraded.onset, excerpt.onset)
+                assert np.sum(degraded.pitch != excerpt.pitch) > 0
+            else:
+                # Exactly one note is moved
+                kept = {tuple(note) for note in excerpt.data.T}
+                moved = [note for note in degraded.data.T if tuple(note) not in kept]
+                assert len(moved) == 1, f"Batch {name} gave \n{degraded}"
+                if name == "onset_shift":
+                    assert np.array_equal(
+                        np.sort(degraded.offset), np.sort(excerpt.offset)
+                    )
+                elif name == "offset_shift":
+                    assert np.array_equal(degraded.onset, excerpt.onset)
+            assert not any(
+                deg.overlaps(degraded, i) for i in range(len(degraded))
+            ), f"Batch {name} created an overlap:\n{degraded}"
+            if name != "remove_note":
+                assert degraded.equals(degraded.sort()), "Result not sorted."
+
+    # Seeded batches are repeatable, and mixed names and kwargs work
+    names = ["split_note", "remove_note", "pitch_shift", "time_shift"]
+    kwargs = {"split_note": {"num_splits": 3, "min_duration": 25}}
+    res1, failed1 = deg.degrade_batch(excerpts, names, seeds=5, deg_kwargs=kwargs)
+    res2, failed2 = deg.degrade_batch(excerpts, names, seeds=5, deg_kwargs=kwargs)
+    assert np.array_equal(failed1, [False, True, False, False])
+    assert np.array_equal(failed1, failed2)
+    assert len(res1[0]) == len(BASIC_DF) + 3
+    for r1, r2 in zip(res1, res2):
+        assert (r1 is None and r2 is None) or r1.equals(r2)
+
+
+def test_batch_degradations_exhaustive():
+    # Each batch kernel should produce exactly the degraded excerpts which
+    # the corresponding single-excerpt degradation can produce
+    configs = {
+        "time_shift": [
+            {"min_shift": 1, "max_shift": 3},
+            {"min_shift": 1, "max_shift": 4, "align_onset": True},
+        ],
+        "onset_shift": [
+            {"min_shift": 1, "max_shift": 3, "min_duration": 0, "max_duration": 6},
+            {"min_shift": 1, "max_shift": 5, "min_duration": 1, "align_onset": True},
+            {"min_shift": 1, "max_shift": 5, "min_duration": 0, "align_dur": True},
+            {
+                "min_shift": 1,
+                "max_shift": 5,
+                "min_duration": 0,
+                "align_onset": True,
+                "align_dur": True,
+            },
+        ],
+        "offset_shift": [
+            {"min_shift": 1, "max_shift": 3, "min_duration": 0, "max_duration": 6},
+            {"min_shift": 1, "max_shift": 5, "min_duration": 1, "align_dur": True},
+        ],
+        "add_note": [
+            {"min_pitch": 60, "max_pitch": 60, "min_duration": 0, "max_duration": 1},
+            {"min_pitch": 60, "max_pitch": 61, "min_duration": 20, "max_duration": 21},
+        ],
+        "join_notes": [
+            {"max_gap": 2, "max_notes": 3},
+            {"max_gap": 5, "only_first": True},
+        ],
+    }
+    rng = np.random.default_rng(0)
+    for name, name_configs in configs.items():
+        for kwargs in name_configs:
+            excerpts = []
+            for num_notes in [0, 1, 3, 6]:
+                excerpts.append(
+                    NoteArray.from_columns(
+                        rng.integers(0, 8, num_notes),
+                        rng.integers(0, 2, num_notes),
+                        rng.integers(60, 62, num_notes),
+                        rng.integers(0, 4, num_notes) * (rng.random(num_notes) > 0.2),
+                    ).sort()
+                )
+            batch = NoteArrayBatch.from_excerpts(excerpts)
+
+            correct = [set() for _ in excerpts]
+            batch_res = [set() for _ in excerpts]
+            for seed in range(300):
+                degraded, failed = deg.BATCH_DEGRADATIONS[name](
+                    batch, seed=seed, **kwargs
+                )
+                for i, excerpt in enumerate(excerpts):
+                    res = deg.DEGRADATIONS[name](excerpt, seed=seed, **kwargs)
+                    correct[i].add(None if res is None else res.data.tobytes())
+                    batch_res[i].add(None if failed[i] else degraded[i].data.tobytes())
+
+            for i, excerpt in enumerate(excerpts):
+                assert correct[i] == batch_res[i], (
+                    f"Batch {name} with {kwargs} gave different results for\n"
+                    f"{excerpt}"
+                )
+
+
+def test_time_shift_align_onset_exhaustive():
+    # Every valid aligned (note, onset) pair should be sampled
+    excerpt = pd.DataFrame(
+        {
+            "onset": [0, 0, 50, 100, 150, 150],
+            "track": [0, 0, 0, 0, 0, 1],
+            "pitch": [60, 62, 60, 62, 60, 60],
+            "dur": [50, 100, 50, 50, 25, 100],
+        }
+    )
+    onsets = excerpt["onset"].unique()
+    valid = set()
+    for index, note in excerpt.iterrows():
+        for onset in onsets:
+            if onset == note.onset:
+                continue
+            shifted = excerpt.copy()
+            shifted.loc[index, "onset"] = onset
+            if onset + note.dur > 250:
+                continue
+            if not deg.overlaps(shifted, index):
+                valid.add((index, onset))
+
+    sampled = set()
+    for seed in range(300):
+        res = deg.time_shift(excerpt, min_shift=1, align_onset=True, seed=seed)
+        diff = pd.concat([excerpt, res]).drop_duplicates(keep=False)
+        assert len(diff) == 2, "Time shift changed more than 1 note."
+        original = excerpt.index[
+            (
+                excerpt[["track", "pitch", "onset"]]
+                == diff.iloc[0][["track", "pitch", "onset"]]
+            ).all(axis=1)
+        ][0]
+        sampled.add((original, diff.iloc[1]["onset"]))
+    assert sampled == valid, f"Sampled {sampled} instead of {valid}."
+
+
+def test_zero_duration_notes():
+    # Zero-duration notes overlap no notes, but lie within others' spans
+    excerpt = pd.DataFrame(
+        {"onset": [0, 5], "track": [0, 0], "pitch": [60, 61], "dur": [0, 10]}
+    )
+    assert deg.pitch_shift(excerpt, seed=0) is not None
+
+    excerpt = pd.DataFrame(
+        {"onset": [14, 26, 28], "track": 0, "pitch": 11, "dur": [1, 10, 0]}
+    )
+    for name, kwargs in [
+        ("onset_shift", {"min_shift": 1, "min_duration": 0}),
+        ("offset_shift", {"min_shift": 1, "min_duration": 0}),
+        ("time_shift", {"min_shift": 1}),
+    ]:
+        for seed in range(50):
+            res = deg.DEGRADATIONS[name](excerpt, seed=seed, **kwargs)
+            if res is None:
+                continue
+            new_notes = pd.concat([excerpt, excerpt, res]).drop_duplicates(keep=False)
+            for index in new_notes.index:
+                assert not deg.overlaps(
+                    res, index
+                ), f"{name} created an overlap with seed={seed}:\n{res}"
+
+
+def test_pitch_shift_zero_duration():
+    rng = np.random.RandomState(0)
+    excerpts = []
+    for _ in range(20):
+        num_notes = rng.randint(1, 10)
+        excerpts.append(
+            NoteArray.from_columns(
+                rng.randint(0, 100, num_notes),
+                rng.randint(0, 2, num_notes),
+                rng.randint(60, 64, num_notes),
+                rng.randint(1, 50, num_notes) * (rng.rand(num_notes) > 0.5),
+            ).sort()
+        )
+
+    def shifted_note_overlaps(excerpt, degraded):
+        shifted = np.flatnonzero(
+            ~(degraded.data[:, :, None] == excerpt.data[:, None, :])
+            .all(axis=0)
+            .any(axis=1)
+        )
+        assert len(shifted) == 1, "Pitch shift did not change exactly 1 note."
+        return deg.overlaps(degraded, shifted[0])
+
+    for excerpt in excerpts:
+        # Weights match a brute force check
+        first_pitch, weights = deg.pitch_shift_weights(excerpt, excerpt.track, 58, 66)
+        for i in range(len(excerpt)):
+            for column in range(weights.shape[1]):
+                pitch = first_pitch[i] + column
+                moved = excerpt.copy()
+                moved.pitch[i] = pitch
+                valid = pitch != excerpt.pitch[i] and not deg.overlaps(moved, i)
+                assert (weights[i, column] > 0) == valid, (
+                    f"Incorrect weight for note {i} at pitch {pitch} in:\n" f"{excerpt}"
+                )
+
+        degraded = deg.pitch_shift(excerpt, seed=0)
+        assert not shifted_note_overlaps(excerpt, degraded)
+
+    res, failed = deg.degrade_batch(
+        NoteArrayBatch.from_excerpts(excerpts), "pitch_shift", seeds=0
+    )
+    assert not np.any(failed)
+    for excerpt, degraded in zip(excerpts, res):
+        assert not shifted_note_overlaps(excerpt, degraded)
+
+
+def test_feasible_degradations():
+    names = list(deg.DEGRADATIONS)
+    kwargs = [
+        {},
+        {
+            "pitch_shift": {
+                "min_pitch": 60,
+                "max_pitch": 60,
+                "distribution": [1, 0, 1],
+            },
+            "time_shift": {"min_shift": 500, "align_onset": True},
+            "onset_shift": {"align_dur": True},
+            "offset_shift": {"max_shift": 60, "align_dur": True},
+            "add_note": {"align_pitch": True, "align_time": True},
+            "split_note": {"min_duration": 400, "num_splits": 3},
+            "join_notes": {"max_gap": 5},
+        },
+    ]
+
+    # Infeasible degradations always fail
+    rng = np.random.default_rng(0)
+    for trial in range(100):
+        num_notes = rng.integers(0, 6)
+        excerpt = deg.post_process(
+            pd.DataFrame(
+                {
+                    "onset": rng.integers(0, 1000, num_notes),
+                    "track": np.zeros(num_notes, dtype=int),
+                    "pitch": rng.integers(59, 62, num_notes),
+                    "dur": rng.integers(50, 500, num_notes),
+                }
+            )
+        )
+        deg_kwargs = kwargs[trial % 2]
+        feasible = deg.feasible_degradations(excerpt, deg_kwargs)
+        assert feasible.dtype == bool and len(feasible) == len(names)
+        for name, name_feasible in zip(names, feasible):
+            if name_feasible:
+                continue
+            for seed in range(3):
+                assert_none(
+                    deg.DEGRADATIONS[name](
+                        excerpt, seed=seed, **deg_kwargs.get(name, {})
+                    ),
+                    msg=f"{name} succeeded but was marked infeasible.",
+                )
+
+    # Exact checks
+    feasible = deg.feasible_degradations(EMPTY_DF)
+    assert feasible.tolist() == [name == "add_note" for name in names]
+
+    excerpt = pd.DataFrame(
+        {"onset": [0, 200], "track": [0, 0], "pitch": [60, 61], "dur": [100, 100]}
+    )
+    feasible = dict(zip(names, deg.feasible_degradations(excerpt)))
+    assert feasible["remove_note"] and feasible["split_note"]
+    assert not feasible["join_notes"], "Notes of different pitches can't be joined."
+    feasible = deg.feasible_degradations(
+        excerpt,
+        {"split_note": {"min_duration": 60}},
+        degradations=["split_note", "remove_note"],
+    )
+    assert feasible.tolist() == [False, True]
+
+    # Tables are cached in a given plan
+    plan = deg.DegradationPlan(excerpt)
+    deg.feasible_degradations(plan, degradations=["split_note"])
+    assert ("split_note", 100) in plan.tables
+
+
+def test_degrade_window():
+    rng = np.random.default_rng(0)
+    num_notes = 300
+    piece = deg.post_process(
+        pd.DataFrame(
+            {
+                "onset": np.sort(rng.integers(0, 30000, num_notes)),
+                "track": rng.integers(0, 2, num_notes),
+                "pitch": rng.integers(60, 64, num_notes),
+                "dur": rng.integers(50, 400, num_notes),
+            }
+        ).drop_duplicates(["onset", "track", "pitch"])
+    )
+    piece = deg.post_process(clean_df(piece, non_overlapping=True))
+    piece["onset"] -= piece["onset"].min()
+    plan = deg.DegradationPlan(piece)
+
+    for name, deg_fun in deg.DEGRADATIONS.items():
+        # A window covering the whole excerpt is the same as no window
+        for seed in range(3):
+            res = deg_fun(piece, seed=seed)
+            window_res = deg_fun(plan, seed=seed, window=(0, 30000))
+            assert (res is None and window_res is None) or res.equals(
+                window_res
+            ), f"{name} differs with a window covering the whole excerpt."
+
+        for seed in range(10):
+            start = 1000 * seed
+            edit = deg_fun(
+                plan, seed=seed, window=(start, start + 500), return_edit=True
+            )
+            if edit is None:
+                continue
+
+            # Only notes overlapping the window are changed, within their span
+            indices, origin, window_plan = plan.window(start, start + 500)
+            assert np.all(np.isin(edit.changed_indices, indices))
+            span = edit.changed_span()
+            assert origin <= span[0] and span[1] <= origin + window_plan.end_time
+
+            res = deg_fun(plan, seed=seed, window=(start, start + 500))
+            assert res.equals(deg.post_process(res)), "Output is not sorted."
+            res_notes = NoteArray.from_df(res)
+            pairs, _ = overlapping_pairs(
+                res_notes, res_notes.track * 128 + res_notes.pitch
+            )
+            assert (
+                len(pairs) == 0 or name == "split_note"
+            ), f"{name} created an overlap."
+
+    assert plan.to_excerpt().equals(piece), "degrade_window changed the excerpt."
+    assert_none(deg.remove_note(piece, window=(40000, 50000)))
@@ -0,0 +1,200 @@
+import itertools
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mdtk.degrader import AliasSampler, Degrader, ParallelDegrader, suppress_warnings
+from mdtk.df_utils import clean_df
+from mdtk.stats import DegradationStats
+
+
+def make_excerpts(num_excerpts, seed=0):
+    rng = np.random.default_rng(seed)
+    excerpts = []
+    for _ in range(num_excerpts):
+        num_notes = rng.integers(1, 20)
+        excerpts.append(
+            clean_df(
+                pd.DataFrame(
+                    {
+                        "onset": rng.integers(0, 2000, num_notes),
+                        "track": rng.integers(0, 2, num_notes),
+                        "pitch": rng.integers(50, 60, num_notes),
+                        "dur": rng.integers(50, 300, num_notes),
+                    }
+                ),
+                non_overlapping=True,
+            )
+        )
+    return excerpts
+
+
+def test_parallel_degrader():
+    excerpts = make_excerpts(50)
+
+    results = []
+    for use_threads, num_workers in [(True, 1), (True, 3), (False, 2)]:
+        degrader = ParallelDegrader(
+            seed=1,
+            num_workers=num_workers,
+            use_threads=use_threads,
+            chunk_size=4,
+            chunks_per_merge=3,
+        )
+        degraded, labels = degrader.degrade_all(excerpts)
+        assert len(degraded) == len(labels) == len(excerpts)
+        assert all(0 <= label <= len(degrader.degradations) for label in labels)
+        assert np.all(degrader.failed >= 0), "Negative failed counts after merge."
+        for excerpt, degraded_df, label in zip(excerpts, degraded, labels):
+            if label == 0:
+                assert excerpt.equals(degraded_df), "Clean excerpt was changed."
+        results.append((labels, [df.values.tolist() for df in degraded]))
+
+    assert all(
+        res == results[0] for res in results
+    ), "ParallelDegrader output depends on the number or type of workers."
+
+    # A different seed should give different labels
+    labels = ParallelDegrader(seed=2, use_threads=True).degrade_all(excerpts)[1]
+    assert labels != results[0][0], "Different seeds gave identical labels."
+
+
+def test_degrade_n():
+    excerpts = make_excerpts(10)
+
+    for excerpt in excerpts:
+        original = excerpt.copy()
+        degraded, labels = Degrader(seed=0).degrade_n(excerpt, 5)
+        assert excerpt.equals(original), "degrade_n changed the excerpt."
+        assert len(labels) == 5
+        assert all(0 <= label <= len(Degrader().degradations) for label in labels)
+        assert degraded.equals(clean_df(degraded)), "degrade_n output is unsorted."
+
+        same, same_labels = Degrader(seed=0).degrade_n(excerpt, 5)
+        assert same.equals(degraded) and same_labels == labels
+
+    # One edit is the same as degrade (with clean_prop=0)
+    for excerpt in excerpts:
+        degraded, label = Degrader(seed=3, clean_prop=0).degrade(excerpt)
+        degraded_n, labels = Degrader(seed=3, clean_prop=0).degrade_n(excerpt, 1)
+        assert labels == [label]
+        assert degraded_n.equals(degraded)
+
+    degraded, labels = Degrader(seed=0).degrade_n(excerpts[0], 0)
+    assert labels == [] and degraded.equals(excerpts[0])
+
+
+def test_stream():
+    excerpts = make_excerpts(23)
+
+    serial = Degrader(seed=0)
+    expected = [serial.degrade(excerpt) + (excerpt,) for excerpt in excerpts]
+
+    for prefetch in [1, 3]:
+        batches = list(Degrader(seed=0).stream(excerpts, 5, prefetch=prefetch))
+        assert [len(batch) for batch in batches] == [5, 5, 5, 5, 3]
+        results = [result for batch in batches for result in batch]
+        for (degraded, clean, label), (exp_degraded, exp_label, excerpt) in zip(
+            results, expected
+        ):
+            assert label == exp_label
+            assert degraded.equals(exp_degraded)
+            assert clean.equals(excerpt)
+
+    # Formatted
+    batch = next(iter(Degrader(seed=0).stream(excerpts, 4, formatter="command")))
+    assert all(isinstance(res[0], str) and isinstance(res[1], str) for res in batch)
+    assert [res[2] for res in batch] == [res[1] for res in expected[:4]]
+
+    # Excerpt sampling skips pieces with no valid excerpt
+    pieces = [excerpt for excerpt in excerpts if len(excerpt) != 10]
+    batches = list(
+        Degrader(seed=0).stream(
+            pieces, 100, excerpt_kwargs={"min_notes": 10, "excerpt_length": 5000}
+        )
+    )
+    assert len(batches) == 1
+    assert len(batches[0]) == sum(len(piece) > 10 for piece in pieces)
+
+    # Closing early stops the background threads
+    stream = Degrader(seed=0).stream(itertools.cycle(excerpts), 2, prefetch=1)
+    next(stream)
+    stream.close()
+
+    # Errors are raised in the caller
+    def bad_excerpts():
+        yield excerpts[0]
+        raise ValueError("Bad excerpt")
+
+    with pytest.raises(ValueError, match="Bad excerpt"):
+        list(Degrader(seed=0).stream(bad_excerpts(), 2))
+
+
+def test_alias_sampler():
+    weights = [0, 1, 2, 0, 5]
+    sampler = AliasSampler(weights)
+    rng = np.random.default_rng(0)
+    counts = np.bincount([sampler.sample(rng) for _ in range(16000)], minlength=5)
+    assert counts[0] == counts[3] == 0, "Index with weight 0 was sampled."
+    assert np.allclose(counts / 16000, np.array(weights) / 8, atol=0.02)
+
+    assert AliasSampler([0, 3]).sample(rng) == 1
+
+
+def test_suppress_warnings(caplog):
+    logging.disable(logging.NOTSET)
+    with suppress_warnings():
+        with suppress_warnings():
+            logging.warning("Hidden")
+        logging.warning("Hidden")
+    logging.warning("Shown")
+    assert caplog.text.count("Hidden") == 0
+    assert caplog.text.count("Shown") == 1
+
+    # A previously set level is restored
+    logging.disable(logging.CRITICAL)
+    with suppress_warnings():
+        pass
+    assert logging.root.manager.disable == logging.CRITICAL
+    logging.disable(logging.NOTSET)
+
+
+def test_degrade_all_failed(caplog):
+    empty = pd.DataFrame({"onset": [], "track": [], "pitch": [], "dur": []})
+    degrader = Degrader(
+        seed=0, degradations=["remove_note", "join_notes"], degradation_dist=[1, 1]
+    )
+    degrader.failed[:] = [1, 0]
+    degraded, label = degrader.degrade(empty)
+    assert label == 0 and len(degraded) == 0
+    assert degrader.failed[0] >= 1 and degrader.failed[1] >= 1
+    assert "Returning None" not in caplog.text, "Warnings were not suppressed."
+
+    # Failed degradations are retried first
+    excerpt = make_excerpts(1)[0]
+    degrader = Degrader(seed=0, clean_prop=0)
+    degrader.failed[3] = 2
+    assert degrader.degrade(excerpt)[1] == 4
+    assert degrader.failed[3] == 1
+
+
+def test_degrade_infeasible():
+    # join_notes is certain to fail, so it is counted as failed but never run
+    excerpt = pd.DataFrame(
+        {"onset": [0, 200], "track": [0, 0], "pitch": [60, 61], "dur": [100, 100]}
+    )
+    stats = DegradationStats()
+    degrader = Degrader(
+        seed=0,
+        degradations=["join_notes", "remove_note"],
+        degradation_dist=[1, 1],
+        clean_prop=0,
+        stats=stats,
+    )
+    for _ in range(10):
+        assert degrader.degrade(excerpt)[1] == 2
+    assert degrader.failed[0] > 0
+    assert "join_notes" not in stats.degradations
+    assert stats.degradations["remove_note"]["successes"] == 10
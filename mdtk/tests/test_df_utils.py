@@ -1,8 +1,18 @@
 import itertools
 
+import numpy as np
 import pandas as pd
 
-from mdtk.df_utils import clean_df, get_random_excerpt, remove_pitch_overlaps
+from mdtk.df_utils import (
+    NOTE_DF_SORT_ORDER,
+    ExcerptSampler,
+    clean_df,
+    get_random_excerpt,
+    is_canonical,
+    mark_canonical,
+    remove_pitch_overlaps,
+    sort_order,
+)
 
 CLEAN_INPUT_DF = pd.DataFrame(
     {
@@ -73,6 +83,53 @@ def test_clean_df():
         ), f"clean_df result incorrect for args: {kwargs}"
 
 
+def test_canonical():
+    res = clean_df(CLEAN_INPUT_DF)
+    assert is_canonical(res), "clean_df did not return a canonical df"
+    assert not is_canonical(CLEAN_INPUT_DF)
+    assert all(res.dtypes == np.int64)
+
+    # Copies and reorderings of a canonical df are not canonical
+    assert not is_canonical(res.copy())
+    assert not is_canonical(res.iloc[::-1])
+    assert not is_canonical(res.iloc[1:])
+    assert not is_canonical(res.assign(onset=res["onset"] + 1))
+    assert not is_canonical(res.loc[:, ["track", "onset", "pitch", "dur"]])
+
+    # In-place edits are checked before the mark is trusted
+    edited = clean_df(CLEAN_INPUT_DF)
+    edited.loc[0, "onset"] = edited["onset"].max() + 1
+    assert not is_canonical(edited)
+    edited = clean_df(CLEAN_INPUT_DF)
+    edited.iloc[0, 0] = edited["onset"].max() + 1
+    assert not is_canonical(edited)
+    edited = clean_df(CLEAN_INPUT_DF)
+    edited.sort_values("pitch", ascending=False, inplace=True)
+    assert not is_canonical(edited)
+    edited = clean_df(CLEAN_INPUT_DF)
+    edited.index += 1
+    assert not is_canonical(edited)
+    # Edits which keep the notes in order are fine
+    edited = clean_df(CLEAN_INPUT_DF)
+    edited.iloc[-1, 3] += 1
+    assert is_canonical(edited)
+
+    # Non-int columns are kept, but not marked
+    float_res = clean_df(CLEAN_INPUT_DF.astype({"dur": float}))
+    assert not is_canonical(float_res)
+    assert float_res.astype({"dur": np.int64}).equals(res)
+
+    marked = mark_canonical(res.copy())
+    assert is_canonical(marked)
+
+    # Excerpts of canonical dfs are canonical
+    excerpt = get_random_excerpt(res, min_notes=2)
+    assert is_canonical(excerpt)
+    assert excerpt.equals(
+        excerpt.sort_values(NOTE_DF_SORT_ORDER).reset_index(drop=True)
+    )
+
+
 def test_remove_pitch_overlaps():
     note_df_complex_overlap = pd.DataFrame(
         {
@@ -104,6 +161,29 @@ def test_remove_pitch_overlaps():
     short_df = pd.DataFrame({"onset": [0], "track": 0, "pitch": 0, "dur": 0})
     assert short_df.equals(remove_pitch_overlaps(short_df))
 
+    # Columns in any order, with extra columns, and some of them floats
+    shuffled = note_df_complex_overlap[["pitch", "dur", "track", "onset"]].assign(
+        velocity=100
+    )
+    assert remove_pitch_overlaps(shuffled).equals(note_df_complex_overlap_fixed)
+    float_df = note_df_complex_overlap.astype({"onset": float, "dur": float})
+    assert remove_pitch_overlaps(float_df).equals(
+        note_df_complex_overlap_fixed.astype({"onset": float, "dur": float})
+    )
+
+
+def test_sort_order():
+    rng = np.random.default_rng(0)
+    for num_rows in [0, 1, 10, 100]:
+        columns = [rng.integers(-5, 5, num_rows) for _ in range(4)]
+        assert np.array_equal(sort_order(columns), np.lexsort(columns[::-1]))
+
+    # Columns too large to pack, or not integers
+    columns = [rng.integers(0, 2**40, 10) for _ in range(3)]
+    assert np.array_equal(sort_order(columns), np.lexsort(columns[::-1]))
+    columns = [rng.random(10), rng.integers(0, 5, 10)]
+    assert np.array_equal(sort_order(columns), np.lexsort(columns[::-1]))
+
 
 def test_get_random_excerpt():
     NUM_NOTES = 50
@@ -182,3 +262,65 @@ def test_get_random_excerpt():
         is None
     ), "Did not return None with excerpt_length too short"
     assert prior.equals(note_df), "get_random_excerpt changed input df"
+
+
+def test_excerpt_sampler():
+    # Notes every 100ms, with a gap of 1000ms after the 10th
+    onsets = list(range(0, 1000, 100)) + list(range(2000, 2500, 100))
+    note_df = pd.DataFrame(
+        {"onset": onsets, "track": 0, "pitch": range(len(onsets)), "dur": 50}
+    )
+    prior = note_df.copy()
+
+    sampler = ExcerptSampler(
+        note_df, min_notes=5, excerpt_length=400, first_onset_range=(10, 11)
+    )
+    # Only notes 0-5 and 10 begin an excerpt of at least 5 notes
+    assert len(sampler) == 7
+    assert list(sampler.valid_notes) == [0, 1, 2, 3, 4, 5, 10]
+
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        excerpt = sampler.sample(rng)
+        assert prior.equals(note_df), "ExcerptSampler changed input df"
+        assert len(excerpt) == 5
+        assert list(excerpt.index) == list(range(5))
+        assert list(excerpt["onset"]) == [10, 110, 210, 310, 410]
+        first_pitch = excerpt["pitch"].iloc[0]
+        assert first_pitch in sampler.valid_notes
+        assert list(excerpt["pitch"]) == list(range(first_pitch, first_pitch + 5))
+
+    # Seeded draws are reproducible
+    assert sampler.sample(1).equals(sampler.sample(1))
+
+    # Ties and unsorted input: all notes at an onset are included
+    tied_df = pd.DataFrame(
+        {"onset": [300, 0, 0, 100], "track": 0, "pitch": [4, 1, 2, 3], "dur": 50}
+    )
+    sampler = ExcerptSampler(tied_df, min_notes=3, excerpt_length=100)
+    assert list(sampler.valid_notes) == [0, 1]
+    excerpt = sampler.sample(0)
+    assert list(excerpt["pitch"]) == [1, 2, 3]
+
+    # Windows are drawn as positions into the note_df
+    sampler = ExcerptSampler(note_df, min_notes=5, excerpt_length=400)
+    starts, ends = sampler.sample_windows(100, seed=0)
+    assert len(starts) == 100
+    assert set(starts) == {0, 1, 2, 3, 4, 5, 10}
+    assert np.all(ends - starts == 5)
+    starts, ends = sampler.sample_windows(100, overlap_policy="distinct", seed=0)
+    assert list(starts) == [0, 1, 2, 3, 4, 5, 10]
+    starts, ends = sampler.sample_windows(100, overlap_policy="disjoint", seed=0)
+    assert len(starts) == 2
+    assert ends[0] <= starts[1] and 10 in starts
+
+    # A df with exactly min_notes notes
+    assert len(
+        get_random_excerpt(note_df, min_notes=len(note_df), excerpt_length=3000)
+    ) == len(note_df)
+
+    # No valid excerpt
+    sampler = ExcerptSampler(note_df, min_notes=7, excerpt_length=400)
+    assert len(sampler) == 0
+    assert sampler.sample() is None
+    assert ExcerptSampler(note_df.iloc[:0]).sample() is None
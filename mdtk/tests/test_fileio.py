@@ -2,8 +2,10 @@ import itertools
 import os
 import shutil
 
+import numpy as np
 import pandas as pd
 import pretty_midi
+import pytest
 
 import mdtk.fileio as fileio
 from mdtk.df_utils import clean_df
@@ -140,6 +142,71 @@ def test_midi_to_df():
         ), f"csv_to_midi not using args correctly with args={kwargs}"
 
 
+def test_parse_midi_notes():
+    header = b"MThd" + bytes([0, 0, 0, 6, 0, 1, 0, 2, 0, 96])
+    # 120 qpm, then 240 qpm from tick 96
+    track_0 = bytes(
+        [0, 0xFF, 0x51, 3, 0x07, 0xA1, 0x20]
+        + [96, 0xFF, 0x51, 3, 0x03, 0xD0, 0x90]
+        + [0, 0xFF, 0x2F, 0]
+    )
+    track_1 = bytes(
+        # Program 5, then notes 60 and 64 (with running status) on at tick 0
+        [0, 0xC0, 5, 0, 0x90, 60, 100, 0, 64, 100]
+        # Note 60 off (velocity 0, running status) and 64 off at tick 96
+        + [96, 60, 0, 0, 0x80, 64, 64]
+        # Note 62 off on the same tick as its onset (dropped, as in pretty_midi)
+        + [0, 0x90, 62, 100, 0, 0x80, 62, 64]
+        + [0, 0xFF, 0x2F, 0]
+    )
+    data = header
+    for track in [track_0, track_1]:
+        data += b"MTrk" + len(track).to_bytes(4, "big") + track
+
+    ticks_per_beat, tempo_ticks, tick_scales, notes = fileio.parse_midi_notes(data)
+    assert ticks_per_beat == 96
+    assert np.array_equal(tempo_ticks, [0, 96])
+    assert np.allclose(tick_scales, [60 / (120 * 96), 60 / (240 * 96)])
+    assert np.array_equal(notes, [[0, 0], [96, 96], [0, 0], [60, 64]])
+
+    midi_path = os.path.join(TEST_CACHE_PATH, "parse_test.mid")
+    os.makedirs(TEST_CACHE_PATH, exist_ok=True)
+    with open(midi_path, "wb") as file:
+        file.write(data)
+    expected = pd.DataFrame(
+        {"onset": [0, 0], "track": [0, 0], "pitch": [60, 64], "dur": [500, 500]}
+    )
+    for parser in fileio.MIDI_PARSERS:
+        assert fileio.midi_to_df(midi_path, parser=parser).equals(
+            expected
+        ), f"midi_to_df result incorrect with parser={parser}"
+
+    # Unsupported or invalid data
+    for bad_data in [b"Not a MIDI file", data[:-2], header + b"MTrk"]:
+        with pytest.raises(ValueError):
+            fileio.parse_midi_notes(bad_data)
+    with open(midi_path, "wb") as file:
+        file.write(data[:-2])
+    assert fileio.midi_to_df(midi_path) is None
+
+
+def test_midi_parsers():
+    for midi_path in [TEST_MID, ALB_MID]:
+        for (track, overlap, resolution) in itertools.product(
+            [False, True], [False, True], [None, 24, 480]
+        ):
+            kwargs = {
+                "single_track": track,
+                "non_overlapping": overlap,
+                "resolution": resolution,
+            }
+            native = fileio.midi_to_df(midi_path, **kwargs)
+            correct = fileio.midi_to_df(midi_path, parser="pretty_midi", **kwargs)
+            assert native.equals(
+                correct
+            ), f"Native parser differs from pretty_midi on {midi_path}, {kwargs}"
+
+
 def test_midi_to_csv():
     # This method is just calls to midi_to_df and df_to_csv
     csv_path = TEST_CACHE_PATH + os.path.sep + "test.csv"
@@ -0,0 +1,419 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from mdtk.df_utils import NOTE_DF_SORT_ORDER
+from mdtk.note_array import (
+    INSERT_SORTED_MIN_NOTES,
+    NoteArray,
+    NoteArrayBatch,
+    NoteEdit,
+    PitchIntervalIndex,
+    overlapping_pairs,
+    pitch_occupancy,
+    sample_excerpts,
+)
+
+NOTE_DF = pd.DataFrame(
+    {
+        "onset": [200, 0, 100, 200],
+        "track": [1, 0, 1, 0],
+        "pitch": [40, 10, 20, 30],
+        "dur": [100, 100, 100, 100],
+    }
+)
+
+
+def test_from_df():
+    note_array = NoteArray.from_df(NOTE_DF)
+    assert len(note_array) == len(NOTE_DF)
+    for column in NOTE_DF_SORT_ORDER:
+        assert np.array_equal(
+            getattr(note_array, column), NOTE_DF[column]
+        ), f"Column {column} incorrect"
+    assert np.shares_memory(
+        note_array.data, NOTE_DF.to_numpy()
+    ), "Clean int note_df was copied."
+    assert NoteArray.from_df(note_array) is note_array
+
+    float_df = pd.DataFrame(
+        {
+            "track": [0, 1.5],
+            "onset": [0.5, 100.6],
+            "pitch": [10, 20],
+            "dur": [100, 100.5],
+            "extra": [5, "apple"],
+        }
+    )
+    note_array = NoteArray.from_df(float_df)
+    assert note_array.data.dtype == np.int64
+    assert note_array.equals(
+        NoteArray.from_columns([0, 101], [0, 2], [10, 20], [100, 100])
+    ), f"Rounding of float df incorrect:\n{note_array}"
+
+    with pytest.raises(ValueError):
+        NoteArray.from_df(pd.DataFrame({"onset": [0], "pitch": [10]}))
+
+
+def test_to_df():
+    note_array = NoteArray.from_df(NOTE_DF)
+    df = note_array.to_df()
+    assert df.equals(NOTE_DF), f"Round trip produced\n{df}\ninstead of\n{NOTE_DF}"
+    assert np.shares_memory(df.to_numpy(), note_array.data), "to_df copied data."
+
+    empty = NoteArray.from_columns([], [], [], [])
+    assert len(empty) == 0
+    assert list(empty.to_df().columns) == NOTE_DF_SORT_ORDER
+
+
+def test_edits():
+    note_array = NoteArray.from_df(NOTE_DF)
+
+    copy = note_array.copy()
+    copy.pitch[0] = 0
+    assert NOTE_DF["pitch"].iloc[0] == 40, "Editing a copy changed the original."
+
+    assert np.array_equal(note_array.offset, NOTE_DF["onset"] + NOTE_DF["dur"])
+
+    sorted_array = note_array.sort()
+    correct = NOTE_DF.sort_values(NOTE_DF_SORT_ORDER).reset_index(drop=True)
+    assert sorted_array.to_df().equals(correct), "NoteArray sort incorrect."
+
+    dropped = note_array.drop([0, 2])
+    assert dropped.equals(note_array[[1, 3]]), "NoteArray drop incorrect."
+
+    appended = dropped.append(note_array[[0, 2]])
+    assert len(appended) == len(note_array)
+    assert appended.sort().equals(sorted_array), "NoteArray append incorrect."
+
+
+def test_note_edit():
+    base = NoteArray.from_df(NOTE_DF)
+    prior = base.copy()
+
+    edit = NoteEdit(base)
+    assert edit.notes.equals(base.sort())
+    assert edit.changed_span() is None
+    assert len(edit.changed_indices) == 0
+
+    edit = NoteEdit(
+        base,
+        removed=[2],
+        added=NoteArray.from_columns([50], [0], [60], [20]),
+        modified={"pitch": ([0, 2], [41, 21]), "dur": ([0], [150])},
+    )
+    assert len(edit) == 4
+    assert edit.notes.equals(
+        NoteArray.from_columns(
+            [0, 50, 200, 200], [0, 0, 0, 1], [10, 60, 30, 41], [100, 20, 100, 150]
+        )
+    )
+    assert edit.notes is edit.notes, "NoteEdit materialized twice."
+    assert base.equals(prior), "NoteEdit changed its base."
+    assert edit.modified_indices.tolist() == [0]
+    assert edit.changed_indices.tolist() == [0, 2]
+    assert edit.old_notes().equals(base[[0, 2]])
+    assert edit.new_notes().equals(
+        NoteArray.from_columns([200, 50], [1, 0], [41, 60], [150, 20])
+    )
+    assert edit.changed_span() == (50, 350)
+
+    unsorted = NoteEdit(base, removed=[1], sort=False)
+    assert unsorted.notes.equals(base[[0, 2, 3]])
+    assert unsorted.changed_span() == (0, 100)
+
+    # A sorted base is merged with the changed notes rather than re-sorted
+    sorted_base = base.sort()
+    kwargs = {
+        "removed": [2],
+        "added": NoteArray.from_columns([200, 0], [0, 1], [30, 5], [50, 10]),
+        "modified": {"onset": ([0], [250]), "pitch": ([3], [41])},
+    }
+    assert NoteEdit(sorted_base, base_sorted=True, **kwargs).notes.equals(
+        NoteEdit(sorted_base, **kwargs).notes
+    )
+    long_base = NoteArray.from_columns(
+        *np.random.default_rng(0).integers(0, 300, (4, INSERT_SORTED_MIN_NOTES))
+    ).sort()
+    assert NoteEdit(long_base, base_sorted=True, **kwargs).notes.equals(
+        NoteEdit(long_base, **kwargs).notes
+    )
+
+
+def test_insert_sorted():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        num_notes, num_new = rng.integers(0, 20), rng.integers(0, 5)
+        notes, new = [
+            NoteArray.from_columns(*rng.integers(0, 4, (4, num)))
+            for num in (num_notes, num_new)
+        ]
+        notes = notes.sort()
+        assert notes.is_sorted()
+        assert notes.insert_sorted(new).equals(notes.append(new).sort())
+        assert new.is_sorted() == new.equals(new.sort())
+
+
+def test_pitch_interval_index():
+    note_array = NoteArray.from_columns(
+        [0, 50, 100, 300, 0],
+        [0, 0, 0, 0, 1],
+        [60, 60, 60, 60, 60],
+        [200, 20, 100, 100, 100],
+    )
+    index = PitchIntervalIndex(note_array)
+
+    # Single queries
+    assert not index.collides(0, 60, 250, 300)
+    assert index.collides(0, 60, 199, 201)
+    assert not index.collides(0, 60, 400, 500)
+    assert not index.collides(0, 61, 0, 500)
+    assert not index.collides(1, 60, 100, 200)
+
+    # Vectorized queries match a brute force check
+    onsets = np.arange(-50, 450, 7)
+    offsets = onsets + 30
+    expected = [
+        any(
+            onset < n_offset and offset > n_onset
+            for n_onset, n_offset in [(0, 200), (50, 70), (100, 200), (300, 400)]
+        )
+        for onset, offset in zip(onsets, offsets)
+    ]
+    assert np.array_equal(index.collides(0, 60, onsets, offsets), expected)
+
+    # Excluding a note ignores it
+    assert not index.collides(0, 60, 250, 300, exclude=0)
+    assert not index.collides(0, 60, 10, 40, exclude=0)
+    assert index.collides(0, 60, 10, 60, exclude=0)
+
+    assert index.max_offset_before(0, 60, 300) == 200
+    assert index.max_offset_before(0, 60, 0) == -np.inf
+    assert index.max_offset_before(0, 60, 150, exclude=0) == 200
+    assert index.max_offset_before(0, 60, 100, exclude=0) == 70
+    assert index.min_onset_after(0, 60, 200) == 300
+    assert index.min_onset_after(0, 60, 400) == np.inf
+    assert index.min_onset_after(0, 60, 60, exclude=0) == 50
+
+    assert index.free_onsets(0, 60, 50, 0, 500) == [(200.0, 251.0), (400.0, 500.0)]
+    assert index.free_onsets(0, 60, 50, 0, 300, exclude=3) == [(200.0, 300.0)]
+    assert index.free_onsets(0, 61, 50, 0, 300) == [(0.0, 300.0)]
+    assert index.free_onsets(0, 60, 50, 300, 300) == []
+
+    # Empty index
+    index = PitchIntervalIndex(NoteArray.from_columns([], [], [], []))
+    assert not index.collides(0, 60, 0, 100)
+    assert index.free_onsets(0, 60, 10, 0, 100) == [(0.0, 100.0)]
+
+
+def test_note_array_batch():
+    excerpts = [
+        NoteArray.from_df(NOTE_DF),
+        NoteArray.from_columns([], [], [], []),
+        NoteArray.from_df(NOTE_DF).sort(),
+    ]
+    batch = NoteArrayBatch.from_excerpts(excerpts)
+    assert len(batch) == 3
+    assert np.array_equal(batch.offsets, [0, 4, 4, 8])
+    assert np.array_equal(batch.lengths, [4, 0, 4])
+    assert np.array_equal(batch.excerpt_ids, [0, 0, 0, 0, 2, 2, 2, 2])
+    for excerpt, batch_excerpt in zip(excerpts, batch):
+        assert batch_excerpt.equals(excerpt), "Batch excerpt incorrect."
+
+    sorted_batch = batch.sort()
+    for excerpt, batch_excerpt in zip(excerpts, sorted_batch):
+        assert batch_excerpt.equals(excerpt.sort()), "Batch sort incorrect."
+
+    assert len(NoteArrayBatch.from_excerpts([])) == 0
+
+
+def test_pitch_interval_index_all_notes():
+    # Compare the vectorized queries for every note against brute force
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        num_notes = rng.randint(0, 15)
+        note_array = NoteArray.from_columns(
+            rng.randint(0, 200, num_notes),
+            rng.randint(0, 2, num_notes),
+            rng.randint(60, 62, num_notes),
+            # Including many zero-duration notes
+            rng.randint(1, 60, num_notes) * (rng.rand(num_notes) > 0.3),
+        )
+        onset, offset = note_array.onset, note_array.offset
+        index = PitchIntervalIndex(note_array)
+
+        def others(i):
+            return [
+                j
+                for j in range(num_notes)
+                if j != i
+                and note_array.track[j] == note_array.track[i]
+                and note_array.pitch[j] == note_array.pitch[i]
+            ]
+
+        def is_free(notes, start, end):
+            return not any(onset[j] < end and offset[j] > start for j in notes)
+
+        earliest_onsets = index.earliest_free_onsets()
+        latest_offsets = index.latest_free_offsets()
+        dur = rng.randint(1, 40, num_notes) * (rng.rand(num_notes) > 0.3)
+        gap_notes, gap_starts, gap_ends = index.move_gaps(dur, 0, 250)
+        for i in range(num_notes):
+            valid_onsets = [
+                o for o in range(offset[i]) if is_free(others(i), o, offset[i])
+            ]
+            if valid_onsets:
+                assert max(earliest_onsets[i], 0) == valid_onsets[0]
+            else:
+                assert max(earliest_onsets[i], 0) >= offset[i]
+
+            valid_offsets = [
+                o for o in range(onset[i] + 1, 300) if is_free(others(i), onset[i], o)
+            ]
+            if valid_offsets and valid_offsets[-1] < 299:
+                assert latest_offsets[i] == valid_offsets[-1]
+            elif not valid_offsets:
+                assert latest_offsets[i] <= onset[i]
+
+            moves = set()
+            for start, end in zip(gap_starts[gap_notes == i], gap_ends[gap_notes == i]):
+                moves.update(range(int(start), int(end)))
+            assert moves == {
+                o for o in range(250) if is_free(others(i), o, o + dur[i])
+            }, "move_gaps incorrect."
+
+            group = index.groups[(note_array.track[i], note_array.pitch[i])]
+            assert index.count_overlaps(group, onset[i], offset[i], exclude=i) == len(
+                [j for j in others(i) if not is_free([j], onset[i], offset[i])]
+            )
+
+        for dur in [20, 0]:
+            gap_groups, gap_starts, gap_ends = index.insert_gaps(dur, 0, 250)
+            for (track, pitch), group in index.groups.items():
+                notes = [
+                    j
+                    for j in range(num_notes)
+                    if note_array.track[j] == track and note_array.pitch[j] == pitch
+                ]
+                inserts = set()
+                for start, end in zip(
+                    gap_starts[gap_groups == group], gap_ends[gap_groups == group]
+                ):
+                    inserts.update(range(int(start), int(end)))
+                assert inserts == {
+                    o for o in range(250) if is_free(notes, o, o + dur)
+                }, "insert_gaps incorrect."
+
+
+def test_overlapping_pairs():
+    note_array = NoteArray.from_columns(
+        [0, 50, 100, 0, 120],
+        [0, 0, 0, 1, 0],
+        [60, 61, 60, 60, 62],
+        [100, 60, 50, 200, 10],
+    )
+    notes, others = overlapping_pairs(note_array, note_array.track)
+    assert sorted(zip(notes.tolist(), others.tolist())) == [
+        (0, 1),
+        (1, 0),
+        (1, 2),
+        (2, 1),
+        (2, 4),
+        (4, 2),
+    ]
+
+    # A zero-duration note only overlaps notes sounding strictly around it
+    note_array = NoteArray.from_columns(
+        [5, 15, 30, 30], [0, 0, 0, 0], [60, 60, 60, 60], [10, 0, 10, 0]
+    )
+    notes, others = overlapping_pairs(note_array, note_array.track)
+    assert sorted(zip(notes.tolist(), others.tolist())) == []
+    note_array = NoteArray.from_columns([0, 5], [0, 0], [60, 61], [10, 0])
+    notes, others = overlapping_pairs(note_array, note_array.track)
+    assert sorted(zip(notes.tolist(), others.tolist())) == [(0, 1), (1, 0)]
+
+    notes, others = overlapping_pairs(NoteArray.from_columns([], [], [], []), [])
+    assert len(notes) == 0 and len(others) == 0
+
+
+def test_pitch_occupancy():
+    note_array = NoteArray.from_columns(
+        [0, 50, 100, 0, 120],
+        [0, 0, 0, 1, 0],
+        [60, 61, 60, 60, 62],
+        [100, 60, 50, 200, 10],
+    )
+    occupied = pitch_occupancy(note_array, note_array.track, np.full(5, 59), 5)
+    assert occupied.tolist() == [
+        [False, True, True, False, False],
+        [False, True, True, False, False],
+        [False, True, True, True, False],
+        [False, True, False, False, False],
+        [False, True, False, True, False],
+    ]
+
+    # Brute force, with per-note windows
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        num_notes = rng.integers(0, 30)
+        note_array = NoteArray.from_columns(
+            rng.integers(0, 200, num_notes),
+            rng.integers(0, 3, num_notes),
+            rng.integers(50, 60, num_notes),
+            rng.integers(1, 80, num_notes),
+        )
+        first_pitch = note_array.pitch - rng.integers(0, 8, num_notes)
+        occupied = pitch_occupancy(note_array, note_array.track, first_pitch, 10)
+        for note in range(num_notes):
+            for column in range(10):
+                same = (note_array.track == note_array.track[note]) & (
+                    note_array.pitch == first_pitch[note] + column
+                )
+                overlap = (note_array.onset < note_array.offset[note]) & (
+                    note_array.offset > note_array.onset[note]
+                )
+                assert occupied[note, column] == np.any(same & overlap)
+
+
+def test_sample_excerpts():
+    # Notes every 100ms
+    note_df = pd.DataFrame(
+        {"onset": np.arange(0, 5000, 100), "track": 0, "pitch": 60, "dur": 50}
+    )
+    prior = note_df.copy()
+
+    for overlap_policy in ["allow", "distinct", "disjoint"]:
+        excerpts = sample_excerpts(
+            note_df,
+            5,
+            excerpt_length=400,
+            min_notes=5,
+            overlap_policy=overlap_policy,
+            seed=0,
+        )
+        assert prior.equals(note_df), "sample_excerpts changed input df"
+        assert len(excerpts) == 5
+        firsts = [excerpt.onset[0] for excerpt in excerpts]
+        assert firsts == sorted(firsts)
+        for excerpt in excerpts:
+            assert len(excerpt) == 5
+            assert np.all(np.diff(excerpt.onset) == 100)
+            assert excerpt.onset[0] <= 4500
+            assert np.shares_memory(excerpt.data, note_df.values)
+        if overlap_policy == "distinct":
+            assert len(set(firsts)) == 5
+        elif overlap_policy == "disjoint":
+            assert np.all(np.diff(firsts) > 400)
+
+    # At most 10 disjoint excerpts of 5 notes fit, and each excerpt drawn
+    # rules out at most 9 others (of 46)
+    excerpts = sample_excerpts(
+        note_df, 20, excerpt_length=400, min_notes=5, overlap_policy="disjoint"
+    )
+    assert 6 <= len(excerpts) <= 10
+    onsets = np.concatenate([excerpt.onset for excerpt in excerpts])
+    assert np.all(np.diff(onsets) > 0)
+
+    # Not enough notes
+    assert sample_excerpts(note_df, 3, excerpt_length=400, min_notes=6) == []
+    assert sample_excerpts(NoteArray.from_df(note_df), 0, min_notes=5) == []
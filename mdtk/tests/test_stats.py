@@ -0,0 +1,97 @@
+import json
+
+import pandas as pd
+
+import mdtk.degradations as deg
+from mdtk.degrader import Degrader, ParallelDegrader
+from mdtk.stats import LATENCY_BIN_EDGES_US, DegradationStats
+
+EXCERPT = pd.DataFrame(
+    {
+        "onset": [0, 100, 200, 200],
+        "track": [0, 1, 0, 1],
+        "pitch": [10, 20, 30, 40],
+        "dur": [100, 100, 100, 100],
+    }
+)
+EMPTY_DF = pd.DataFrame({"onset": [], "track": [], "pitch": [], "dur": []})
+
+
+def test_degradation_stats():
+    stats = DegradationStats()
+    stats.record_attempt("pitch_shift", True, 3e-6)
+    stats.record_attempt("pitch_shift", False, 100)
+    stats.record_degrade("pitch_shift", 2)
+    stats.record_degrade(None, 0)
+    stats.record_degrade(None, 3)
+
+    counts = stats.to_dict()["degradations"]["pitch_shift"]
+    assert counts["attempts"] == 2
+    assert counts["successes"] == counts["failures"] == 1
+    assert counts["failure_rate"] == 0.5
+    assert counts["latency_hist"][2] == 1 and counts["latency_hist"][-1] == 1
+    assert sum(counts["latency_hist"]) == 2
+    assert len(counts["latency_hist"]) == len(LATENCY_BIN_EDGES_US) + 1
+    assert counts["retry_depth_hist"] == [0, 0, 1]
+    assert (stats.degrade_calls, stats.clean, stats.all_failed) == (3, 1, 1)
+
+    # Round trip and merge
+    loaded = DegradationStats.from_dict(json.loads(stats.to_json()))
+    assert loaded.to_dict() == stats.to_dict()
+    other = DegradationStats()
+    other.record_attempt("remove_note", True, 1e-3)
+    other.record_degrade("pitch_shift", 4)
+    merged = loaded.merge(other).to_dict()
+    assert merged["degrade_calls"] == 4
+    assert merged["degradations"]["pitch_shift"]["retry_depth_hist"] == [0, 0, 1, 0, 1]
+    assert merged["degradations"]["remove_note"]["attempts"] == 1
+    assert other.to_dict()["degrade_calls"] == 1, "merge changed the other stats."
+
+
+def test_function_stats():
+    stats = DegradationStats()
+    failures = {}
+    for name, deg_fun in deg.DEGRADATIONS.items():
+        res = deg_fun(EXCERPT, seed=0, stats=stats)
+        expected = deg_fun(EXCERPT, seed=0)
+        assert (res is None and expected is None) or res.equals(expected)
+        empty_res = deg_fun(EMPTY_DF, seed=0, stats=stats)
+        failures[name] = (res is None) + (empty_res is None)
+
+    for name, counts in stats.to_dict()["degradations"].items():
+        assert counts["attempts"] == 2
+        assert counts["failures"] == failures[name]
+        assert counts["successes"] == 2 - failures[name]
+
+
+def test_degrader_stats():
+    excerpts = [EXCERPT, EMPTY_DF] * 10
+
+    stats = DegradationStats()
+    degrader = Degrader(seed=0, stats=stats)
+    labels = [degrader.degrade(excerpt)[1] for excerpt in excerpts]
+    stats = stats.to_dict()
+    assert stats["degrade_calls"] == len(excerpts)
+    assert stats["clean"] + stats["all_failed"] == labels.count(0)
+    for name, counts in stats["degradations"].items():
+        assert sum(counts["retry_depth_hist"]) == labels.count(
+            degrader.degradations.index(name) + 1
+        )
+    assert sum(counts["attempts"] for counts in stats["degradations"].values()) >= (
+        len(excerpts) - labels.count(0)
+    )
+
+    # Parallel stats are merged, and match the serial stats
+    parallel_stats = DegradationStats()
+    degrader = ParallelDegrader(seed=0, stats=parallel_stats, use_threads=True)
+    degrader.degrade_all(excerpts)
+    serial_stats = DegradationStats()
+    degrader = ParallelDegrader(seed=0, stats=serial_stats, num_workers=1)
+    degrader.degrade_all(excerpts)
+    parallel_dict, serial_dict = parallel_stats.to_dict(), serial_stats.to_dict()
+    assert parallel_dict["degrade_calls"] == len(excerpts)
+    for counts in list(parallel_dict["degradations"].values()) + list(
+        serial_dict["degradations"].values()
+    ):
+        del counts["latency_hist"]
+    assert parallel_dict == serial_dict
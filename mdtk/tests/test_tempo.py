@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+import mdtk.fileio as fileio
+from mdtk.tempo import TempoMap
+from mdtk.tests.test_fileio import ALB_MID, TEST_MID
+
+
+def test_tempo_map():
+    # 2 quarter notes at 120 bpm, then 60 bpm
+    tempo_map = TempoMap([0, 8], [120, 60], 4)
+    assert np.allclose(tempo_map.change_ms, [0, 1000])
+    units = np.array([0, 1, 8, 10, 12])
+    ms = np.array([0, 125, 1000, 1500, 2000])
+    assert np.allclose(tempo_map.units_to_ms(units), ms)
+    assert np.allclose(tempo_map.ms_to_units(ms), units)
+    assert tempo_map.units_per_ms(0) == 1 / 125
+    assert tempo_map.units_per_ms(8) == 1 / 250
+
+    # The first tempo is used before the first change
+    tempo_map = TempoMap([4], [60], 1)
+    assert np.allclose(tempo_map.units_to_ms([0, 4, 5]), [0, 4000, 5000])
+
+    note_df = pd.DataFrame(
+        {
+            "onset": [0, 1, 8],
+            "track": [0, 0, 1],
+            "pitch": [60, 61, 62],
+            "dur": [1, 9, 4],
+        }
+    )
+    tempo_map = TempoMap([0, 8], [120, 60], 4)
+    ms_df = tempo_map.to_ms(note_df)
+    assert ms_df["onset"].tolist() == [0, 125, 1000]
+    assert ms_df["dur"].tolist() == [125, 1375, 1000]
+    assert ms_df[["track", "pitch"]].equals(note_df[["track", "pitch"]])
+    assert tempo_map.to_units(ms_df).equals(note_df)
+
+
+def test_midi_to_tempo_map():
+    for path in [TEST_MID, ALB_MID]:
+        tempo_map = fileio.midi_to_tempo_map(path)
+        ms_df = fileio.midi_to_df(path)
+        tick_df = fileio.midi_to_df(path, resolution=tempo_map.resolution)
+        assert tick_df["onset"].dtype == "int64"
+        assert tempo_map.to_ms(tick_df).equals(ms_df), f"{path} ticks differ from ms."
+        assert tempo_map.to_units(ms_df).equals(tick_df)
+
+    # alb_se2 has many tempo changes. Times are rounded to the nearest unit.
+    tempo_map = fileio.midi_to_tempo_map(ALB_MID, resolution=8)
+    assert len(tempo_map.tempos) > 1
+    assert tempo_map.resolution == 8
+    tick_df = fileio.midi_to_df(ALB_MID, resolution=480)
+    grid_df = fileio.midi_to_df(ALB_MID, resolution=8)
+    assert len(grid_df) == len(tick_df)
+    assert np.all(
+        np.abs(np.sort(grid_df["onset"]) * 60 - np.sort(tick_df["onset"])) <= 30
+    )